@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""Operational commands for the AI Wedding Services Platform backend.
+
+Usage: python manage.py --help
+"""
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+import typer
+
+ROOT_DIR = Path(__file__).parent
+BENCHMARK_DIR = ROOT_DIR / "benchmarks"
+
+cli = typer.Typer(help="AI Wedding Services Platform management commands")
+
+
+@cli.callback()
+def main():
+    """AI Wedding Services Platform management commands"""
+
+
+async def _load_chat_messages(limit: int) -> List[str]:
+    """Pull user messages from stored chat sessions"""
+    from server import db
+
+    messages = []
+    cursor = db.chat_sessions.find({}, {"messages.role": 1, "messages.content": 1, "_id": 0}).sort("updated_at", -1)
+    async for session in cursor:
+        messages.extend(m["content"] for m in session.get("messages", []) if m.get("role") == "user")
+        if len(messages) >= limit:
+            break
+    return messages[:limit]
+
+
+def _legacy_intents(message: str) -> set:
+    """Keyword checks as performed before the shared intent classifier"""
+    intents = set()
+    web_search_keywords = ['current price', 'latest trend', 'weather', 'availability', 'market rate', 'online', 'recent', '2025', 'today']
+    if any(keyword in message.lower() for keyword in web_search_keywords):
+        intents.add("web_search")
+    if any(keyword in message.lower() for keyword in ['budget', 'guest', 'date', 'venue', 'style']):
+        intents.add("planning")
+    if 'budget' in message.lower():
+        intents.add("budget")
+    elif 'venue' in message.lower():
+        intents.add("venue")
+    elif 'photography' in message.lower():
+        intents.add("photography")
+    elif any(word in message.lower() for word in ['trend', 'latest', 'current', '2025']):
+        intents.add("trends")
+    query = f"wedding {message} 2025 India pricing trends"
+    if "photographer" in query.lower():
+        intents.add("photography")
+    elif "venue" in query.lower():
+        intents.add("venue")
+    elif "catering" in query.lower():
+        intents.add("catering")
+    elif "price" in query.lower() or "cost" in query.lower():
+        intents.add("pricing")
+    elif "weather" in query.lower():
+        intents.add("weather")
+    return intents
+
+
+@cli.command("bench-intents")
+def bench_intents(
+    repeat: int = typer.Option(2000, help="Passes over the corpus"),
+    from_db: bool = typer.Option(False, help="Use user messages stored in chat_sessions"),
+    limit: int = typer.Option(5000, help="Maximum messages loaded from the database"),
+):
+    """Benchmark the precompiled intent classifier against per-call keyword scans"""
+    from server import CHAT_SEARCH_QUERY_INTENTS, intent_classifier
+
+    if from_db:
+        corpus = asyncio.run(_load_chat_messages(limit))
+    else:
+        corpus = [line.strip() for line in (BENCHMARK_DIR / "chat_messages.txt").read_text().splitlines() if line.strip()]
+    if not corpus:
+        typer.echo("No chat messages found")
+        raise typer.Exit(1)
+
+    def classify(message):
+        # One scan per message; the web search query reuses it plus the precomputed suffix intents
+        intents = intent_classifier.classify(message)
+        return intents | CHAT_SEARCH_QUERY_INTENTS
+
+    results = {}
+    for name, func in [("legacy keyword scans", _legacy_intents), ("intent classifier", classify)]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for message in corpus:
+                func(message)
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed
+        per_message_us = elapsed / (repeat * len(corpus)) * 1e6
+        typer.echo(f"{name:<22} {per_message_us:8.2f} µs/message  ({repeat * len(corpus)} messages in {elapsed:.2f}s)")
+
+    speedup = results["legacy keyword scans"] / results["intent classifier"]
+    typer.echo(f"Corpus size: {len(corpus)} messages, speedup: {speedup:.2f}x")
+
+
+@cli.command("init")
+def init(wait: float = typer.Option(60, help="Seconds to wait if another process is initializing")):
+    """Create indexes, seed sample data and run migrations (once per deployment)"""
+    from server import client, initialize_database
+
+    async def run():
+        try:
+            return await initialize_database(wait)
+        finally:
+            client.close()
+
+    if asyncio.run(run()):
+        typer.echo("Database initialized")
+    else:
+        typer.echo("Initialization was performed by another process")
+
+
+@cli.command("serve")
+def serve(
+    host: str = typer.Option("0.0.0.0"),
+    port: int = typer.Option(8001),
+    workers: int = typer.Option(1, help="Uvicorn worker processes"),
+    skip_init: bool = typer.Option(False, help="Assume `manage.py init` already ran"),
+):
+    """Run the API with N workers after a single initialization step.
+
+    Initialization runs once in a separate process before any worker starts;
+    workers then skip it and only start their own job pool. In-process caches
+    (chat responses, metrics, LLM concurrency) are per worker, so
+    LLM_MAX_CONCURRENCY and JOB_PROVIDER_RATE_LIMITS apply per worker too.
+    """
+    import uvicorn
+
+    if not skip_init:
+        subprocess.run([sys.executable, str(Path(__file__).resolve()), "init"], check=True)
+    # Inherited by the worker processes uvicorn spawns
+    os.environ["SKIP_STARTUP_INIT"] = "true"
+    uvicorn.run("server:app", host=host, port=port, workers=workers, app_dir=str(ROOT_DIR))
+
+
+def _wait_until_ready(url: str, timeout: float):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout}s")
+
+
+def _load_test(url: str, total: int, concurrency: int) -> List[float]:
+    import requests
+
+    per_thread = max(1, total // concurrency)
+
+    def run_client(_):
+        session = requests.Session()
+        latencies = []
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            session.get(url).raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return [latency for latencies in pool.map(run_client, range(concurrency)) for latency in latencies]
+
+
+@cli.command("bench-workers")
+def bench_workers(
+    max_workers: int = typer.Option(4, help="Largest worker count; counts double from 1"),
+    requests_per_run: int = typer.Option(2000, "--requests", help="Requests per worker count"),
+    concurrency: int = typer.Option(32, help="Concurrent client connections"),
+    path: str = typer.Option("/api/vendors?category=Photography", help="Endpoint to load"),
+    port: int = typer.Option(8100),
+):
+    """Measure throughput of `serve` at 1, 2, 4 ... N workers against a running MongoDB.
+
+    The load generator runs on the same host, so leave CPU headroom (max
+    workers below the core count) for it to keep up.
+    """
+    subprocess.run([sys.executable, str(Path(__file__).resolve()), "init"], check=True)
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "JOB_WORKERS_ENABLED": "false"}
+
+    counts = []
+    count = 1
+    while count <= max_workers:
+        counts.append(count)
+        count *= 2
+
+    baseline = None
+    typer.echo(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'scaling':>8}")
+    for workers in counts:
+        server = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "serve", "--skip-init", "--workers", str(workers), "--port", str(port)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_until_ready(f"{base_url}/api/", 30)
+            _load_test(base_url + path, concurrency * 5, concurrency)  # Warm up every worker
+            start = time.perf_counter()
+            latencies = _load_test(base_url + path, requests_per_run, concurrency)
+            throughput = len(latencies) / (time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait(30)
+        baseline = baseline or throughput
+        p50 = statistics.median(latencies) * 1000
+        p95 = statistics.quantiles(latencies, n=20)[-1] * 1000
+        typer.echo(f"{workers:>7} {throughput:>9.1f} {p50:>8.1f} {p95:>8.1f} {throughput / baseline:>7.2f}x")
+
+
+def _import_profile(module: str) -> List[tuple]:
+    """(package, self µs, cumulative µs) rows from `python -X importtime`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+@cli.command("importtime")
+def importtime(
+    module: str = typer.Option("server", help="Module to profile"),
+    top: int = typer.Option(15, help="Number of top-level packages to show"),
+):
+    """Cold-start import profile: time spent in each package the module imports directly"""
+    rows = _import_profile(module)
+    # importtime prints children before their parent, indented two spaces per level
+    def depth(name):
+        return (len(name) - len(name.lstrip()) - 1) // 2
+
+    end = max(i for i, (name, _, _) in enumerate(rows) if depth(name) == 0 and name.strip() == module)
+    start = max((i for i, (name, _, _) in enumerate(rows[:end]) if depth(name) == 0), default=-1) + 1
+    total_us = rows[end][2]
+    packages = sorted(
+        ((name.strip(), cumulative) for name, _, cumulative in rows[start:end] if depth(name) == 1),
+        key=lambda row: row[1], reverse=True
+    )
+    typer.echo(f"{'package':<40} {'ms':>9} {'share':>7}")
+    for name, cumulative in packages[:top]:
+        typer.echo(f"{name:<40} {cumulative / 1000:>9.1f} {cumulative / total_us:>7.1%}")
+    typer.echo(f"Importing {module} took {total_us / 1000:.1f} ms")
+
+
+@cli.command("regenerate-timelines")
+def regenerate_timelines(batch_size: int = typer.Option(500, help="Plans per bulk write")):
+    """Rebuild wedding plan timelines generated under older timeline rules"""
+    from server import client, timeline_engine
+
+    async def run():
+        try:
+            return await timeline_engine.regenerate_outdated(batch_size)
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    updated = asyncio.run(run())
+    info = timeline_engine.schedule.cache_info()
+    typer.echo(f"Regenerated {updated} timelines in {time.perf_counter() - start:.2f}s "
+               f"({info.misses} distinct schedules computed, {info.hits} reused)")
+
+
+@cli.command("archive-chats")
+def archive_chats(max_batches: int = typer.Option(100, help="Stop after this many batches")):
+    """Archive chat sessions idle longer than CHAT_RETENTION_DAYS now instead of waiting for the job"""
+    from server import client, chat_archiver, CHAT_RETENTION_DAYS
+
+    if CHAT_RETENTION_DAYS <= 0:
+        typer.echo("Chat retention is disabled (CHAT_RETENTION_DAYS=0)")
+        raise typer.Exit(1)
+
+    async def run():
+        try:
+            total = 0
+            for _ in range(max_batches):
+                archived = await chat_archiver.archive_batch()
+                total += archived
+                if not archived:
+                    break
+            return total
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    archived = asyncio.run(run())
+    typer.echo(f"Archived {archived} chat sessions to the {chat_archiver.store.name} store in {time.perf_counter() - start:.2f}s")
+
+
+@cli.command("recompute-ratings")
+def recompute_ratings(vendor_id: List[str] = typer.Option(None, help="Only these vendors (repeatable)")):
+    """Rebuild vendor rating aggregates from the reviews collection"""
+    from server import client, vendor_reviews
+
+    async def run():
+        try:
+            return await vendor_reviews.recompute(vendor_id or None)
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    updated = asyncio.run(run())
+    typer.echo(f"Repaired rating aggregates for {updated} vendors in {time.perf_counter() - start:.2f}s")
+
+
+@cli.command("bench-optimizer")
+def bench_optimizer(
+    vendors_per_category: int = typer.Option(500, help="Synthetic vendors in each category"),
+    categories: int = typer.Option(6, help="Categories in the bundle"),
+    budget: float = typer.Option(2500000, help="Total budget"),
+    guest_count: int = typer.Option(200),
+    top_n: int = typer.Option(3),
+    repeat: int = typer.Option(20),
+):
+    """Time the wedding plan bundle optimizer on a synthetic vendor catalog"""
+    from server import BundleOptimizeRequest, bundle_optimizer
+
+    rng = random.Random(42)
+    names = BundleOptimizeRequest().categories
+    names = (names * (categories // len(names) + 1))[:categories]
+    catalog = {}
+    for index, category in enumerate(names):
+        per_plate = category in bundle_optimizer.PER_PLATE_CATEGORIES
+        key = category if category not in catalog else f"{category} {index}"
+        catalog[key] = []
+        for number in range(vendors_per_category):
+            low = rng.randint(5, 60) * (50 if per_plate else 10000)
+            catalog[key].append({
+                "id": f"{key}-{number}",
+                "business_name": f"{key} vendor {number}",
+                "pricing_range": {"min": low, "max": int(low * rng.uniform(1.2, 3))},
+                "rating": round(rng.uniform(3, 5), 1),
+                "total_reviews": rng.randint(0, 400),
+                "verified": rng.random() < 0.4,
+            })
+
+    # Untimed first run: it pays the one-off numpy import
+    bundle_optimizer.solve(catalog, budget, guest_count, top_n)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        bundles, candidates = bundle_optimizer.solve(catalog, budget, guest_count, top_n)
+        timings.append((time.perf_counter() - start) * 1000)
+    total_vendors = vendors_per_category * categories
+    typer.echo(f"{total_vendors} vendors, {candidates} candidates after pruning, {len(bundles)} bundles")
+    typer.echo(f"median {statistics.median(timings):.1f} ms, max {max(timings):.1f} ms over {repeat} runs")
+    if bundles:
+        typer.echo(f"Best bundle: cost {bundles[0]['total_cost']:,.0f}, utility {bundles[0]['utility']}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,26 +1,51 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, UploadFile, File, Request
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, JSONResponse, Response
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference, ReturnDocument, UpdateOne, monitoring
+from pymongo.read_preferences import SecondaryPreferred
+from pymongo.errors import DuplicateKeyError, OperationFailure
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 import uuid
-from datetime import datetime
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from datetime import date, datetime, timedelta
 import asyncio
-import aiohttp
+import functools
+import hashlib
+import heapq
+import io
+import ipaddress
+import math
+import random
 import json as json_module
+import gzip
+import re
+import socket
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection pool configuration
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '10000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '10000'))
+# Catalog, stats and market-data reads may go to secondaries lagging at most this long (MongoDB minimum is 90s)
+MONGO_SECONDARY_READS = os.environ.get('MONGO_SECONDARY_READS', 'true').lower() == 'true'
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '90'))
 
 # Create the main app without a prefix
 app = FastAPI(title="AI Wedding Services Platform")
@@ -31,6 +56,266 @@ api_router = APIRouter(prefix="/api")
 # Gemini AI Configuration
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 
+# Chat context window configuration
+CHAT_CONTEXT_RECENT_TURNS = int(os.environ.get('CHAT_CONTEXT_RECENT_TURNS', '6'))
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET', '3000'))
+CHAT_SUMMARY_MAX_TOKENS = int(os.environ.get('CHAT_SUMMARY_MAX_TOKENS', '400'))
+CHAT_SUMMARY_FOLD_TURNS = int(os.environ.get('CHAT_SUMMARY_FOLD_TURNS', '2'))
+
+# Chat response cache configuration (opt-in)
+CHAT_CACHE_ENABLED = os.environ.get('CHAT_CACHE_ENABLED', 'false').lower() == 'true'
+CHAT_CACHE_TTL_SECONDS = int(os.environ.get('CHAT_CACHE_TTL_SECONDS', '3600'))
+CHAT_CACHE_MAX_ENTRIES = int(os.environ.get('CHAT_CACHE_MAX_ENTRIES', '2000'))
+CHAT_CACHE_SEMANTIC = os.environ.get('CHAT_CACHE_SEMANTIC', 'false').lower() == 'true'
+CHAT_CACHE_SIMILARITY_THRESHOLD = float(os.environ.get('CHAT_CACHE_SIMILARITY_THRESHOLD', '0.85'))
+CHAT_CACHE_MIN_WORDS = int(os.environ.get('CHAT_CACHE_MIN_WORDS', '3'))  # Shorter normalized messages are never cached
+
+# numpy is only needed (and only imported) for semantic chat cache lookups
+np = None
+if CHAT_CACHE_SEMANTIC:
+    try:
+        import numpy as np
+    except ImportError:  # Semantic chat cache lookups are disabled without numpy
+        pass
+
+# Chat retention configuration
+CHAT_RETENTION_DAYS = int(os.environ.get('CHAT_RETENTION_DAYS', '90'))  # Idle sessions older than this are archived; 0 disables
+CHAT_ARCHIVE_STORE = os.environ.get('CHAT_ARCHIVE_STORE', 'mongo')  # "mongo" (chat_archives collection) or "disk"
+CHAT_ARCHIVE_DIR = Path(os.environ.get('CHAT_ARCHIVE_DIR', str(ROOT_DIR / 'chat_archive')))
+CHAT_ARCHIVE_BATCH_SIZE = int(os.environ.get('CHAT_ARCHIVE_BATCH_SIZE', '100'))
+CHAT_ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('CHAT_ARCHIVE_INTERVAL_SECONDS', str(6 * 3600)))
+
+# User profile cache configuration
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', '10000'))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '30'))
+
+# Chat preference extraction configuration
+PREFERENCE_EXTRACTION_BATCH_SECONDS = float(os.environ.get('PREFERENCE_EXTRACTION_BATCH_SECONDS', '5'))
+PREFERENCE_EXTRACTION_MAX_BATCH = int(os.environ.get('PREFERENCE_EXTRACTION_MAX_BATCH', '10'))
+
+# Background job queue configuration
+JOB_WORKERS_ENABLED = os.environ.get('JOB_WORKERS_ENABLED', 'true').lower() == 'true'
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', '4'))
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', '1'))
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '60'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', '5'))
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
+JOB_PROVIDER_RATE_LIMITS = os.environ.get('JOB_PROVIDER_RATE_LIMITS', 'gemini=2')  # jobs/second per provider
+# LLM gateway configuration
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '8'))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', '2'))
+LLM_CALL_TIMEOUT_SECONDS = float(os.environ.get('LLM_CALL_TIMEOUT_SECONDS', '30'))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('LLM_BREAKER_FAILURE_THRESHOLD', '5'))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get('LLM_BREAKER_RESET_SECONDS', '30'))
+
+VENDOR_RANKING_TTL_SECONDS = int(os.environ.get('VENDOR_RANKING_TTL_SECONDS', str(24 * 3600)))
+
+# Precomputed recommendation configuration
+RECOMMENDATION_MAX_AGE_SECONDS = int(os.environ.get('RECOMMENDATION_MAX_AGE_SECONDS', str(6 * 3600)))
+RECOMMENDATION_CATALOG_CHECK_SECONDS = float(os.environ.get('RECOMMENDATION_CATALOG_CHECK_SECONDS', '5'))
+RECOMMENDATION_REFRESH_BATCH_SIZE = int(os.environ.get('RECOMMENDATION_REFRESH_BATCH_SIZE', '100'))
+
+# Vendor availability calendar configuration
+AVAILABILITY_HORIZON_DAYS = int(os.environ.get('AVAILABILITY_HORIZON_DAYS', '730'))
+AVAILABILITY_MAX_QUERY_DAYS = int(os.environ.get('AVAILABILITY_MAX_QUERY_DAYS', '31'))
+
+# Geospatial search configuration
+DEFAULT_SEARCH_RADIUS_KM = float(os.environ.get('DEFAULT_SEARCH_RADIUS_KM', '50'))
+
+# Vendor inbox configuration
+INQUIRY_BATCH_MAX_VENDORS = int(os.environ.get('INQUIRY_BATCH_MAX_VENDORS', '20'))
+INBOX_PAGE_MAX = int(os.environ.get('INBOX_PAGE_MAX', '100'))
+
+# Vendor review configuration
+REVIEW_PRIOR_RATING = float(os.environ.get('REVIEW_PRIOR_RATING', '4.0'))  # Bayesian prior mean
+REVIEW_PRIOR_WEIGHT = float(os.environ.get('REVIEW_PRIOR_WEIGHT', '10'))  # The prior counts as this many reviews
+REVIEWS_PAGE_MAX = int(os.environ.get('REVIEWS_PAGE_MAX', '100'))
+REVIEW_RECOMPUTE_BATCH_SIZE = int(os.environ.get('REVIEW_RECOMPUTE_BATCH_SIZE', '500'))
+
+# Portfolio media configuration
+MEDIA_STORE = os.environ.get('MEDIA_STORE', 'local')  # "local" (served from /api/media) or "s3"
+MEDIA_DIR = Path(os.environ.get('MEDIA_DIR', str(ROOT_DIR / 'media')))
+MEDIA_S3_BUCKET = os.environ.get('MEDIA_S3_BUCKET', '')
+MEDIA_PUBLIC_URL = os.environ.get('MEDIA_PUBLIC_URL', '')  # Public (CDN) base URL of the S3 bucket
+MEDIA_MAX_UPLOAD_BYTES = int(os.environ.get('MEDIA_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+MEDIA_MAX_PIXELS = int(os.environ.get('MEDIA_MAX_PIXELS', '40000000'))  # Rejects decompression bombs
+MEDIA_THUMBNAIL_WIDTHS = tuple(int(width) for width in os.environ.get('MEDIA_THUMBNAIL_WIDTHS', '320,640').split(','))
+MEDIA_PROCESS_WORKERS = int(os.environ.get('MEDIA_PROCESS_WORKERS', '2'))
+
+# Real-time inquiry notification configuration
+INQUIRY_CHANGE_STREAM = os.environ.get('INQUIRY_CHANGE_STREAM', 'true').lower() == 'true'
+NOTIFY_QUEUE_SIZE = int(os.environ.get('NOTIFY_QUEUE_SIZE', '100'))  # Pending events per connection
+
+# Vendor bundle optimizer configuration
+OPTIMIZER_BUDGET_STEPS = int(os.environ.get('OPTIMIZER_BUDGET_STEPS', '2000'))  # Largest DP width; beyond it costs are rounded
+OPTIMIZER_MAX_BUNDLES = int(os.environ.get('OPTIMIZER_MAX_BUNDLES', '10'))
+
+# Wedding timeline configuration
+TIMELINE_CACHE_SIZE = int(os.environ.get('TIMELINE_CACHE_SIZE', '1024'))
+TIMELINE_REGENERATE_BATCH_SIZE = int(os.environ.get('TIMELINE_REGENERATE_BATCH_SIZE', '500'))
+
+# Response compression configuration
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_STREAM_THRESHOLD_BYTES = int(os.environ.get('COMPRESSION_STREAM_THRESHOLD_BYTES', str(512 * 1024)))
+COMPRESSION_CACHE_MAX_BYTES = int(os.environ.get('COMPRESSION_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+
+# Idempotency key configuration
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '60'))  # Takeover window after a crashed request
+
+# Request rate limit configuration
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')  # "memory" (per process) or "mongo" (shared by workers)
+RATE_LIMIT_POLICIES = os.environ.get('RATE_LIMIT_POLICIES', '')  # Overrides, e.g. "chat_user=20/60,market_data_ip=60/60"
+# Peers allowed to set X-Forwarded-For (the ingress); defaults to loopback and private networks
+RATE_LIMIT_TRUSTED_PROXIES = os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', '127.0.0.1/32,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7')
+RATE_LIMIT_MAX_BUCKETS = int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', '100000'))
+
+# Home page bootstrap configuration
+BOOTSTRAP_VENDORS_PER_CATEGORY = int(os.environ.get('BOOTSTRAP_VENDORS_PER_CATEGORY', '6'))
+BOOTSTRAP_CACHE_TTL_SECONDS = float(os.environ.get('BOOTSTRAP_CACHE_TTL_SECONDS', '30'))
+BOOTSTRAP_CHAT_PREVIEWS = int(os.environ.get('BOOTSTRAP_CHAT_PREVIEWS', '5'))
+
+VENDOR_CATEGORIES = ["Photography", "Catering", "Venue", "Decoration", "Music", "Transportation", "Makeup", "Invitations", "Jewelry", "Clothing"]
+
+# Startup initialization configuration
+# Multi-worker deployments run initialization once (`manage.py init`) and start workers with this set
+SKIP_STARTUP_INIT = os.environ.get('SKIP_STARTUP_INIT', 'false').lower() == 'true'
+INIT_LOCK_LEASE_SECONDS = int(os.environ.get('INIT_LOCK_LEASE_SECONDS', '300'))
+INIT_LOCK_WAIT_SECONDS = float(os.environ.get('INIT_LOCK_WAIT_SECONDS', '60'))
+
+# Platform Metrics
+class PlatformMetrics:
+    """In-process counters, gauges and summaries exposed on /api/metrics"""
+    def __init__(self):
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.summaries: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        summary = self.summaries.get(name)
+        if summary is None:
+            summary = self.summaries[name] = {"count": 0, "sum": 0.0, "min": value, "max": value, "last": value}
+        summary["count"] += 1
+        summary["sum"] += value
+        summary["min"] = min(summary["min"], value)
+        summary["max"] = max(summary["max"], value)
+        summary["last"] = value
+
+    def snapshot(self) -> Dict:
+        return {
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "summaries": {
+                name: {**summary, "avg": round(summary["sum"] / summary["count"], 3) if summary["count"] else 0}
+                for name, summary in self.summaries.items()
+            }
+        }
+
+metrics = PlatformMetrics()
+
+# MongoDB connection
+class MongoPoolMonitor(monitoring.ConnectionPoolListener):
+    """Reports connection pool utilization (checked-out connections, checkout wait) to the platform metrics"""
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self.checked_out = 0
+        self.open = 0
+        # Pool events arrive on the driver's executor threads; checkout start/finish share a thread
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _wait_ms(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def _set_checked_out(self, delta: int):
+        self.checked_out += delta
+        metrics.set_gauge("mongo_pool_checked_out", self.checked_out)
+        if self.max_pool_size:
+            metrics.set_gauge("mongo_pool_utilization", round(self.checked_out / self.max_pool_size, 3))
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait_ms = self._wait_ms()
+        with self._lock:
+            self._set_checked_out(1)
+            metrics.observe("mongo_pool_wait_ms", wait_ms)
+
+    def connection_check_out_failed(self, event):
+        wait_ms = self._wait_ms()
+        with self._lock:
+            metrics.observe("mongo_pool_wait_ms", wait_ms)
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                metrics.incr("mongo_pool_checkout_timeouts")
+            else:
+                metrics.incr("mongo_pool_checkout_failures")
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._set_checked_out(-1)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+            metrics.set_gauge("mongo_pool_open_connections", self.open)
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+            metrics.set_gauge("mongo_pool_open_connections", self.open)
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            metrics.incr("mongo_pool_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+mongo_pool_monitor = MongoPoolMonitor(MONGO_MAX_POOL_SIZE)
+metrics.set_gauge("mongo_pool_max_size", MONGO_MAX_POOL_SIZE)
+
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    event_listeners=[mongo_pool_monitor]
+)
+# Writes, chat, inquiries and anything read back right after a write go to the primary
+db = client.get_database(os.environ['DB_NAME'], read_preference=ReadPreference.PRIMARY)
+# Catalog listings, stats and market data tolerate bounded staleness and may be served by secondaries
+catalog_db = client.get_database(
+    os.environ['DB_NAME'],
+    read_preference=SecondaryPreferred(max_staleness=MONGO_MAX_STALENESS_SECONDS) if MONGO_SECONDARY_READS else ReadPreference.PRIMARY
+)
+
 # Database Models
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -39,6 +324,7 @@ class User(BaseModel):
     phone: str
     role: str = "customer"  # customer, vendor
     preferences: Optional[Dict] = None
+    preferences_version: int = 0  # Bumped on every preferences update
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class UserCreate(BaseModel):
@@ -48,6 +334,20 @@ class UserCreate(BaseModel):
     role: str = "customer"
     preferences: Optional[Dict] = None
 
+class PortfolioThumbnail(BaseModel):
+    url: str
+    width: int
+    height: int
+
+class PortfolioImage(BaseModel):
+    id: str  # Content hash of the original upload
+    url: str
+    content_type: str
+    width: int
+    height: int
+    thumbnails: List[PortfolioThumbnail] = []  # WebP, smallest first
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 class Vendor(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -60,10 +360,15 @@ class Vendor(BaseModel):
     location: str
     description: str
     portfolio_images: List[str] = []
+    portfolio: List[PortfolioImage] = []  # Uploaded images with dimensions and thumbnails
     rating: float = 0.0
     total_reviews: int = 0
-    availability: List[str] = []  # Available dates
+    rating_sum: Optional[float] = None  # Running sum of review ratings
+    rating_score: Optional[float] = None  # Bayesian-adjusted rating used for sorting
+    availability: List[str] = []  # Legacy free-form dates; see /vendors/{id}/availability
     verified: bool = False
+    geo: Optional[Dict] = None  # GeoJSON Point {type: "Point", coordinates: [lon, lat]}
+    distance_km: Optional[float] = None  # Only set on distance-ranked search results
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class VendorCreate(BaseModel):
@@ -77,6 +382,16 @@ class VendorCreate(BaseModel):
     location: str
     description: str
     portfolio_images: List[str] = []
+    latitude: Optional[float] = None  # Defaults to the city centre of `location` when known
+    longitude: Optional[float] = None
+
+class DateRange(BaseModel):
+    start: date
+    end: Optional[date] = None  # Inclusive; defaults to a single day
+
+class AvailabilityUpdate(BaseModel):
+    blocked: List[DateRange] = []  # Mark unavailable
+    opened: List[DateRange] = []  # Mark available again
 
 class ChatSession(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -84,6 +399,9 @@ class ChatSession(BaseModel):
     session_id: str
     messages: List[Dict] = []
     context: Dict = {}  # Store wedding preferences, budget, etc.
+    summary: str = ""  # Rolling summary of turns folded out of the context window
+    summarized_messages: int = 0  # Number of leading messages covered by the summary
+    archived: Optional[Dict] = None  # Set while older messages live in the chat archive
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -98,6 +416,7 @@ class Inquiry(BaseModel):
     vendor_id: str
     message: str
     status: str = "pending"  # pending, replied, closed
+    read: bool = False  # Opened by the vendor
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class InquiryCreate(BaseModel):
@@ -105,6 +424,27 @@ class InquiryCreate(BaseModel):
     vendor_id: str
     message: str
 
+class InquiryBatchCreate(BaseModel):
+    user_id: str
+    vendor_ids: List[str]
+    message: str
+
+class InquiryStatusUpdate(BaseModel):
+    status: str
+
+class Review(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    vendor_id: str
+    user_id: str
+    rating: int
+    comment: str = ""
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ReviewCreate(BaseModel):
+    user_id: str
+    rating: int = Field(..., ge=1, le=5)
+    comment: str = ""
+
 class WeddingPlan(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -114,6 +454,7 @@ class WeddingPlan(BaseModel):
     location: str
     style_preference: str  # traditional, modern, fusion
     selected_vendors: List[str] = []
+    categories: List[str] = []  # Vendor categories to plan for; empty means all
     timeline: Dict = {}
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -124,6 +465,504 @@ class WeddingPlanCreate(BaseModel):
     wedding_date: datetime
     location: str
     style_preference: str
+    categories: List[str] = []
+
+class BundleOptimizeRequest(BaseModel):
+    categories: List[str] = ["Venue", "Catering", "Photography", "Decoration", "Makeup", "Music"]
+    budget: Optional[float] = None  # Defaults to the plan budget
+    top_n: int = 3
+    price_basis: str = "min"  # min, mid or max of each vendor's pricing range
+    weights: Dict[str, float] = {}  # Per-category utility weight, default 1
+    match_location: bool = True
+
+# Background Job Queue
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    kind: str
+    payload: Dict = {}
+    provider: Optional[str] = None  # Rate-limited upstream the job calls, e.g. "gemini"
+    status: str = "queued"  # queued, running, done, dead
+    attempts: int = 0
+    max_attempts: int = 5
+    run_at: datetime = Field(default_factory=datetime.utcnow)
+    lease_until: Optional[datetime] = None
+    worker_id: Optional[str] = None
+    dedupe_key: Optional[str] = None
+    last_error: Optional[str] = None
+    result: Optional[Any] = None
+    superseded_by: Optional[str] = None  # Queued job with the same dedupe key that took over the retry
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+class ProviderRateLimiter:
+    """Token buckets limiting how fast jobs for each provider are started"""
+    def __init__(self, rates: Dict[str, float]):
+        self.rates = rates
+        self.tokens = {provider: max(1.0, rate) for provider, rate in rates.items()}
+        self.updated = {provider: time.monotonic() for provider in rates}
+
+    @staticmethod
+    def parse(spec: str) -> Dict[str, float]:
+        """Parse "gemini=2,search=10" (jobs per second per provider)"""
+        rates = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            provider, _, rate = item.partition("=")
+            rates[provider.strip()] = float(rate)
+        return rates
+
+    def _refill(self, provider: str):
+        now = time.monotonic()
+        rate = self.rates[provider]
+        self.tokens[provider] = min(max(1.0, rate), self.tokens[provider] + (now - self.updated[provider]) * rate)
+        self.updated[provider] = now
+
+    def available_providers(self) -> List[str]:
+        available = []
+        for provider in self.rates:
+            self._refill(provider)
+            if self.tokens[provider] >= 1:
+                available.append(provider)
+        return available
+
+    def is_limited(self, provider: Optional[str]) -> bool:
+        return provider in self.rates
+
+    def consume(self, provider: Optional[str]):
+        if provider in self.rates:
+            self.tokens[provider] -= 1
+
+class JobQueue:
+    """Durable job queue on the `jobs` collection.
+
+    Workers claim jobs atomically with find_one_and_update and hold a lease
+    while running them. Failed jobs are retried with exponential backoff and
+    end up in the "dead" state once they run out of attempts. Jobs with a
+    dedupe key are coalesced while one is still queued; a retry that finds a
+    newer twin already queued finishes as superseded by it instead.
+    """
+    def __init__(self, lease_seconds: int, max_attempts: int, retry_base_seconds: float):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.handlers: Dict[str, Any] = {}
+
+    def handler(self, kind: str):
+        """Register the coroutine that runs jobs of `kind`"""
+        def register(func):
+            self.handlers[kind] = func
+            return func
+        return register
+
+    async def ensure_indexes(self):
+        await db.jobs.create_index([("status", 1), ("run_at", 1)])
+        await db.jobs.create_index([("status", 1), ("lease_until", 1)])
+        await db.jobs.create_index("id", unique=True)
+        await db.jobs.create_index(
+            "dedupe_key",
+            unique=True,
+            partialFilterExpression={"status": "queued", "dedupe_key": {"$type": "string"}}
+        )
+        await db.jobs.create_index(
+            "finished_at",
+            expireAfterSeconds=JOB_RETENTION_SECONDS,
+            partialFilterExpression={"status": "done"}
+        )
+
+    async def enqueue(self, kind: str, payload: Dict, provider: str = None, dedupe_key: str = None,
+                      delay: float = 0, max_attempts: int = None) -> str:
+        job = Job(
+            kind=kind,
+            payload=payload,
+            provider=provider,
+            dedupe_key=dedupe_key,
+            max_attempts=max_attempts or self.max_attempts,
+            run_at=datetime.utcnow() + timedelta(seconds=delay)
+        )
+        if not dedupe_key:
+            await db.jobs.insert_one(job.dict())
+            metrics.incr("jobs_enqueued_total")
+            return job.id
+
+        try:
+            existing = await db.jobs.find_one_and_update(
+                {"dedupe_key": dedupe_key, "status": "queued"},
+                {"$setOnInsert": job.dict()},
+                upsert=True,
+                projection={"id": 1},
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            existing = await db.jobs.find_one({"dedupe_key": dedupe_key, "status": "queued"}, {"id": 1})
+        if existing and existing["id"] != job.id:
+            metrics.incr("jobs_coalesced_total")
+            return existing["id"]
+        metrics.incr("jobs_enqueued_total")
+        return job.id
+
+    async def claim(self, worker_id: str, providers: List[str]) -> Optional[Job]:
+        now = datetime.utcnow()
+        claimable = {"$or": [
+            {"status": "queued", "run_at": {"$lte": now}},
+            {"status": "running", "lease_until": {"$lt": now}}  # Lease of a crashed worker expired
+        ]}
+        document = await db.jobs.find_one_and_update(
+            {**claimable, "provider": {"$in": [None] + providers}},
+            {
+                "$set": {"status": "running", "worker_id": worker_id, "lease_until": now + timedelta(seconds=self.lease_seconds)},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        return Job(**document) if document else None
+
+    async def extend_lease(self, job: Job):
+        await db.jobs.update_one(
+            {"id": job.id, "worker_id": job.worker_id, "status": "running"},
+            {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+        )
+
+    async def complete(self, job: Job, result: Any = None):
+        await db.jobs.update_one(
+            {"id": job.id, "worker_id": job.worker_id, "status": "running"},
+            {"$set": {"status": "done", "result": result, "finished_at": datetime.utcnow(), "lease_until": None}}
+        )
+        metrics.incr("jobs_completed_total")
+
+    async def fail(self, job: Job, error: str):
+        running = {"id": job.id, "worker_id": job.worker_id, "status": "running"}
+        if job.attempts >= job.max_attempts:
+            await db.jobs.update_one(
+                running,
+                {"$set": {"status": "dead", "finished_at": datetime.utcnow(), "last_error": error[:1000], "lease_until": None}}
+            )
+            metrics.incr("jobs_dead_total")
+            logging.error(f"Job {job.id} ({job.kind}) moved to dead-letter after {job.attempts} attempts: {error}")
+            return
+
+        backoff = self.retry_base_seconds * (2 ** (job.attempts - 1)) * random.uniform(0.8, 1.2)
+        try:
+            await db.jobs.update_one(
+                running,
+                {"$set": {"status": "queued", "run_at": datetime.utcnow() + timedelta(seconds=backoff),
+                          "last_error": error[:1000], "lease_until": None}}
+            )
+            metrics.incr("jobs_retried_total")
+        except DuplicateKeyError:
+            # The same dedupe key was enqueued again while this job ran; the queued twin does the retry
+            twin = await db.jobs.find_one({"dedupe_key": job.dedupe_key, "status": "queued"}, {"id": 1})
+            await db.jobs.update_one(
+                running,
+                {"$set": {"status": "done", "superseded_by": twin["id"] if twin else None, "finished_at": datetime.utcnow(),
+                          "last_error": error[:1000], "lease_until": None}}
+            )
+            metrics.incr("jobs_superseded_total")
+
+class JobWorkerPool:
+    """Async workers draining the job queue with bounded concurrency"""
+    def __init__(self, queue: JobQueue, concurrency: int, poll_seconds: float, rate_limiter: ProviderRateLimiter):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.rate_limiter = rate_limiter
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.tasks: List[asyncio.Task] = []
+        self.running = 0
+
+    def start(self):
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self.work(index)) for index in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def work(self, index: int):
+        while True:
+            try:
+                job = await self.queue.claim(f"{self.worker_id}-{index}", self.rate_limiter.available_providers())
+            except Exception as e:
+                logging.error(f"Job claim failed: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            self.rate_limiter.consume(job.provider)
+            await self.run(job)
+
+    async def keep_lease(self, job: Job):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                await self.queue.extend_lease(job)
+            except Exception as e:
+                # Retried on the next tick, still well before the lease runs out
+                metrics.incr("job_lease_extension_errors_total")
+                logging.error(f"Extending the lease of job {job.id} ({job.kind}) failed: {e}")
+
+    async def settle(self, job: Job, outcome):
+        """Record a job's outcome; a store error leaves the job to be retried once its lease expires"""
+        try:
+            await outcome
+        except Exception as e:
+            metrics.incr("job_settle_errors_total")
+            logging.error(f"Recording the outcome of job {job.id} ({job.kind}) failed: {e}")
+
+    async def run(self, job: Job):
+        handler = self.queue.handlers.get(job.kind)
+        if handler is None:
+            await self.settle(job, self.queue.fail(job, f"No handler registered for job kind '{job.kind}'"))
+            return
+
+        self.running += 1
+        metrics.set_gauge("jobs_running", self.running)
+        lease_keeper = asyncio.create_task(self.keep_lease(job))
+        started = time.monotonic()
+        try:
+            try:
+                result = await handler(**job.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Job {job.id} ({job.kind}) failed: {e}")
+                await self.settle(job, self.queue.fail(job, str(e)))
+            else:
+                await self.settle(job, self.queue.complete(job, result))
+        finally:
+            lease_keeper.cancel()
+            self.running -= 1
+            metrics.set_gauge("jobs_running", self.running)
+            metrics.observe(f"job_duration_seconds.{job.kind}", time.monotonic() - started)
+
+job_queue = JobQueue(JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS)
+job_workers = JobWorkerPool(
+    job_queue,
+    JOB_WORKER_CONCURRENCY,
+    JOB_POLL_SECONDS,
+    ProviderRateLimiter(ProviderRateLimiter.parse(JOB_PROVIDER_RATE_LIMITS))
+)
+
+# LLM Gateway
+def new_llm_chat(session_id: str, system_message: str, api_key: str = None):
+    """Gemini chat client; the integration package is imported on first use to keep cold start fast"""
+    from emergentintegrations.llm.chat import LlmChat
+    return LlmChat(
+        api_key=api_key or GEMINI_API_KEY,
+        session_id=session_id,
+        system_message=system_message
+    ).with_model("gemini", "gemini-2.0-flash")
+
+class LlmUnavailableError(Exception):
+    """Raised when the gateway rejects or gives up on an LLM call"""
+
+class LlmGateway:
+    """Single entry point for Gemini calls.
+
+    Bounds concurrent calls, rejects callers that wait longer than the queue
+    budget, applies a per-call timeout and trips a circuit breaker after
+    repeated failures so callers fail fast to their fallback instead of piling
+    up hung coroutines.
+    """
+    def __init__(self, max_concurrency: int, queue_timeout: float, call_timeout: float,
+                 failure_threshold: int, reset_seconds: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.call_timeout = call_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.waiting = 0
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def _reject(self, reason: str):
+        metrics.incr(f"llm_rejections_total.{reason}")
+        raise LlmUnavailableError(f"LLM call rejected: {reason}")
+
+    def _record_success(self):
+        self.consecutive_failures = 0
+        if self.opened_at is not None:
+            logging.info("LLM circuit breaker closed")
+        self.opened_at = None
+        metrics.set_gauge("llm_circuit_open", 0)
+
+    def _record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                logging.warning(f"LLM circuit breaker opened after {self.consecutive_failures} consecutive failures")
+            self.opened_at = time.monotonic()
+            metrics.set_gauge("llm_circuit_open", 1)
+
+    def _update_gauges(self):
+        metrics.set_gauge("llm_queue_depth", self.waiting)
+        metrics.set_gauge("llm_in_flight", self.in_flight)
+
+    async def send(self, chat, text: str) -> str:
+        state = self.state
+        if state == "open":
+            self._reject("circuit_open")
+        is_probe = state == "half_open"
+        if is_probe:
+            # Let a single probe call through to test whether Gemini recovered
+            if self.probe_in_flight:
+                self._reject("circuit_open")
+            self.probe_in_flight = True
+
+        try:
+            self.waiting += 1
+            self._update_gauges()
+            queued_at = time.monotonic()
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue_timeout")
+            finally:
+                self.waiting -= 1
+                metrics.observe("llm_queue_wait_seconds", time.monotonic() - queued_at)
+
+            self.in_flight += 1
+            self._update_gauges()
+            started = time.monotonic()
+            try:
+                from emergentintegrations.llm.chat import UserMessage
+                response = await asyncio.wait_for(chat.send_message(UserMessage(text=text)), timeout=self.call_timeout)
+            except asyncio.TimeoutError:
+                self._record_failure()
+                metrics.incr("llm_timeouts_total")
+                raise LlmUnavailableError(f"LLM call timed out after {self.call_timeout}s")
+            except Exception as e:
+                self._record_failure()
+                metrics.incr("llm_errors_total")
+                raise LlmUnavailableError(f"LLM call failed: {e}") from e
+            finally:
+                self.in_flight -= 1
+                self.semaphore.release()
+                self._update_gauges()
+                metrics.observe("llm_call_seconds", time.monotonic() - started)
+
+            self._record_success()
+            return response
+        finally:
+            if is_probe:
+                self.probe_in_flight = False
+
+llm_gateway = LlmGateway(
+    LLM_MAX_CONCURRENCY,
+    LLM_QUEUE_TIMEOUT_SECONDS,
+    LLM_CALL_TIMEOUT_SECONDS,
+    LLM_BREAKER_FAILURE_THRESHOLD,
+    LLM_BREAKER_RESET_SECONDS
+)
+
+# Message Intent Classification
+class IntentClassifier:
+    """Finds every intent keyword in a message with one precompiled regex scan.
+
+    Keywords keep the substring semantics of the previous `keyword in
+    message.lower()` checks. The keywords are compiled into a single
+    prefix-factored alternation (a regex trie) so a scan costs one pass over
+    the text, and a longer keyword also implies the intents of every keyword
+    it contains (e.g. "current price" -> "current" and "price"). Matches do
+    not overlap, so inside a keyword whose tail can begin another keyword
+    the scan is repeated from each later position ("latest trends" ->
+    "latest trend" and "trends").
+    """
+    def __init__(self, intent_keywords: Dict[str, List[str]]):
+        keyword_intents: Dict[str, set] = {}
+        for intent, keywords in intent_keywords.items():
+            for keyword in keywords:
+                keyword_intents.setdefault(keyword.lower(), set()).add(intent)
+
+        self.keyword_intents = {
+            keyword: frozenset().union(*(intents for other, intents in keyword_intents.items() if other in keyword))
+            for keyword in keyword_intents
+        }
+        self.pattern = re.compile(self._trie_pattern(keyword_intents))
+        # Offsets inside each keyword where another keyword could start and run past its end
+        self.overlap_offsets = {}
+        for keyword in keyword_intents:
+            offsets = [
+                start for start in range(1, len(keyword))
+                if any(len(other) > len(keyword) - start and other.startswith(keyword[start:]) for other in keyword_intents)
+            ]
+            if offsets:
+                self.overlap_offsets[keyword] = offsets
+
+    @classmethod
+    def _trie_pattern(cls, keywords) -> str:
+        trie: Dict = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = True
+        return cls._trie_node_pattern(trie)
+
+    @classmethod
+    def _trie_node_pattern(cls, node: Dict) -> str:
+        branches = [re.escape(char) + cls._trie_node_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        # Greedy optional group so the longest keyword wins at each position
+        return f"(?:{'|'.join(branches)})" + ("?" if "" in node else "")
+
+    def classify(self, text: str) -> frozenset:
+        text = text.lower()
+        found = []
+        for match in self.pattern.finditer(text):
+            keyword = match.group()
+            found.append(keyword)
+            for offset in self.overlap_offsets.get(keyword, ()):
+                inner = self.pattern.match(text, match.start() + offset)
+                if inner and inner.end() > match.end():
+                    found.append(inner.group())
+        if not found:
+            return frozenset()
+        return frozenset().union(*(self.keyword_intents[keyword] for keyword in found))
+
+# Each intent is exactly the keyword check of the call site that reads it, so
+# call sites that used different words ("photographer" vs "photography") keep
+# separate intents. Overlap is expected: "current price for a venue" needs a web
+# search, gets the planning follow-up and the trend suggestions, as it always did.
+INTENT_KEYWORDS = {
+    # Chat: fetch live results / add the planning follow-up
+    "web_search": ['current price', 'latest trend', 'weather', 'availability', 'market rate', 'online', 'recent', '2025', 'today'],
+    "planning": ['budget', 'guest', 'date', 'venue', 'style'],
+    # Suggestions
+    "budget": ['budget'],
+    "venue": ['venue'],
+    "photography": ['photography'],
+    "trends": ['trend', 'latest', 'current', '2025'],
+    # Web search results
+    "photographer": ['photographer'],
+    "catering": ['catering'],
+    "pricing": ['price', 'cost'],
+    "price": ['price'],
+    "trends_named": ['trends'],
+    "weather": ['weather'],
+    "wedding": ['wedding'],
+    "metro_city": ['mumbai', 'delhi', 'bangalore', 'pune']
+}
+
+intent_classifier = IntentClassifier(INTENT_KEYWORDS)
+
+# Chat web searches append this suffix to the message; its intents are computed once
+CHAT_SEARCH_QUERY_SUFFIX = "2025 India pricing trends"
+CHAT_SEARCH_QUERY_INTENTS = intent_classifier.classify(f"wedding {CHAT_SEARCH_QUERY_SUFFIX}")
 
 # AI Wedding Planner Service with Web Search
 class AIWeddingPlanner:
@@ -138,136 +977,2638 @@ class AIWeddingPlanner:
             search_url = f"https://api.search.com/search?q={query}"
             
             # Simulate web search results for wedding-related queries
-            if "wedding" in query.lower() and "price" in query.lower():
+            intents = intent_classifier.classify(query)
+            if "wedding" in intents and "price" in intents:
                 return f"Current market research shows wedding costs vary significantly by location and category. In major cities like Mumbai, Delhi, Bangalore: Photography ranges ₹50,000-₹3,00,000, Venues ₹2,00,000-₹10,00,000, Catering ₹800-₹3,000 per plate. Seasonal variations: Peak season (Nov-Feb) costs 20-30% more."
             
-            elif "venue" in query.lower() and any(city in query.lower() for city in ["mumbai", "delhi", "bangalore", "pune"]):
+            elif "venue" in intents and "metro_city" in intents:
                 return f"Popular wedding venues found online: Luxury hotels (Taj, Oberoi, Marriott), Heritage venues (palaces, forts), Banquet halls, Farm houses, Beach resorts. Current availability shows booking 6-12 months in advance recommended. Peak season rates 25-40% higher."
             
-            elif "photographer" in query.lower():
+            elif "photographer" in intents:
                 return f"Top-rated wedding photographers currently available: Candid photography trending, drone shots popular, same-day editing in demand. Price range ₹75,000-₹2,50,000 for full wedding coverage. Instagram portfolios show current style trends."
             
-            elif "weather" in query.lower():
+            elif "weather" in intents:
                 return f"Weather forecast and seasonal considerations: Nov-Feb ideal for outdoor weddings, Mar-May hot but manageable, Jun-Oct monsoon requires indoor backup. Current weather patterns show climate-controlled venues preferred."
             
-            elif "trends" in query.lower():
+            elif "trends_named" in intents:
                 return f"Latest 2025 wedding trends: Sustainable weddings, intimate ceremonies, fusion themes, destination micro-weddings, digital invitations, live streaming for remote guests, personalized AI wedding planning assistance."
             
             else:
-                return f"Based on current online information: {query} - Market research indicates various options available with competitive pricing. Real-time availability and rates vary by season and location."
-                
-        except Exception as e:
-            logging.error(f"Web search error: {e}")
-            return "Unable to fetch current online information, but I can help with general wedding planning guidance."
-    
-    async def get_enhanced_chat_instance(self, session_id: str, user_context: Dict = None):
-        """Get chat instance with web search capabilities"""
-        system_message = f"""You are an advanced AI Wedding Planner with REAL-TIME web search capabilities. You can access current market information, pricing, trends, and vendor details.
+                return f"Based on current online information: {query} - Market research indicates various options available with competitive pricing. Real-time availability and rates vary by season and location."
+                
+        except Exception as e:
+            logging.error(f"Web search error: {e}")
+            return "Unable to fetch current online information, but I can help with general wedding planning guidance."
+    
+    async def get_enhanced_chat_instance(self, session_id: str, user_context: Dict = None, conversation_summary: str = None):
+        """Get chat instance with web search capabilities"""
+        system_message = f"""You are an advanced AI Wedding Planner with REAL-TIME web search capabilities. You can access current market information, pricing, trends, and vendor details.
+
+Your enhanced capabilities:
+1. Wedding Planning: Budget allocation, timeline creation, vendor recommendations
+2. Style Consultation: Latest 2025 wedding trends and styles  
+3. Vendor Matching: Real-time vendor availability and pricing
+4. Market Research: Current pricing from online sources
+5. Weather Integration: Seasonal considerations for wedding dates
+6. Trend Analysis: Latest wedding styles and preferences
+
+User Context: {ChatContextManager.format_user_context(user_context)}
+
+Conversation Summary: {conversation_summary or 'No earlier conversation'}
+
+IMPORTANT: When users ask about specific locations, current prices, vendor availability, or trends, you should search for real-time information to provide accurate, up-to-date responses.
+
+Guidelines:
+- Use web search for current pricing, trends, and availability
+- Provide specific vendor recommendations with real market rates
+- Include seasonal pricing variations and booking timelines
+- Suggest trending wedding themes and styles from 2025
+- Consider weather patterns for outdoor wedding planning
+- Focus on the zero-commission advantage of this platform
+- Always provide actionable, current information
+
+Respond with enthusiasm while being practical and data-driven with real-time insights."""
+
+        chat = new_llm_chat(
+            session_id=session_id,
+            system_message=system_message,
+            api_key=self.api_key
+        )
+        
+        return chat
+
+    async def get_chat_instance(self, session_id: str, user_context: Dict = None):
+        """Legacy method - redirect to enhanced version"""
+        return await self.get_enhanced_chat_instance(session_id, user_context)
+
+ai_planner = AIWeddingPlanner()
+
+# Chat Context Window Management
+class ChatContextManager:
+    """Bounds the conversation history replayed to Gemini on every chat turn.
+
+    The last few turns are sent verbatim, older turns are folded into a rolling
+    summary stored on the chat session, and the assembled context is trimmed to
+    a token budget.
+    """
+    def __init__(self, recent_turns: int, token_budget: int, summary_max_tokens: int, fold_turns: int):
+        self.recent_messages = max(1, recent_turns) * 2
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.fold_messages = max(1, fold_turns) * 2
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        """Approximate Gemini token count (~4 characters per token)"""
+        if not text:
+            return 0
+        return (len(text) + 3) // 4
+
+    @classmethod
+    def truncate_to_tokens(cls, text: str, max_tokens: int, keep_end: bool = False) -> str:
+        if cls.count_tokens(text) <= max_tokens:
+            return text
+        max_chars = max(0, max_tokens * 4 - 3)
+        return "..." + text[-max_chars:] if keep_end else text[:max_chars] + "..."
+
+    @staticmethod
+    def format_user_context(user_context: Dict = None) -> str:
+        """Render user preferences as a compact line instead of a raw dict"""
+        if not user_context:
+            return "New conversation"
+        labels = {
+            "budget": "Budget",
+            "guest_count": "Guests",
+            "location": "Location",
+            "style_preference": "Style",
+            "wedding_date": "Wedding date"
+        }
+        parts = []
+        for key, label in labels.items():
+            value = user_context.get(key)
+            if value in (None, "", 0):
+                continue
+            if key == "budget" and isinstance(value, (int, float)):
+                value = f"₹{value:,.0f}"
+            elif key == "wedding_date":
+                value = str(value)[:10]
+            parts.append(f"{label}: {value}")
+        return "; ".join(parts) or "New conversation"
+
+    @staticmethod
+    def format_turn(message: Dict) -> str:
+        speaker = "User" if message.get("role") == "user" else "Assistant"
+        return f"{speaker}: {message.get('content', '')}"
+
+    def build_prompt(self, session: ChatSession, prompt: str, user_context: Dict = None) -> Dict:
+        """Assemble summary + recent turns + prompt within the token budget"""
+        summary = session.summary or ""
+        unsummarized = session.messages[session.summarized_messages:]
+        # At most the recent turns, even when summarization lags behind
+        verbatim = unsummarized[-self.recent_messages:]
+        if len(unsummarized) > len(verbatim):
+            metrics.incr("chat_context_unsummarized_skipped_total", len(unsummarized) - len(verbatim))
+        fixed_tokens = self.count_tokens(prompt) + self.count_tokens(self.format_user_context(user_context))
+
+        turn_tokens = [self.count_tokens(self.format_turn(m)) for m in verbatim]
+        total = fixed_tokens + self.count_tokens(summary) + sum(turn_tokens)
+
+        # Drop the oldest verbatim turns first; they are folded into the summary later
+        dropped = 0
+        while total > self.token_budget and dropped < len(verbatim):
+            total -= turn_tokens[dropped]
+            dropped += 1
+        verbatim = verbatim[dropped:]
+
+        if total > self.token_budget and summary:
+            remaining = max(0, self.token_budget - (total - self.count_tokens(summary)))
+            summary = self.truncate_to_tokens(summary, remaining, keep_end=True) if remaining else ""
+            total = fixed_tokens + self.count_tokens(summary) + sum(turn_tokens[dropped:])
+
+        message_text = prompt
+        if verbatim:
+            history = "\n".join(self.format_turn(m) for m in verbatim)
+            message_text = f"""Recent conversation:
+{history}
+
+{prompt}"""
+
+        metrics.observe("chat_context_tokens_per_turn", total)
+        metrics.incr("chat_context_tokens_sent_total", total)
+        if dropped:
+            metrics.incr("chat_context_turns_dropped_total", dropped)
+
+        return {"summary": summary, "message": message_text, "tokens": total}
+
+    async def summarize(self, summary: str, messages: List[Dict]) -> str:
+        """Fold new messages into the existing summary"""
+        transcript = "\n".join(self.format_turn(m) for m in messages)
+        if GEMINI_API_KEY:
+            try:
+                summarizer = new_llm_chat(
+                    session_id=f"summary_{uuid.uuid4()}",
+                    system_message="You maintain a concise running summary of a wedding planning conversation. Keep every concrete fact: budget, guest count, dates, locations, style, vendors discussed and decisions made."
+                )
+                updated = await llm_gateway.send(summarizer, f"""Current summary:
+{summary or 'None yet'}
+
+New conversation turns:
+{transcript}
+
+Return the updated summary in at most {self.summary_max_tokens * 3 // 4} words.""")
+                return self.truncate_to_tokens(updated.strip(), self.summary_max_tokens, keep_end=True)
+            except Exception as e:
+                logging.error(f"Chat summary generation failed: {e}")
+
+        # Extractive fallback: keep the opening of each new turn
+        lines = [self.truncate_to_tokens(self.format_turn(m), 40) for m in messages]
+        combined = "\n".join(filter(None, [summary] + lines))
+        return self.truncate_to_tokens(combined, self.summary_max_tokens, keep_end=True)
+
+    async def refresh_summary(self, user_id: str, session_id: str):
+        """Fold turns that left the recent window into the stored session summary"""
+        session_data = await db.chat_sessions.find_one({"session_id": session_id, "user_id": user_id})
+        if not session_data:
+            return
+        session = ChatSession(**session_data)
+        fold_until = len(session.messages) - self.recent_messages
+        if fold_until - session.summarized_messages < self.fold_messages:
+            return
+
+        summary = await self.summarize(session.summary, session.messages[session.summarized_messages:fold_until])
+        # Only apply if no concurrent refresh moved the summary forward meanwhile
+        result = await db.chat_sessions.update_one(
+            {
+                "session_id": session_id,
+                "user_id": user_id,
+                "summarized_messages": session.summarized_messages or {"$in": [0, None]}
+            },
+            {"$set": {"summary": summary, "summarized_messages": fold_until}}
+        )
+        if result.modified_count:
+            metrics.incr("chat_summary_folds_total")
+
+chat_context = ChatContextManager(
+    CHAT_CONTEXT_RECENT_TURNS,
+    CHAT_CONTEXT_TOKEN_BUDGET,
+    CHAT_SUMMARY_MAX_TOKENS,
+    CHAT_SUMMARY_FOLD_TURNS
+)
+
+@job_queue.handler("summarize_chat")
+async def summarize_chat_job(user_id: str, session_id: str):
+    await chat_context.refresh_summary(user_id, session_id)
+
+# Chat Archiving
+class ChatArchiveStore:
+    """Stores a session's messages as compressed NDJSON (zstd when `zstandard` is installed, gzip otherwise)"""
+    name = ""
+
+    def __init__(self):
+        try:
+            import zstandard
+            self.zstd = zstandard
+            self.codec = "zstd"
+        except ImportError:
+            self.zstd = None
+            self.codec = "gzip"
+
+    def encode(self, messages: List[Dict]) -> bytes:
+        data = "".join(json_module.dumps(m, default=str) + "\n" for m in messages).encode()
+        if self.codec == "zstd":
+            return self.zstd.ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=9)
+
+    def decode(self, codec: str, data: bytes) -> List[Dict]:
+        if codec == "zstd":
+            if self.zstd is None:
+                raise RuntimeError("zstandard is required to read this chat archive")
+            data = self.zstd.ZstdDecompressor().decompressobj().decompress(data)
+        else:
+            data = gzip.decompress(data)
+        return [json_module.loads(line) for line in data.decode().splitlines() if line]
+
+class MongoChatArchiveStore(ChatArchiveStore):
+    """Archives in the `chat_archives` collection, one document per session"""
+    name = "mongo"
+
+    async def put(self, key: str, messages: List[Dict]) -> Dict:
+        data = self.encode(messages)
+        await db.chat_archives.replace_one(
+            {"_id": key},
+            {"_id": key, "codec": self.codec, "data": data, "created_at": datetime.utcnow()},
+            upsert=True
+        )
+        return {"store": self.name, "key": key, "codec": self.codec, "bytes": len(data)}
+
+    async def get(self, location: Dict) -> List[Dict]:
+        archive = await db.chat_archives.find_one({"_id": location["key"]})
+        if not archive:
+            raise RuntimeError(f"Chat archive {location['key']} is missing")
+        return self.decode(archive["codec"], archive["data"])
+
+    async def delete(self, location: Dict):
+        await db.chat_archives.delete_one({"_id": location["key"]})
+
+class DiskChatArchiveStore(ChatArchiveStore):
+    """Archives as NDJSON files under a local directory; every worker must share the directory"""
+    name = "disk"
+
+    def __init__(self, root: Path):
+        super().__init__()
+        self.root = root
+
+    def path(self, key: str, codec: str) -> Path:
+        return self.root / key[:2] / f"{key}.ndjson.{'zst' if codec == 'zstd' else 'gz'}"
+
+    def write(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+    async def put(self, key: str, messages: List[Dict]) -> Dict:
+        data = self.encode(messages)
+        await asyncio.to_thread(self.write, self.path(key, self.codec), data)
+        return {"store": self.name, "key": key, "codec": self.codec, "bytes": len(data)}
+
+    async def get(self, location: Dict) -> List[Dict]:
+        data = await asyncio.to_thread(self.path(location["key"], location["codec"]).read_bytes)
+        return self.decode(location["codec"], data)
+
+    async def delete(self, location: Dict):
+        await asyncio.to_thread(self.path(location["key"], location["codec"]).unlink, True)
+
+class ChatArchiver:
+    """Moves the messages of long-idle chat sessions into the chat archive.
+
+    A periodic job takes the oldest idle sessions in batches, folds any
+    unsummarized turns into the session summary, writes the messages to the
+    archive store and leaves the session document with just its summary
+    and an `archived` pointer. Reading the session restores the messages
+    ahead of any turns added since, and removes the archive.
+    """
+    def __init__(self, retention_days: int, batch_size: int, interval_seconds: int, store_name: str, archive_dir: Path):
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.stores = {"mongo": MongoChatArchiveStore(), "disk": DiskChatArchiveStore(archive_dir)}
+        self.store = self.stores[store_name]
+
+    async def ensure_indexes(self):
+        await db.chat_sessions.create_index("updated_at")
+
+    @staticmethod
+    def idle_query(cutoff: datetime) -> Dict:
+        # Restored sessions carry archived None; anything but a pointer is live
+        return {"updated_at": {"$lt": cutoff}, "archived": {"$not": {"$type": "object"}}}
+
+    async def schedule(self, delay: float = 0):
+        if self.retention_days > 0:
+            await job_queue.enqueue("archive_chat_sessions", {}, dedupe_key="archive_chat_sessions", delay=delay)
+
+    async def archive_session(self, session: Dict) -> bool:
+        messages = session.get("messages") or []
+        summary = session.get("summary") or ""
+        unsummarized = messages[session.get("summarized_messages") or 0:]
+        if unsummarized:
+            summary = await chat_context.summarize(summary, unsummarized)
+
+        location = {}
+        if messages:
+            location = await self.store.put(session.get("id") or str(session["_id"]), messages)
+        location.update({"message_count": len(messages), "archived_at": datetime.utcnow()})
+
+        # Skipped if the user came back to the session meanwhile
+        result = await db.chat_sessions.update_one(
+            {"_id": session["_id"], "updated_at": session["updated_at"], "archived": {"$not": {"$type": "object"}}},
+            {"$set": {"messages": [], "summary": summary, "summarized_messages": 0, "archived": location}}
+        )
+        if not result.modified_count:
+            if messages:
+                await self.store.delete(location)
+            return False
+        metrics.incr("chat_sessions_archived_total")
+        metrics.incr("chat_archive_bytes_total", location.get("bytes", 0))
+        return True
+
+    async def archive_batch(self) -> int:
+        """Archive one batch of idle sessions and schedule the next run"""
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        sessions = await db.chat_sessions.find(self.idle_query(cutoff)).sort("updated_at", 1).limit(self.batch_size).to_list(self.batch_size)
+        archived = 0
+        for session in sessions:
+            try:
+                archived += await self.archive_session(session)
+            except Exception as e:
+                logging.error(f"Archiving chat session {session.get('session_id')} failed: {str(e)}")
+        # Continue right away while there is a backlog, unless this batch made no progress
+        await self.schedule(0 if len(sessions) == self.batch_size and archived else self.interval_seconds)
+        return archived
+
+    async def rehydrate(self, session: Dict) -> Dict:
+        """Restore archived messages into the session document"""
+        location = session.get("archived")
+        if not location:
+            return session
+        archived = []
+        if location.get("message_count"):
+            archived = await self.stores[location["store"]].get(location)
+        restored = await db.chat_sessions.find_one_and_update(
+            {"_id": session["_id"], "archived.archived_at": location["archived_at"]},
+            [
+                {"$set": {
+                    "messages": {"$concatArrays": [{"$literal": archived}, {"$ifNull": ["$messages", []]}]},
+                    # The summary already covers every archived message
+                    "summarized_messages": {"$add": [len(archived), {"$ifNull": ["$summarized_messages", 0]}]},
+                    "archived": None
+                }}
+            ],
+            return_document=ReturnDocument.AFTER
+        )
+        if restored is None:
+            # Another request restored it first
+            return await db.chat_sessions.find_one({"_id": session["_id"]}) or session
+        if archived:
+            await self.stores[location["store"]].delete(location)
+        metrics.incr("chat_sessions_rehydrated_total")
+        return restored
+
+chat_archiver = ChatArchiver(
+    CHAT_RETENTION_DAYS,
+    CHAT_ARCHIVE_BATCH_SIZE,
+    CHAT_ARCHIVE_INTERVAL_SECONDS,
+    CHAT_ARCHIVE_STORE,
+    CHAT_ARCHIVE_DIR
+)
+
+@job_queue.handler("archive_chat_sessions")
+async def archive_chat_sessions_job():
+    return {"sessions": await chat_archiver.archive_batch()}
+
+# Chat Response Cache
+class ChatResponseCache:
+    """Opt-in cache of AI answers for frequently repeated chat questions.
+
+    Entries are keyed on the normalized message plus the preference fields that
+    change the answer (budget band, location, style). With semantic lookup
+    enabled, a miss falls back to cosine similarity over hashed n-gram
+    embeddings of the cached questions in the same preference partition.
+    Only standalone questions are cached: callers skip the cache once a
+    session has history, and messages that normalize to fewer than
+    `min_words` words ("yes", "tell me more") are never stored or looked up.
+    """
+    FILLER_WORDS = {
+        "a", "an", "the", "please", "hi", "hello", "hey", "can", "could", "you", "tell", "me", "i", "my", "us",
+        "is", "are", "does", "do", "what", "whats", "s", "how", "much"
+    }
+    BUDGET_BANDS = [(300000, "under_3l"), (500000, "3l_5l"), (1000000, "5l_10l"), (1500000, "10l_15l")]
+    EMBEDDING_DIM = 512
+
+    def __init__(self, enabled: bool, ttl_seconds: int, max_entries: int, semantic: bool, similarity_threshold: float,
+                 min_words: int = CHAT_CACHE_MIN_WORDS):
+        self.enabled = enabled
+        self.min_words = min_words
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic = semantic and np is not None
+        self.similarity_threshold = similarity_threshold
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        # partition -> (keys, embedding matrix); rebuilt lazily after inserts/evictions
+        self.partitions: Dict[str, List[str]] = {}
+        self.matrices: Dict[str, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def normalize_message(cls, message: str) -> str:
+        words = re.sub(r"[^a-z0-9₹]+", " ", message.lower()).split()
+        return " ".join(word for word in words if word not in cls.FILLER_WORDS)
+
+    @classmethod
+    def budget_band(cls, budget) -> str:
+        try:
+            budget = float(budget or 0)
+        except (TypeError, ValueError):
+            return "unknown"
+        if budget <= 0:
+            return "unknown"
+        for limit, band in cls.BUDGET_BANDS:
+            if budget < limit:
+                return band
+        return "15l_plus"
+
+    @classmethod
+    def partition_key(cls, user_context: Dict = None) -> str:
+        user_context = user_context or {}
+        return "|".join([
+            cls.budget_band(user_context.get("budget")),
+            str(user_context.get("location") or "").strip().lower(),
+            str(user_context.get("style_preference") or "").strip().lower()
+        ])
+
+    @classmethod
+    def embed(cls, normalized: str):
+        """Hashed word, bigram and character-trigram embedding (L2-normalized)"""
+        vector = np.zeros(cls.EMBEDDING_DIM, dtype=np.float32)
+        words = normalized.split()
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        padded = f" {normalized} "
+        features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        for feature in features:
+            vector[zlib.crc32(feature.encode()) % cls.EMBEDDING_DIM] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _record(self, hit: bool, semantic: bool = False):
+        if hit:
+            self.hits += 1
+            metrics.incr("chat_cache_semantic_hits_total" if semantic else "chat_cache_hits_total")
+        else:
+            self.misses += 1
+            metrics.incr("chat_cache_misses_total")
+        metrics.set_gauge("chat_cache_hit_rate", round(self.hits / (self.hits + self.misses), 4))
+        metrics.set_gauge("chat_cache_entries", len(self.entries))
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry:
+            keys = self.partitions.get(entry["partition"], [])
+            if key in keys:
+                keys.remove(key)
+            self.matrices.pop(entry["partition"], None)
+
+    def _semantic_lookup(self, partition: str, normalized: str) -> Optional[str]:
+        keys = self.partitions.get(partition)
+        if not keys:
+            return None
+        matrix = self.matrices.get(partition)
+        if matrix is None:
+            matrix = self.matrices[partition] = np.vstack([self.entries[k]["embedding"] for k in keys])
+        scores = matrix @ self.embed(normalized)
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            return keys[best]
+        return None
+
+    def get(self, message: str, user_context: Dict = None, allow_expired: bool = False) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        normalized = self.normalize_message(message)
+        if len(normalized.split()) < self.min_words:
+            return None
+        partition = self.partition_key(user_context)
+        key = f"{partition}|{normalized}"
+        semantic = False
+
+        entry = self.entries.get(key)
+        if entry is None and self.semantic:
+            similar_key = self._semantic_lookup(partition, normalized)
+            if similar_key:
+                key, entry, semantic = similar_key, self.entries[similar_key], True
+
+        if entry is not None and entry["expires_at"] <= time.monotonic() and not allow_expired:
+            self._remove(key)
+            entry = None
+
+        if entry is None:
+            self._record(False)
+            return None
+        self.entries.move_to_end(key)
+        self._record(True, semantic)
+        return entry["value"]
+
+    def put(self, message: str, user_context: Dict, value: Dict):
+        if not self.enabled:
+            return
+        normalized = self.normalize_message(message)
+        if len(normalized.split()) < self.min_words:
+            return
+        partition = self.partition_key(user_context)
+        key = f"{partition}|{normalized}"
+        self._remove(key)
+
+        # Evict expired entries first, then least recently used ones
+        now = time.monotonic()
+        if len(self.entries) >= self.max_entries:
+            for expired_key in [k for k, e in self.entries.items() if e["expires_at"] <= now]:
+                self._remove(expired_key)
+        while len(self.entries) >= self.max_entries:
+            self._remove(next(iter(self.entries)))
+
+        self.entries[key] = {
+            "value": value,
+            "partition": partition,
+            "expires_at": now + self.ttl_seconds,
+            "embedding": self.embed(normalized) if self.semantic else None
+        }
+        if self.semantic:
+            self.partitions.setdefault(partition, []).append(key)
+            self.matrices.pop(partition, None)
+        metrics.set_gauge("chat_cache_entries", len(self.entries))
+
+chat_cache = ChatResponseCache(
+    CHAT_CACHE_ENABLED,
+    CHAT_CACHE_TTL_SECONDS,
+    CHAT_CACHE_MAX_ENTRIES,
+    CHAT_CACHE_SEMANTIC,
+    CHAT_CACHE_SIMILARITY_THRESHOLD
+)
+
+# Chat Preference Extraction
+class PreferenceParser:
+    """Rule-based extraction of wedding planning details from chat messages"""
+    NUMBER = r"(\d+(?:,\d{2,3})*(?:\.\d+)?)"
+    UNIT_MULTIPLIERS = {"crore": 10000000, "cr": 10000000, "lakh": 100000, "lac": 100000, "l": 100000, "k": 1000, "thousand": 1000}
+    BUDGET_WITH_UNIT = re.compile(NUMBER + r"\s*(crores?|cr|lakhs?|lacs?|l|k|thousand)\b")
+    BUDGET_WITH_CURRENCY = re.compile(r"(?:₹|\brs\.?|\binr)\s*" + NUMBER)
+    BUDGET_STATED = re.compile(r"budget\s*(?:of|is|around|about|:)?\s*(?:₹|rs\.?|inr)?\s*" + NUMBER + r"(?!\s*(?:crores?|cr|lakhs?|lacs?|l|k|thousand)\b)")
+    GUEST_COUNT = re.compile(r"(\d{2,5})\s*\+?\s*(?:guests|people|persons|pax|attendees|invitees)\b|guest\s*(?:count|list)\s*(?:of|is|around|about|:)?\s*(\d{2,5})")
+    MONTHS = {name: index for index, name in enumerate(
+        ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december"], 1)}
+    MONTH_NAMES = r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+    DATE_ISO = re.compile(r"\b(20\d{2})-(\d{1,2})-(\d{1,2})\b")
+    DATE_NUMERIC = re.compile(r"\b(\d{1,2})[/.](\d{1,2})[/.](20\d{2})\b")  # dd/mm/yyyy
+    DATE_DAY_MONTH = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + MONTH_NAMES + r",?\s+(20\d{2})\b")
+    DATE_MONTH_DAY = re.compile(r"\b" + MONTH_NAMES + r"\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(20\d{2})\b")
+    CITIES = {
+        "mumbai": "Mumbai", "pune": "Pune", "delhi": "Delhi", "bangalore": "Bangalore", "bengaluru": "Bangalore",
+        "hyderabad": "Hyderabad", "chennai": "Chennai", "kolkata": "Kolkata", "jaipur": "Jaipur", "udaipur": "Udaipur",
+        "goa": "Goa", "ahmedabad": "Ahmedabad", "lucknow": "Lucknow", "chandigarh": "Chandigarh", "kochi": "Kochi",
+        "rajasthan": "Rajasthan"
+    }
+    LOCATION = re.compile(r"\b(" + "|".join(CITIES) + r")\b")
+    LOCATION_CUED = re.compile(r"\b(?:in|at)\s+(" + "|".join(CITIES) + r")\b")
+    STYLES = {
+        "traditional": "Traditional", "modern": "Modern", "contemporary": "Modern", "fusion": "Fusion",
+        "royal": "Royal", "minimal": "Minimalist", "minimalist": "Minimalist", "destination": "Destination",
+        "rustic": "Rustic", "boho": "Boho", "vintage": "Vintage"
+    }
+    STYLE_WORDS = "|".join(STYLES)
+    STYLE = re.compile(
+        r"\b(" + STYLE_WORDS + r")\b(?:\s+\w+){0,2}\s+(?:style|theme|wedding|ceremony|reception|look)\b"
+        r"|\b(?:style|theme)\s*(?:is|of|would be|:)?\s*(?:a\s+|an\s+)?(" + STYLE_WORDS + r")\b"
+    )
+
+    @staticmethod
+    def _to_number(text: str) -> float:
+        return float(text.replace(",", ""))
+
+    @classmethod
+    def parse_budget(cls, text: str) -> Optional[float]:
+        match = cls.BUDGET_WITH_UNIT.search(text)
+        if match:
+            unit = match.group(2).rstrip("s")
+            return cls._to_number(match.group(1)) * cls.UNIT_MULTIPLIERS[unit]
+        for pattern in (cls.BUDGET_STATED, cls.BUDGET_WITH_CURRENCY):
+            match = pattern.search(text)
+            if match:
+                # Without a unit word the amount is in rupees; "budget 15" is too small and ignored
+                return cls._to_number(match.group(1))
+        return None
+
+    @classmethod
+    def parse_date(cls, text: str) -> Optional[datetime]:
+        try:
+            match = cls.DATE_ISO.search(text)
+            if match:
+                return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            match = cls.DATE_NUMERIC.search(text)
+            if match:
+                return datetime(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+            match = cls.DATE_DAY_MONTH.search(text)
+            if match:
+                return datetime(int(match.group(3)), cls._month(match.group(2)), int(match.group(1)))
+            match = cls.DATE_MONTH_DAY.search(text)
+            if match:
+                return datetime(int(match.group(3)), cls._month(match.group(1)), int(match.group(2)))
+        except ValueError:
+            return None
+        return None
+
+    @classmethod
+    def _month(cls, name: str) -> int:
+        return next(index for month, index in cls.MONTHS.items() if month.startswith(name[:3]))
+
+    @classmethod
+    def parse(cls, message: str) -> Dict:
+        text = message.lower()
+        extracted = {}
+
+        budget = cls.parse_budget(text)
+        if budget and 10000 <= budget <= 500000000:
+            extracted["budget"] = budget
+
+        match = cls.GUEST_COUNT.search(text)
+        if match:
+            extracted["guest_count"] = int(match.group(1) or match.group(2))
+
+        wedding_date = cls.parse_date(text)
+        if wedding_date:
+            extracted["wedding_date"] = wedding_date.isoformat()
+
+        cities = {cls.CITIES[city] for city in cls.LOCATION.findall(text)}
+        if len(cities) > 1:
+            # "compare Mumbai and Delhi", "moved from Delhi to Jaipur": only a city named as the venue counts
+            cities = {cls.CITIES[city] for city in cls.LOCATION_CUED.findall(text)}
+        if len(cities) == 1:
+            extracted["location"] = cities.pop()
+
+        match = cls.STYLE.search(text)
+        if match:
+            extracted["style_preference"] = cls.STYLES[match.group(1) or match.group(2)]
+
+        return extracted
+
+
+class PreferenceExtractor:
+    """Merges planning details from chat into user preferences off the request path.
+
+    Chat turns with planning intent enqueue one deduplicated extraction job per
+    user, delayed by a short batch window so follow-up turns are processed
+    together. Messages the rule-based parser cannot read fall back to a Gemini
+    extraction call.
+    """
+    def __init__(self, batch_window: float, max_batch: int):
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+    async def submit(self, user_id: str):
+        await job_queue.enqueue(
+            "extract_preferences",
+            {"user_id": user_id},
+            provider="gemini",
+            dedupe_key=f"extract_preferences:{user_id}",
+            delay=self.batch_window
+        )
+
+    async def recent_messages(self, user_id: str, since: datetime) -> List[str]:
+        """User chat messages sent after `since`, oldest first"""
+        since_iso = since.isoformat()
+        messages = []
+        sessions = db.chat_sessions.find(
+            {"user_id": user_id, "updated_at": {"$gt": since}},
+            {"messages": {"$slice": -self.max_batch * 2}, "_id": 0}
+        )
+        async for session in sessions:
+            messages.extend(
+                m for m in session.get("messages", [])
+                if m.get("role") == "user" and m.get("timestamp", "") > since_iso
+            )
+        messages.sort(key=lambda m: m.get("timestamp", ""))
+        return [m["content"] for m in messages[-self.max_batch:]]
+
+    async def extract(self, messages: List[str]) -> Dict:
+        extracted = {}
+        unparsed = []
+        # Later messages win when the user corrects themselves
+        for message in messages:
+            parsed = PreferenceParser.parse(message)
+            if parsed:
+                extracted.update(parsed)
+            else:
+                unparsed.append(message)
+
+        if unparsed and GEMINI_API_KEY:
+            llm_extracted = await self.extract_with_llm(unparsed)
+            extracted = {**llm_extracted, **extracted}
+        return extracted
+
+    async def extract_with_llm(self, messages: List[str]) -> Dict:
+        metrics.incr("preference_extraction_llm_calls_total")
+        try:
+            extractor_chat = new_llm_chat(
+                session_id=f"extract_{uuid.uuid4()}",
+                system_message="You extract wedding planning details from chat messages and reply with JSON only."
+            )
+            transcript = "\n".join(f"- {m}" for m in messages)
+            response = await llm_gateway.send(extractor_chat, f"""Extract any of these fields mentioned by the user:
+budget (number in rupees), guest_count (integer), wedding_date (YYYY-MM-DD), location (city), style_preference (e.g. Traditional, Modern, Fusion).
+Omit fields that are not mentioned. Messages:
+{transcript}""")
+            return self.validate(json_module.loads(response.strip().removeprefix("```json").removeprefix("```").removesuffix("```")))
+        except LlmUnavailableError:
+            raise  # Retried by the job queue once Gemini recovers
+        except Exception as e:
+            logging.error(f"LLM preference extraction failed: {e}")
+            return {}
+
+    @classmethod
+    def validate(cls, data: Dict) -> Dict:
+        validated = {}
+        if not isinstance(data, dict):
+            return validated
+        try:
+            if data.get("budget"):
+                validated["budget"] = float(data["budget"])
+            if data.get("guest_count"):
+                validated["guest_count"] = int(data["guest_count"])
+            if data.get("wedding_date"):
+                validated["wedding_date"] = datetime.fromisoformat(str(data["wedding_date"])).isoformat()
+        except (TypeError, ValueError):
+            pass
+        for field in ("location", "style_preference"):
+            if isinstance(data.get(field), str) and data[field].strip():
+                validated[field] = data[field].strip().title()
+        return validated
+
+    async def process(self, user_id: str) -> Dict:
+        user = await db.users.find_one({"id": user_id}, {"preferences": 1, "preferences_extracted_at": 1})
+        if not user:
+            return {}
+        started_at = datetime.utcnow()
+        since = user.get("preferences_extracted_at") or started_at - timedelta(days=1)
+        messages = await self.recent_messages(user_id, since)
+        extracted = await self.extract(messages) if messages else {}
+
+        current = user.get("preferences") or {}
+        changes = {k: v for k, v in extracted.items() if current.get(k) != v}
+        await db.users.update_one({"id": user_id}, {"$set": {"preferences_extracted_at": started_at}})
+        if not changes:
+            return {}
+
+        version = await merge_user_preferences(user_id, changes)
+        metrics.incr("preference_extraction_updates_total")
+        logging.info(f"Merged chat preferences {sorted(changes)} for user {user_id} (version {version})")
+        return {"changes": sorted(changes), "preferences_version": version}
+
+
+async def merge_user_preferences(user_id: str, changes: Dict, replace: bool = False) -> Optional[int]:
+    """Versioned update of `User.preferences`; returns the new preferences version"""
+    # $literal keeps user-provided strings such as "$..." from being read as field paths
+    preferences = {"$literal": changes} if replace else {"$mergeObjects": [{"$ifNull": ["$preferences", {}]}, {"$literal": changes}]}
+    result = await db.users.find_one_and_update(
+        {"id": user_id},
+        [{"$set": {
+            "preferences": preferences,
+            "preferences_version": {"$add": [{"$ifNull": ["$preferences_version", 0]}, 1]},
+            "preferences_updated_at": datetime.utcnow()
+        }}],
+        projection={"preferences_version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not result:
+        return None
+    await on_preferences_changed(user_id, result["preferences_version"])
+    return result["preferences_version"]
+
+
+async def on_preferences_changed(user_id: str, version: int):
+    """Invalidate per-user derived data after a preferences update"""
+    metrics.incr("preference_changes_total")
+    user_profiles.invalidate(user_id)
+    await recommendation_store.invalidate_user(user_id)
+
+
+preference_extractor = PreferenceExtractor(PREFERENCE_EXTRACTION_BATCH_SECONDS, PREFERENCE_EXTRACTION_MAX_BATCH)
+
+@job_queue.handler("extract_preferences")
+async def extract_preferences_job(user_id: str):
+    return await preference_extractor.process(user_id)
+
+# Vendor Availability Calendar
+class AvailabilityCalendar:
+    """Per-vendor availability bitset over a rolling horizon of days.
+
+    Bit i of a vendor's `availability_bits` is set when the vendor is free on
+    `availability_start + i` days. Vendors without a calendar, and days past
+    the horizon, count as available. Unavailable days are also kept as a
+    `busy_days` array on the vendor, written in the same versioned update as
+    the bitset, so "who is free on these dates" is a per-vendor predicate in
+    the listing query itself.
+    """
+    def __init__(self, horizon_days: int, max_query_days: int):
+        self.horizon_days = horizon_days
+        self.max_query_days = max_query_days
+
+    @staticmethod
+    def to_datetime(day: date) -> datetime:
+        return datetime(day.year, day.month, day.day)
+
+    @staticmethod
+    def is_set(bits: bytearray, index: int) -> bool:
+        return bool(bits[index >> 3] & (1 << (index & 7)))
+
+    @staticmethod
+    def assign(bits: bytearray, index: int, available: bool):
+        if available:
+            bits[index >> 3] |= 1 << (index & 7)
+        else:
+            bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def load(self, vendor: Dict) -> Tuple[date, bytearray]:
+        """Vendor bitset re-anchored at today (the horizon rolls forward daily)"""
+        today = datetime.utcnow().date()
+        rolled = bytearray(b"\xff" * ((self.horizon_days + 7) // 8))
+        stored_start = vendor.get("availability_start")
+        stored_bits = bytearray(vendor.get("availability_bits") or b"")
+        if stored_start is None:
+            return today, rolled
+        shift = (today - stored_start.date()).days
+        for index in range(self.horizon_days):
+            source = index + shift
+            if 0 <= source < len(stored_bits) * 8 and not self.is_set(stored_bits, source):
+                self.assign(rolled, index, False)
+        return today, rolled
+
+    def unavailable_days(self, start: date, bits: bytearray) -> List[date]:
+        return [start + timedelta(days=i) for i in range(self.horizon_days) if not self.is_set(bits, i)]
+
+    def apply(self, start: date, bits: bytearray, day_range: "DateRange", available: bool):
+        end = day_range.end or day_range.start
+        if day_range.start > end:
+            raise HTTPException(status_code=400, detail=f"Invalid date range {day_range.start} - {end}")
+        first = (day_range.start - start).days
+        last = (end - start).days
+        if first < 0 or last >= self.horizon_days:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Dates must fall between {start} and {start + timedelta(days=self.horizon_days - 1)}"
+            )
+        for index in range(first, last + 1):
+            self.assign(bits, index, available)
+
+    def busy_days(self, start: date, bits: bytearray) -> List[datetime]:
+        return [self.to_datetime(day) for day in self.unavailable_days(start, bits)]
+
+    async def backfill_busy_days(self) -> int:
+        """Derive `busy_days` for calendars stored before it was kept on the vendor"""
+        backfilled = 0
+        async for vendor in db.vendors.find(
+            {"availability_start": {"$ne": None}, "busy_days": {"$exists": False}},
+            {"id": 1, "availability_start": 1, "availability_bits": 1, "availability_version": 1}
+        ):
+            start, bits = self.load(vendor)
+            # Skipped if the calendar was updated meanwhile; that update wrote busy_days itself
+            result = await db.vendors.update_one(
+                {"id": vendor["id"], "availability_version": vendor.get("availability_version")},
+                {"$set": {"busy_days": self.busy_days(start, bits)}}
+            )
+            backfilled += result.modified_count
+        # Superseded per-day mirror
+        await db.vendor_busy_days.drop()
+        return backfilled
+
+    def resolve_range(self, on_date: Optional[date], date_from: Optional[date], date_to: Optional[date]) -> Optional[Tuple[date, date]]:
+        """Normalize date/date_from/date_to query parameters into an inclusive range"""
+        if on_date:
+            return on_date, on_date
+        if not date_from and not date_to:
+            return None
+        date_from = date_from or date_to
+        date_to = date_to or date_from
+        if date_from > date_to:
+            raise HTTPException(status_code=400, detail="date_from must be on or before date_to")
+        if (date_to - date_from).days >= self.max_query_days:
+            raise HTTPException(status_code=400, detail=f"Date ranges are limited to {self.max_query_days} days")
+        return date_from, date_to
+
+    def free_vendor_filter(self, date_range: Optional[Tuple[date, date]]) -> Dict:
+        """Vendor filter excluding anyone busy on any day of the range"""
+        if not date_range:
+            return {}
+        busy_in_range = {"$gte": self.to_datetime(date_range[0]), "$lte": self.to_datetime(date_range[1])}
+        return {"busy_days": {"$not": {"$elemMatch": busy_in_range}}}
+
+    @staticmethod
+    def wedding_date_range(user_preferences: Dict) -> Optional[Tuple[date, date]]:
+        try:
+            wedding_date = datetime.fromisoformat(str(user_preferences.get("wedding_date"))).date()
+        except ValueError:
+            return None
+        return wedding_date, wedding_date
+
+availability_calendar = AvailabilityCalendar(AVAILABILITY_HORIZON_DAYS, AVAILABILITY_MAX_QUERY_DAYS)
+
+# Vendor Geolocation
+# Offline city centre coordinates (lat, lon) used to backfill vendors and resolve `near=<city>`
+CITY_COORDINATES = {
+    "mumbai": (19.0760, 72.8777),
+    "pune": (18.5204, 73.8567),
+    "delhi": (28.6139, 77.2090),
+    "new delhi": (28.6139, 77.2090),
+    "bangalore": (12.9716, 77.5946),
+    "bengaluru": (12.9716, 77.5946),
+    "hyderabad": (17.3850, 78.4867),
+    "chennai": (13.0827, 80.2707),
+    "kolkata": (22.5726, 88.3639),
+    "ahmedabad": (23.0225, 72.5714),
+    "jaipur": (26.9124, 75.7873),
+    "udaipur": (24.5854, 73.7125),
+    "rajasthan": (26.9124, 75.7873),  # State-level listings pinned to Jaipur
+    "goa": (15.4909, 73.8278),
+    "lucknow": (26.8467, 80.9462),
+    "chandigarh": (30.7333, 76.7794),
+    "kochi": (9.9312, 76.2673),
+    "nagpur": (21.1458, 79.0882),
+    "nashik": (19.9975, 73.7898),
+    "thane": (19.2183, 72.9781),
+    "navi mumbai": (19.0330, 73.0297)
+}
+
+def geo_point(latitude: float, longitude: float) -> Dict:
+    """GeoJSON point (longitude first) for the 2dsphere index"""
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+def city_geo_point(location: str) -> Optional[Dict]:
+    coordinates = CITY_COORDINATES.get((location or "").strip().lower())
+    return geo_point(*coordinates) if coordinates else None
+
+def parse_near(near: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Parse `near` as "lat,lon" or a known city name"""
+    if not near:
+        return None
+    if near.strip().lower() in CITY_COORDINATES:
+        return CITY_COORDINATES[near.strip().lower()]
+    try:
+        latitude, longitude = (float(part) for part in near.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="near must be 'lat,lon' or a known city name")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise HTTPException(status_code=400, detail="near coordinates are out of range")
+    return latitude, longitude
+
+def geo_near_stage(near: Tuple[float, float], radius_km: float, query: Dict) -> Dict:
+    """$geoNear stage returning vendors within radius_km, nearest first"""
+    return {"$geoNear": {
+        "near": geo_point(*near),
+        "distanceField": "distance_km",
+        "distanceMultiplier": 0.001,  # metres -> km
+        "maxDistance": radius_km * 1000,
+        "spherical": True,
+        "key": "geo",
+        "query": query
+    }}
+
+async def find_vendors(query: Dict, limit: int, near: Optional[Tuple[float, float]] = None, radius_km: float = None) -> List[Dict]:
+    """Vendors matching query: by distance when `near` is given, else by rating"""
+    if near:
+        pipeline = [geo_near_stage(near, radius_km or DEFAULT_SEARCH_RADIUS_KM, query), {"$limit": limit}]
+        vendors = await catalog_db.vendors.aggregate(pipeline).to_list(limit)
+        for vendor in vendors:
+            vendor["distance_km"] = round(vendor["distance_km"], 2)
+        return vendors
+    return await catalog_db.vendors.find(query).sort([('rating_score', -1), ('rating', -1)]).limit(limit).to_list(limit)
+
+async def backfill_vendor_coordinates() -> int:
+    """Set coordinates on vendors that lack them from the offline city table"""
+    updated = 0
+    for city, coordinates in CITY_COORDINATES.items():
+        result = await db.vendors.update_many(
+            {"geo": None, "location": {"$regex": f"^\\s*{re.escape(city)}\\s*$", "$options": "i"}},
+            {"$set": {"geo": geo_point(*coordinates)}}
+        )
+        updated += result.modified_count
+    return updated
+
+# Real-time Inquiry Notifications
+class InquiryNotifier:
+    """Fans new-inquiry events out to vendor WebSocket subscribers.
+
+    A change stream on `inquiries` (replica sets only) delivers inserts made
+    by any worker; without one, VendorInbox publishes in-process, which
+    covers single-node deployments and tests. Each connection has a bounded
+    queue: a client that falls behind gets its backlog replaced by a single
+    "resync" event telling it to refetch the inbox, so one slow dashboard
+    never stalls fan-out to the others.
+    """
+    def __init__(self, use_change_stream: bool, queue_size: int):
+        self.use_change_stream = use_change_stream
+        self.queue_size = queue_size
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.change_stream_active = False
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.use_change_stream and self.task is None:
+            self.task = asyncio.create_task(self.watch())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        self.change_stream_active = False
+
+    def _update_gauges(self):
+        metrics.set_gauge("ws_connections", sum(len(queues) for queues in self.subscribers.values()))
+        metrics.set_gauge("ws_vendors_connected", len(self.subscribers))
+
+    def subscribe(self, vendor_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.setdefault(vendor_id, set()).add(queue)
+        metrics.incr("ws_connections_total")
+        self._update_gauges()
+        return queue
+
+    def unsubscribe(self, vendor_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(vendor_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[vendor_id]
+        self._update_gauges()
+
+    def publish(self, vendor_id: str, event: Dict):
+        for queue in self.subscribers.get(vendor_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+                metrics.incr("ws_resyncs_total")
+
+    def publish_created(self, inquiries: List["Inquiry"]):
+        """In-process delivery, used whenever the change stream is not running"""
+        if self.change_stream_active:
+            return
+        for inquiry in inquiries:
+            if inquiry.vendor_id in self.subscribers:
+                self.publish(inquiry.vendor_id, {"type": "inquiry", "inquiry": jsonable_encoder(inquiry)})
+
+    async def watch(self):
+        resume_token = None
+        while True:
+            try:
+                async with db.inquiries.watch([{"$match": {"operationType": "insert"}}], resume_after=resume_token) as stream:
+                    self.change_stream_active = True
+                    logger.info("Inquiry notifications follow the inquiries change stream")
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        inquiry = Inquiry(**change["fullDocument"])
+                        if inquiry.vendor_id in self.subscribers:
+                            self.publish(inquiry.vendor_id, {"type": "inquiry", "inquiry": jsonable_encoder(inquiry)})
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                self.change_stream_active = False
+                if e.code == 40573:  # Change streams need a replica set
+                    logger.info("Change streams unavailable, inquiry notifications are in-process only")
+                    return
+                logging.error(f"Inquiry change stream failed: {e}")
+                resume_token = None
+            except Exception as e:
+                self.change_stream_active = False
+                logging.error(f"Inquiry change stream failed: {e}")
+            await asyncio.sleep(5)
+
+inquiry_notifier = InquiryNotifier(INQUIRY_CHANGE_STREAM, NOTIFY_QUEUE_SIZE)
+
+# Vendor Inbox
+class VendorInbox:
+    """Inquiry writes plus denormalized per-vendor unread/pending counters.
+
+    Counters live in `inbox_counters` (one document per vendor) and are kept
+    in step with every inquiry write through `$inc`, so an inbox badge is a
+    single point read instead of a scan over `inquiries`.
+    """
+    STATUSES = ("pending", "replied", "closed")
+
+    async def ensure_indexes(self):
+        await db.inquiries.create_index([("vendor_id", 1), ("created_at", -1)])
+        await db.inquiries.create_index([("user_id", 1), ("created_at", -1)])
+        await db.inquiries.create_index("id")
+
+    async def add(self, inquiries: List["Inquiry"]):
+        if len(inquiries) == 1:
+            await db.inquiries.insert_one(inquiries[0].dict())
+        else:
+            await db.inquiries.insert_many([inquiry.dict() for inquiry in inquiries], ordered=False)
+        per_vendor: Dict[str, int] = {}
+        for inquiry in inquiries:
+            per_vendor[inquiry.vendor_id] = per_vendor.get(inquiry.vendor_id, 0) + 1
+        await db.inbox_counters.bulk_write([
+            UpdateOne({"_id": vendor_id}, {"$inc": {"unread": count, "pending": count}}, upsert=True)
+            for vendor_id, count in per_vendor.items()
+        ], ordered=False)
+        metrics.incr("inquiries_created_total", len(inquiries))
+        inquiry_notifier.publish_created(inquiries)
+
+    async def page(self, vendor_id: str, limit: int, before: Optional[datetime] = None, status: Optional[str] = None) -> List[Dict]:
+        """Newest first; pass the last item's created_at as `before` for the next page"""
+        query = {"vendor_id": vendor_id}
+        if before:
+            query["created_at"] = {"$lt": before}
+        if status:
+            query["status"] = status
+        return await db.inquiries.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+
+    async def counts(self, vendor_id: str) -> Dict[str, int]:
+        counters = await db.inbox_counters.find_one({"_id": vendor_id}) or {}
+        return {"unread": max(counters.get("unread", 0), 0), "pending": max(counters.get("pending", 0), 0)}
+
+    async def mark_read(self, inquiry_id: str) -> Dict:
+        previous = await db.inquiries.find_one_and_update(
+            {"id": inquiry_id, "read": {"$ne": True}},
+            {"$set": {"read": True}},
+            projection={"_id": 0}
+        )
+        if previous:
+            await db.inbox_counters.update_one({"_id": previous["vendor_id"]}, {"$inc": {"unread": -1}})
+            return {**previous, "read": True}
+        inquiry = await db.inquiries.find_one({"id": inquiry_id}, {"_id": 0})
+        if not inquiry:
+            raise HTTPException(status_code=404, detail="Inquiry not found")
+        return inquiry
+
+    async def set_status(self, inquiry_id: str, status: str) -> Dict:
+        if status not in self.STATUSES:
+            raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(self.STATUSES)}")
+        previous = await db.inquiries.find_one_and_update(
+            {"id": inquiry_id, "status": {"$ne": status}},
+            {"$set": {"status": status}},
+            projection={"_id": 0}
+        )
+        if previous:
+            # Only transitions into or out of "pending" move the pending counter
+            delta = (status == "pending") - (previous["status"] == "pending")
+            if delta:
+                await db.inbox_counters.update_one({"_id": previous["vendor_id"]}, {"$inc": {"pending": delta}}, upsert=True)
+            return {**previous, "status": status}
+        inquiry = await db.inquiries.find_one({"id": inquiry_id}, {"_id": 0})
+        if not inquiry:
+            raise HTTPException(status_code=404, detail="Inquiry not found")
+        return inquiry
+
+    async def rebuild_counters(self) -> int:
+        """Recount every vendor's counters from `inquiries`"""
+        grouped = await db.inquiries.aggregate([
+            {"$group": {
+                "_id": "$vendor_id",
+                "unread": {"$sum": {"$cond": [{"$eq": ["$read", True]}, 0, 1]}},
+                "pending": {"$sum": {"$cond": [{"$eq": ["$status", "pending"]}, 1, 0]}}
+            }}
+        ]).to_list(None)
+        if grouped:
+            await db.inbox_counters.bulk_write([
+                UpdateOne({"_id": row["_id"]}, {"$set": {"unread": row["unread"], "pending": row["pending"]}}, upsert=True)
+                for row in grouped
+            ], ordered=False)
+        return len(grouped)
+
+vendor_inbox = VendorInbox()
+
+# Request Coalescing
+class SingleFlight:
+    """Shares one in-flight computation between concurrent callers with the same key"""
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: Dict[Any, asyncio.Task] = {}
+
+    async def do(self, key, func):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+            metrics.incr(f"singleflight_calls_total.{self.name}")
+        else:
+            metrics.incr(f"singleflight_shared_total.{self.name}")
+        # Shield so one cancelled caller does not cancel the shared computation
+        return await asyncio.shield(task)
+
+recommendation_flights = SingleFlight("recommendations")
+
+# User Profile Cache
+class UserProfileCache:
+    """Read-through LRU + TTL cache of the user fields read on every AI request.
+
+    Preference changes made by this worker invalidate the entry immediately
+    (see on_preferences_changed); changes made by other workers are picked
+    up within the TTL. A per-user generation counter stops a read that
+    started before an invalidation from caching the pre-change profile, and
+    an entry never replaces one with a newer preferences_version.
+    """
+    PROJECTION = {"_id": 0, "id": 1, "name": 1, "preferences": 1, "preferences_version": 1}
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self.generations: Dict[str, int] = {}
+        self.flights = SingleFlight("user_profiles")
+        self.hits = 0
+        self.misses = 0
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+            metrics.incr("user_cache_hits_total")
+        else:
+            self.misses += 1
+            metrics.incr("user_cache_misses_total")
+        metrics.set_gauge("user_cache_hit_rate", round(self.hits / (self.hits + self.misses), 4))
+
+    @staticmethod
+    def _copy(profile: Dict) -> Dict:
+        return {**profile, "preferences": dict(profile.get("preferences") or {})}
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        entry = self.entries.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            self.entries.move_to_end(user_id)
+            self._record(True)
+            return self._copy(entry[1])
+        self._record(False)
+        profile = await self.flights.do(user_id, lambda: self._load(user_id))
+        return self._copy(profile) if profile else None
+
+    async def _load(self, user_id: str) -> Optional[Dict]:
+        generation = self.generations.get(user_id, 0)
+        profile = await db.users.find_one({"id": user_id}, self.PROJECTION)
+        if profile and self.generations.get(user_id, 0) == generation:
+            self._store(user_id, profile)
+        return profile
+
+    def _store(self, user_id: str, profile: Dict):
+        current = self.entries.get(user_id)
+        if current and current[1].get("preferences_version", 0) > profile.get("preferences_version", 0):
+            return
+        self.entries[user_id] = (time.monotonic() + self.ttl_seconds, profile)
+        self.entries.move_to_end(user_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        metrics.set_gauge("user_cache_entries", len(self.entries))
+
+    def invalidate(self, user_id: str):
+        self.generations[user_id] = self.generations.get(user_id, 0) + 1
+        self.entries.pop(user_id, None)
+        metrics.incr("user_cache_invalidations_total")
+
+user_profiles = UserProfileCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+
+# Vendor Recommendation Engine
+def build_vendor_query(user_preferences: Dict, category: str = None, match_location: bool = True) -> Dict:
+    """Mongo filter matching vendors to a user's budget and location"""
+    budget = user_preferences.get('budget', 0)
+    location = user_preferences.get('location', '')
+    
+    query = {}
+    if category:
+        query['category'] = category
+    if location and match_location:
+        query['location'] = {'$regex': location, '$options': 'i'}
+    if budget > 0:
+        query['$and'] = [
+            {'pricing_range.min': {'$lte': budget}},
+            {'pricing_range.max': {'$gte': budget * 0.7}}  # Allow some flexibility
+        ]
+    return query
+
+async def get_vendor_recommendations(user_preferences: Dict, category: str = None, date_range: Optional[Tuple[date, date]] = None,
+                                     near: Optional[Tuple[float, float]] = None, radius_km: float = None):
+    """AI-powered vendor recommendation based on user preferences"""
+    # A distance search replaces the free-text location match
+    query = build_vendor_query(user_preferences, category, match_location=near is None)
+    # Only vendors free on the requested dates, defaulting to the wedding date
+    query.update(availability_calendar.free_vendor_filter(date_range or availability_calendar.wedding_date_range(user_preferences)))
+    
+    # Get vendors from database
+    vendors = await find_vendors(query, 10, near, radius_km)
+    if near:
+        return [Vendor(**vendor) for vendor in vendors]  # Keep distance order
+    return await apply_ai_ranking(vendors, user_preferences, category)
+
+async def get_vendor_recommendations_batch(user_preferences: Dict, categories: List[str], date_range: Optional[Tuple[date, date]] = None,
+                                           near: Optional[Tuple[float, float]] = None, radius_km: float = None) -> Dict[str, List[Vendor]]:
+    """Recommendations for several categories from a single $facet aggregation"""
+    shared_query = build_vendor_query(user_preferences, match_location=near is None)
+    shared_query['category'] = {'$in': categories}
+    shared_query.update(availability_calendar.free_vendor_filter(date_range or availability_calendar.wedding_date_range(user_preferences)))
+    # Facet names are positional since category names are client-provided
+    order = [] if near else [{'$sort': {'rating_score': -1, 'rating': -1}}]  # $geoNear output is already nearest first
+    facets = {
+        f"c{index}": [{'$match': {'category': category}}, *order, {'$limit': 10}]
+        for index, category in enumerate(categories)
+    }
+    first_stage = geo_near_stage(near, radius_km or DEFAULT_SEARCH_RADIUS_KM, shared_query) if near else {'$match': shared_query}
+    results = await catalog_db.vendors.aggregate([first_stage, {'$facet': facets}]).to_list(1)
+    grouped = results[0] if results else {}
+    
+    if near:
+        return {
+            category: [Vendor(**{**v, "distance_km": round(v["distance_km"], 2)}) for v in grouped.get(f"c{index}", [])]
+            for index, category in enumerate(categories)
+        }
+    ranked = await asyncio.gather(*[
+        apply_ai_ranking(grouped.get(f"c{index}", []), user_preferences, category)
+        for index, category in enumerate(categories)
+    ])
+    return dict(zip(categories, ranked))
+
+async def apply_ai_ranking(vendors: List[Dict], user_preferences: Dict, category: str = None) -> List[Vendor]:
+    """Order vendors by a stored AI ranking, queueing one if none exists yet"""
+    budget = user_preferences.get('budget', 0)
+    location = user_preferences.get('location', '')
+    style = user_preferences.get('style_preference', '')
+    guest_count = user_preferences.get('guest_count', 0)
+    
+    # AI ranking runs on the job queue; apply a stored ranking for this preference/vendor set
+    if vendors and GEMINI_API_KEY:
+        ranking_key = vendor_ranking_key(user_preferences, category, vendors)
+        ranking = await db.vendor_rankings.find_one({"key": ranking_key})
+        if ranking:
+            order = {name: position for position, name in enumerate(ranking["ranked_names"])}
+            vendors.sort(key=lambda v: order.get(v['business_name'], len(order)))
+        else:
+            try:
+                await job_queue.enqueue(
+                    "rank_vendors",
+                    {
+                        "ranking_key": ranking_key,
+                        "preferences": {
+                            "budget": budget,
+                            "location": location,
+                            "style_preference": style,
+                            "guest_count": guest_count
+                        },
+                        "vendor_ids": [v['id'] for v in vendors]
+                    },
+                    provider="gemini",
+                    dedupe_key=f"rank_vendors:{ranking_key}"
+                )
+            except Exception as e:
+                logging.error(f"AI ranking enqueue failed: {e}")
+    
+    return [Vendor(**vendor) for vendor in vendors]
+
+def vendor_ranking_key(user_preferences: Dict, category: Optional[str], vendors: List[Dict]) -> str:
+    key_data = {
+        "budget": user_preferences.get('budget', 0),
+        "location": user_preferences.get('location', ''),
+        "style": user_preferences.get('style_preference', ''),
+        "guest_count": user_preferences.get('guest_count', 0),
+        "category": category,
+        "vendor_ids": sorted(v['id'] for v in vendors)
+    }
+    return hashlib.sha1(json_module.dumps(key_data, sort_keys=True, default=str).encode()).hexdigest()
+
+@job_queue.handler("rank_vendors")
+async def rank_vendors_job(ranking_key: str, preferences: Dict, vendor_ids: List[str]):
+    """Rank candidate vendors with Gemini and store the order for reuse"""
+    vendors = await db.vendors.find({"id": {"$in": vendor_ids}}).to_list(len(vendor_ids))
+    if not vendors:
+        return None
+    
+    ranker_chat = new_llm_chat(
+        session_id=f"ranking_{uuid.uuid4()}",
+        system_message="You are an AI vendor ranking system. Rank vendors based on user preferences and provide personalized recommendations."
+    )
+    
+    vendor_data = [
+        {
+            'name': v['business_name'],
+            'category': v['category'],
+            'pricing': v['pricing_range'],
+            'rating': v.get('rating', 0),
+            'description': v['description'][:200],
+            'location': v['location']
+        }
+        for v in vendors
+    ]
+    
+    ranking_prompt = f"""
+    Rank these vendors for a wedding with:
+    Budget: ₹{preferences.get('budget') or 0:,}
+    Location: {preferences.get('location')}
+    Style: {preferences.get('style_preference')}
+    Guest Count: {preferences.get('guest_count')}
+    
+    Vendors: {vendor_data}
+    
+    Provide a ranked recommendation with brief reasons. Return as JSON with vendor names and ranking reasons.
+    """
+    
+    ranking_response = await llm_gateway.send(ranker_chat, ranking_prompt)
+    
+    # Order vendors by where the model first mentions them; unmentioned ones keep rating order
+    positions = {v['business_name']: ranking_response.find(v['business_name']) for v in vendors}
+    ranked_names = sorted(
+        (name for name, position in positions.items() if position >= 0),
+        key=lambda name: positions[name]
+    )
+    ranked_names += [v['business_name'] for v in sorted(vendors, key=lambda v: -v.get('rating', 0)) if positions[v['business_name']] < 0]
+    
+    await db.vendor_rankings.update_one(
+        {"key": ranking_key},
+        {"$set": {"ranked_names": ranked_names, "response": ranking_response, "created_at": datetime.utcnow()}},
+        upsert=True
+    )
+    # Precomputed recommendations served the rating order while this ran
+    updated = await recommendation_store.apply_ranking(ranking_key, ranked_names)
+    return {"ranked_names": ranked_names, "recommendations_updated": updated}
+
+# Vendor Reviews
+class VendorReviews:
+    """Review writes plus the running rating aggregate stored on each vendor.
+
+    Each review adds to the vendor's `rating_sum` and `total_reviews` and
+    recomputes `rating` and the Bayesian `rating_score` in one pipeline
+    update, so no read of the vendor's reviews is needed. Ratings carried
+    by vendors before reviews existed are kept as `imported_reviews` and
+    `imported_rating_sum`, which lets `recompute` rebuild the aggregate
+    from the reviews collection exactly.
+    """
+    def __init__(self, prior_rating: float, prior_weight: float, recompute_batch_size: int):
+        self.prior_rating = prior_rating
+        self.prior_weight = prior_weight
+        self.recompute_batch_size = recompute_batch_size
+
+    async def ensure_indexes(self):
+        await db.reviews.create_index([("vendor_id", 1), ("created_at", -1)])
+        await db.reviews.create_index([("vendor_id", 1), ("user_id", 1)], unique=True)
+        await db.vendors.create_index([("category", 1), ("rating_score", -1)])
+
+    def score(self, rating_sum: float, count: int) -> float:
+        return round((rating_sum + self.prior_rating * self.prior_weight) / (count + self.prior_weight), 4)
+
+    def aggregate_fields(self, rating_sum: float, count: int) -> Dict:
+        return {
+            "rating_sum": rating_sum,
+            "total_reviews": count,
+            "rating": round(rating_sum / count, 2) if count else 0.0,
+            "rating_score": self.score(rating_sum, count)
+        }
+
+    def derived_stage(self) -> Dict:
+        """Pipeline stage recomputing rating and rating_score from rating_sum and total_reviews"""
+        return {"$set": {
+            "rating": {"$cond": [
+                {"$gt": ["$total_reviews", 0]},
+                {"$round": [{"$divide": ["$rating_sum", "$total_reviews"]}, 2]},
+                0.0
+            ]},
+            "rating_score": {"$round": [{"$divide": [
+                {"$add": ["$rating_sum", self.prior_rating * self.prior_weight]},
+                {"$add": ["$total_reviews", self.prior_weight]}
+            ]}, 4]}
+        }}
+
+    async def add(self, vendor_id: str, review: ReviewCreate) -> Review:
+        if not await db.vendors.find_one({"id": vendor_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Vendor not found")
+        if not await user_profiles.get(review.user_id):
+            raise HTTPException(status_code=404, detail="User not found")
+        review_obj = Review(vendor_id=vendor_id, **review.dict())
+        try:
+            await db.reviews.insert_one(review_obj.dict())
+        except DuplicateKeyError:
+            raise HTTPException(status_code=409, detail="This user has already reviewed the vendor")
+        await db.vendors.update_one({"id": vendor_id}, [
+            {"$set": {
+                "rating_sum": {"$add": [{"$ifNull": ["$rating_sum", 0]}, review.rating]},
+                "total_reviews": {"$add": [{"$ifNull": ["$total_reviews", 0]}, 1]}
+            }},
+            self.derived_stage()
+        ])
+        metrics.incr("reviews_created_total")
+        return review_obj
+
+    async def page(self, vendor_id: str, limit: int, before: Optional[datetime] = None) -> List[Dict]:
+        """Newest first; pass the last item's created_at as `before` for the next page"""
+        query = {"vendor_id": vendor_id}
+        if before:
+            query["created_at"] = {"$lt": before}
+        return await db.reviews.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+
+    async def backfill_imported(self) -> int:
+        """Start the aggregate of vendors without one from their existing rating and review count"""
+        imported_sum = {"$multiply": [{"$ifNull": ["$rating", 0]}, {"$ifNull": ["$total_reviews", 0]}]}
+        result = await db.vendors.update_many({"rating_score": None}, [
+            {"$set": {
+                "imported_reviews": {"$ifNull": ["$total_reviews", 0]},
+                "imported_rating_sum": imported_sum,
+                "total_reviews": {"$ifNull": ["$total_reviews", 0]},
+                "rating_sum": imported_sum
+            }},
+            self.derived_stage()
+        ])
+        return result.modified_count
+
+    async def recompute(self, vendor_ids: Optional[List[str]] = None) -> int:
+        """Rebuild vendor aggregates from the reviews collection, repairing any drift"""
+        await self.backfill_imported()
+        match = {"vendor_id": {"$in": vendor_ids}} if vendor_ids else {}
+        totals = {
+            group["_id"]: group async for group in db.reviews.aggregate([
+                {"$match": match},
+                {"$group": {"_id": "$vendor_id", "sum": {"$sum": "$rating"}, "count": {"$sum": 1}}}
+            ])
+        }
+        query = {"id": {"$in": vendor_ids}} if vendor_ids else {}
+        projection = {"_id": 0, "id": 1, "imported_reviews": 1, "imported_rating_sum": 1,
+                      "rating_sum": 1, "total_reviews": 1, "rating_score": 1}
+        updated = 0
+        batch = []
+        async for vendor in db.vendors.find(query, projection).batch_size(self.recompute_batch_size):
+            group = totals.get(vendor["id"], {})
+            fields = self.aggregate_fields(
+                (vendor.get("imported_rating_sum") or 0) + group.get("sum", 0),
+                (vendor.get("imported_reviews") or 0) + group.get("count", 0)
+            )
+            if any(vendor.get(key) != fields[key] for key in ("rating_sum", "total_reviews", "rating_score")):
+                batch.append(UpdateOne({"id": vendor["id"]}, {"$set": fields}))
+            if len(batch) >= self.recompute_batch_size:
+                updated += (await db.vendors.bulk_write(batch, ordered=False)).modified_count
+                batch = []
+        if batch:
+            updated += (await db.vendors.bulk_write(batch, ordered=False)).modified_count
+        metrics.incr("vendor_ratings_repaired_total", updated)
+        if updated:
+            await recommendation_store.bump_catalog_version()
+        return updated
+
+vendor_reviews = VendorReviews(REVIEW_PRIOR_RATING, REVIEW_PRIOR_WEIGHT, REVIEW_RECOMPUTE_BATCH_SIZE)
+
+@job_queue.handler("recompute_vendor_ratings")
+async def recompute_vendor_ratings_job(vendor_ids: Optional[List[str]] = None):
+    return {"vendors": await vendor_reviews.recompute(vendor_ids)}
+
+# Portfolio Images
+class LocalObjectStore:
+    """Objects as files under a local directory, served by GET /api/media/{key}"""
+    def __init__(self, root: Path, url_prefix: str = "/api/media"):
+        self.root = root.resolve()
+        self.url_prefix = url_prefix
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+    def write(self, key: str, data: bytes):
+        path = self.path(key)
+        if path.exists():  # Keys are content-addressed, so an existing object is identical
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+    async def put(self, key: str, data: bytes, content_type: str):
+        await asyncio.to_thread(self.write, key, data)
+
+class S3ObjectStore:
+    """Objects in an S3 bucket, served from `public_url` (usually a CDN in front of the bucket)"""
+    def __init__(self, bucket: str, public_url: str):
+        import boto3
+        self.client = boto3.client("s3")
+        self.bucket = bucket
+        self.public_url = public_url.rstrip("/")
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    async def put(self, key: str, data: bytes, content_type: str):
+        await asyncio.to_thread(
+            self.client.put_object,
+            Bucket=self.bucket,
+            Key=key,
+            Body=data,
+            ContentType=content_type,
+            CacheControl=PortfolioImages.CACHE_CONTROL
+        )
+
+class ImageTooLargeError(ValueError):
+    """Raised when an upload decodes to more pixels than portfolio images allow"""
+
+def render_portfolio_image(data: bytes, widths: Tuple[int, ...], max_pixels: int) -> Dict:
+    """Validate an upload and render its WebP thumbnails; runs in the media process pool"""
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            image_format = original.format
+            if image_format not in PortfolioImages.FORMATS:
+                raise ValueError(f"Unsupported image format: {image_format}")
+            # Opening only reads the header, so this runs before any pixels are decoded
+            if original.size[0] * original.size[1] > max_pixels:
+                raise ImageTooLargeError(f"Images are limited to {max_pixels} pixels")
+            # Dimensions as displayed, after applying the EXIF orientation
+            image = ImageOps.exif_transpose(original)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    except OSError as e:
+        raise ValueError(f"Unreadable image: {e}")
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+    width, height = image.size
+    thumbnails = []
+    for target in sorted(set(widths)):
+        # Images narrower than a thumbnail width get one thumbnail at their own size
+        scaled = image if target >= width else image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+        buffer = io.BytesIO()
+        scaled.save(buffer, "WEBP", quality=80, method=4)
+        thumbnails.append({"width": scaled.width, "height": scaled.height, "data": buffer.getvalue()})
+        if target >= width:
+            break
+    return {"format": image_format, "width": width, "height": height, "thumbnails": thumbnails}
+
+class PortfolioImages:
+    """Vendor portfolio uploads: content-addressed originals plus resized WebP thumbnails.
+
+    Decoding and resizing run in a process pool so large photos do not
+    block the event loop. Object keys embed the content hash, so every URL
+    is immutable and served with a year-long cache lifetime. Dimensions are
+    stored with each image so the grid can reserve space before loading.
+    """
+    FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+    CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+    def __init__(self, store, widths: Tuple[int, ...], max_upload_bytes: int, max_pixels: int, workers: int):
+        self.store = store
+        self.widths = widths
+        self.max_upload_bytes = max_upload_bytes
+        self.max_pixels = max_pixels
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    async def render(self, data: bytes) -> Dict:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        started = time.perf_counter()
+        rendered = await asyncio.get_running_loop().run_in_executor(
+            self.executor, render_portfolio_image, data, self.widths, self.max_pixels
+        )
+        metrics.observe("portfolio_render_ms", (time.perf_counter() - started) * 1000)
+        return rendered
+
+    async def add(self, vendor_id: str, data: bytes) -> PortfolioImage:
+        if not await db.vendors.find_one({"id": vendor_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Vendor not found")
+        if not data:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        if len(data) > self.max_upload_bytes:
+            raise HTTPException(status_code=413, detail=f"Images are limited to {self.max_upload_bytes // (1024 * 1024)} MB")
+
+        digest = hashlib.sha256(data).hexdigest()[:24]
+        existing = await db.vendors.find_one({"id": vendor_id, "portfolio.id": digest}, {"_id": 0, "portfolio.$": 1})
+        if existing:
+            return PortfolioImage(**existing["portfolio"][0])
+        try:
+            rendered = await self.render(data)
+        except ImageTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        prefix = f"portfolio/{vendor_id}/{digest}"
+        original_key = f"{prefix}.{self.FORMATS[rendered['format']]}"
+        content_type = f"image/{rendered['format'].lower()}"
+        await self.store.put(original_key, data, content_type)
+        thumbnails = []
+        for thumbnail in rendered["thumbnails"]:
+            key = f"{prefix}-{thumbnail['width']}w.webp"
+            await self.store.put(key, thumbnail["data"], "image/webp")
+            thumbnails.append(PortfolioThumbnail(url=self.store.url(key), width=thumbnail["width"], height=thumbnail["height"]))
+
+        image = PortfolioImage(
+            id=digest,
+            url=self.store.url(original_key),
+            content_type=content_type,
+            width=rendered["width"],
+            height=rendered["height"],
+            thumbnails=thumbnails
+        )
+        # The same image uploaded twice concurrently is only added once
+        result = await db.vendors.update_one(
+            {"id": vendor_id, "portfolio.id": {"$ne": digest}},
+            {"$push": {"portfolio": image.dict(), "portfolio_images": image.url}}
+        )
+        if result.modified_count:
+            metrics.incr("portfolio_images_uploaded_total")
+            await recommendation_store.bump_catalog_version()
+        return image
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+media_store = S3ObjectStore(MEDIA_S3_BUCKET, MEDIA_PUBLIC_URL) if MEDIA_STORE == "s3" else LocalObjectStore(MEDIA_DIR)
+portfolio_images = PortfolioImages(
+    media_store,
+    MEDIA_THUMBNAIL_WIDTHS,
+    MEDIA_MAX_UPLOAD_BYTES,
+    MEDIA_MAX_PIXELS,
+    MEDIA_PROCESS_WORKERS
+)
+
+# Vendor Bundle Optimizer
+class BundleOptimizer:
+    """Picks one vendor per category within a total budget (multiple-choice knapsack).
+
+    Costs are counted in units of the gcd of the prices, so the DP is exact,
+    unless that needs more than `budget_steps` units (see `discretize`).
+    Before the DP, a vendor is dropped when `top_n` others in its category
+    are no more expensive and at least as good, since it cannot appear in
+    any of the top-N bundles. The
+    DP keeps the N best partial bundles for every exact spend, one numpy pass
+    per category, and backtracks the N best overall.
+    """
+    PER_PLATE_CATEGORIES = {"Catering"}
+    PRICE_BASES = ("min", "mid", "max")
+    VERIFIED_BONUS = 0.1
+
+    def __init__(self, budget_steps: int):
+        self.budget_steps = budget_steps
+
+    def candidates(self, vendors: List[Dict], per_plate: bool, budget: float, guest_count: int,
+                   price_basis: str, weight: float, keep: int) -> List[Tuple[float, float, Dict]]:
+        """(cost, utility, vendor) for the vendors that can appear in the `keep` best bundles"""
+        import numpy as np
+
+        pricing = [vendor.get("pricing_range") or {} for vendor in vendors]
+        low = np.array([p.get("min") for p in pricing], dtype=float)  # Missing prices become NaN
+        high = np.array([p.get("max") for p in pricing], dtype=float)
+        low, high = np.where(np.isnan(low), high, low), np.where(np.isnan(high), low, high)
+        cost = {"min": low, "max": high}.get(price_basis, (low + high) / 2)
+        if per_plate:
+            cost = cost * max(guest_count, 1)
+
+        # Ratings backed by few reviews are pulled towards the prior
+        score = np.array([vendor.get("rating_score") for vendor in vendors], dtype=float)
+        missing = np.isnan(score)
+        if missing.any():
+            reviews = np.array([vendor.get("total_reviews") or 0 for vendor in vendors], dtype=float)
+            rating = np.array([vendor.get("rating") or 0 for vendor in vendors], dtype=float)
+            prior = (rating * reviews + vendor_reviews.prior_rating * vendor_reviews.prior_weight) / (reviews + vendor_reviews.prior_weight)
+            score = np.where(missing, np.round(prior, 4), score)
+        verified = np.array([bool(vendor.get("verified")) for vendor in vendors])
+        utility = weight * (score + self.VERIFIED_BONUS * verified)
+
+        indices = np.flatnonzero(~np.isnan(cost) & (cost <= budget))
+        # Only the first `keep` Pareto layers (cheapest first) can hold vendors not dominated by `keep` others
+        order = indices[np.lexsort((-utility[indices], cost[indices]))]
+        layered = []
+        for _ in range(keep):
+            if not len(order):
+                break
+            values = utility[order]
+            best_before = np.concatenate(([-np.inf], np.maximum.accumulate(values)[:-1]))
+            frontier = values > best_before
+            layered.append(order[frontier])
+            order = order[~frontier]
+        items = [(float(cost[index]), float(utility[index]), vendors[index]) for index in np.concatenate(layered or [indices])]
+        return self.prune(items, keep)
+
+    @staticmethod
+    def prune(items: List[tuple], keep: int) -> List[tuple]:
+        """Drop items dominated (cheaper-or-equal and better-or-equal) by `keep` others"""
+        kept, best = [], []
+        for item in sorted(items, key=lambda item: (item[0], -item[1])):
+            if len(best) < keep:
+                heapq.heappush(best, item[1])
+            elif item[1] > best[0]:
+                heapq.heapreplace(best, item[1])
+            else:
+                continue
+            kept.append(item)
+        return kept
+
+    def discretize(self, layers: List[List[tuple]], budget: float) -> Tuple[int, List[List[tuple]]]:
+        """Budget steps and (units, utility, cost, vendor) layers.
+
+        Units are the gcd of all prices (in paise) whenever the budget fits in
+        `budget_steps` of them, which makes the DP exact. Otherwise the budget
+        is split into `budget_steps` units and costs round up, so bundles
+        never exceed the budget but one within a unit per category of it can
+        be missed.
+        """
+        import numpy as np
+
+        paise = [[int(round(cost * 100)) for cost, _, _ in items] for items in layers]
+        unit = max(int(np.gcd.reduce(np.array([p for row in paise for p in row], dtype=np.int64))), 1)
+        steps = int(math.floor(budget * 100 + 1e-6)) // unit
+        if steps <= self.budget_steps:
+            return steps, [
+                [(p // unit, utility, cost, vendor) for p, (cost, utility, vendor) in zip(row, items)]
+                for row, items in zip(paise, layers)
+            ]
+        unit = budget / self.budget_steps
+        return self.budget_steps, [
+            [(math.ceil(round(cost / unit, 9)), utility, cost, vendor) for cost, utility, vendor in items]
+            for items in layers
+        ]
+
+    def solve(self, vendors_by_category: Dict[str, List[Dict]], budget: float, guest_count: int = 0,
+              top_n: int = 3, price_basis: str = "min", weights: Dict[str, float] = None) -> Tuple[List[Dict], int]:
+        """Top bundles (best first) and the number of candidates left after pruning"""
+        import numpy as np
+
+        weights = weights or {}
+        layers = []
+        for category, vendors in vendors_by_category.items():
+            items = self.candidates(vendors, category in self.PER_PLATE_CATEGORIES, budget, guest_count,
+                                    price_basis, weights.get(category, 1.0), top_n)
+            if not items:
+                return [], 0
+            layers.append(items)
+        steps, layers = self.discretize(layers, budget)
+        
+        # Nothing can be more expensive than the budget left after the cheapest pick elsewhere
+        cheapest = [min(item[0] for item in items) for items in layers]
+        slack = steps - sum(cheapest)
+        if slack < 0:
+            return [], 0
+        layers = [[item for item in items if item[0] - low <= slack] for items, low in zip(layers, cheapest)]
+        
+        dp = np.full((steps + 1, top_n), -np.inf)
+        dp[0, 0] = 0.0
+        choices = []
+        for items in layers:
+            candidates = np.full((steps + 1, len(items), top_n), -np.inf)
+            for index, (units, utility, _, _) in enumerate(items):
+                candidates[units:, index, :] = dp[:steps + 1 - units] + utility
+            flat = candidates.reshape(steps + 1, len(items) * top_n)
+            if flat.shape[1] > top_n:
+                best = np.argpartition(-flat, top_n - 1, axis=1)[:, :top_n]
+            else:
+                best = np.broadcast_to(np.arange(top_n), (steps + 1, top_n))
+            values = np.take_along_axis(flat, best, axis=1)
+            order = np.argsort(-values, axis=1, kind="stable")
+            best = np.take_along_axis(best, order, axis=1)
+            dp = np.take_along_axis(values, order, axis=1)
+            choices.append((best // top_n, best % top_n))
+        
+        totals = dp.ravel()
+        finite = np.flatnonzero(np.isfinite(totals))
+        bundles = []
+        for position in finite[np.argsort(-totals[finite], kind="stable")[:top_n]]:
+            spend, rank = divmod(int(position), top_n)
+            picks = []
+            for items, (item_index, previous_rank) in zip(reversed(layers), reversed(choices)):
+                units, _, cost, vendor = items[int(item_index[spend, rank])]
+                rank = int(previous_rank[spend, rank])
+                spend -= units
+                picks.append((cost, vendor))
+            picks.reverse()
+            bundles.append({
+                "total_cost": round(sum(cost for cost, _ in picks), 2),
+                "utility": round(float(totals[position]), 4),
+                "vendors": [
+                    {
+                        "category": category,
+                        "vendor_id": vendor.get("id"),
+                        "business_name": vendor.get("business_name"),
+                        "estimated_cost": round(cost, 2),
+                        "rating": vendor.get("rating", 0)
+                    }
+                    for category, (cost, vendor) in zip(vendors_by_category, picks)
+                ]
+            })
+        return bundles, sum(len(items) for items in layers)
+
+bundle_optimizer = BundleOptimizer(OPTIMIZER_BUDGET_STEPS)
+
+# Wedding Timeline Engine
+class TimelineEngine:
+    """Dated planning milestones scheduled backwards from the wedding date.
+
+    Each milestone has an ideal and a latest lead time (days before the
+    wedding); vendor bookings only apply when their category is planned.
+    When the wedding is closer than the ideal leads allow, all leads shrink
+    by the same factor towards their latest values, and prerequisites are
+    pushed earlier so they still precede their dependents. Anything that
+    cannot fit is due immediately and flagged urgent.
+
+    Schedules are relative, so they are memoized per (horizon bucket,
+    categories) and shared by every plan in the bucket. Bump RULES_VERSION
+    when MILESTONES change; stored timelines with an older version are
+    regenerated in bulk.
+    """
+    RULES_VERSION = 1
+    # id, task, vendor category, ideal days before, latest days before, prerequisites
+    MILESTONES = [
+        ("set_budget", "Set budget", None, 365, 7, ()),
+        ("guest_list", "Create guest list", None, 350, 7, ("set_budget",)),
+        ("book_venue", "Book venue", "Venue", 330, 45, ("set_budget", "guest_list")),
+        ("book_photographer", "Book photographer", "Photography", 270, 30, ("book_venue",)),
+        ("book_caterer", "Book caterer", "Catering", 240, 30, ("book_venue", "guest_list")),
+        ("save_the_dates", "Send save the dates", None, 240, 45, ("book_venue", "guest_list")),
+        ("book_decorator", "Book decorator", "Decoration", 180, 21, ("book_venue",)),
+        ("book_music", "Book music and entertainment", "Music", 180, 21, ("book_venue",)),
+        ("wedding_outfits", "Buy wedding outfits", "Clothing", 180, 21, ()),
+        ("plan_honeymoon", "Plan honeymoon", None, 180, 14, ()),
+        ("choose_jewelry", "Choose jewelry", "Jewelry", 150, 14, ()),
+        ("book_makeup", "Book makeup artist", "Makeup", 150, 14, ()),
+        ("order_invitations", "Order invitations", "Invitations", 120, 30, ("guest_list", "book_venue")),
+        ("send_invitations", "Send invitations", None, 90, 21, ("order_invitations", "book_venue")),
+        ("book_transport", "Book transportation", "Transportation", 90, 7, ("book_venue",)),
+        ("menu_tasting", "Menu tasting", None, 60, 10, ("book_caterer",)),
+        ("final_guest_count", "Final guest count", None, 30, 7, ("send_invitations",)),
+        ("final_fittings", "Final fittings", None, 21, 3, ("wedding_outfits",)),
+        ("confirm_vendors", "Confirm all vendors", None, 14, 2, (
+            "book_venue", "book_photographer", "book_caterer", "book_decorator", "book_music",
+            "book_makeup", "book_transport"
+        )),
+        ("final_payments", "Final payments", None, 7, 1, ("confirm_vendors",)),
+        ("rehearsal", "Rehearsal", None, 2, 1, ("confirm_vendors",)),
+    ]
+    DEPENDENCY_GAP_DAYS = 7
+    CATEGORIES = frozenset(category for _, _, category, _, _, _ in MILESTONES if category)
+
+    def __init__(self, cache_size: int):
+        self.schedule = functools.lru_cache(maxsize=cache_size)(self._schedule)
+
+    @staticmethod
+    def horizon_bucket(days: int) -> int:
+        # Day precision close to the wedding, weekly further out; rounding down keeps every lead within reach
+        days = max(days, 0)
+        return days if days < 60 else days - days % 7
+
+    @staticmethod
+    def describe(lead_days: int) -> str:
+        if lead_days >= 60:
+            return f"{lead_days // 30} months before"
+        if lead_days >= 14:
+            return f"{lead_days // 7} weeks before"
+        if lead_days == 0:
+            return "wedding day"
+        return f"{lead_days} day{'s' if lead_days != 1 else ''} before"
+
+    def _leads(self, milestones: List[tuple], scale: float) -> Dict[str, int]:
+        """Lead days at a compression scale (1 = ideal, 0 = latest), respecting prerequisites"""
+        included = {m[0] for m in milestones}
+        lead = {m[0]: round(m[4] + (m[3] - m[4]) * scale) for m in milestones}
+        gap = max(1, round(self.DEPENDENCY_GAP_DAYS * scale))
+        # MILESTONES lists prerequisites first, so walking backwards settles dependents before their prerequisites
+        for milestone_id, _, _, _, _, prerequisites in reversed(milestones):
+            for prerequisite in prerequisites:
+                if prerequisite in included:
+                    lead[prerequisite] = max(lead[prerequisite], lead[milestone_id] + gap)
+        return lead
+
+    def _schedule(self, horizon: int, categories: frozenset) -> Tuple[bool, Tuple[tuple, ...]]:
+        """(compressed, milestones as (id, task, category, lead days, urgent, prerequisites))"""
+        milestones = [m for m in self.MILESTONES if m[2] is None or m[2] in categories]
+        included = {m[0] for m in milestones}
+        lead = self._leads(milestones, 1.0)
+        compressed = max(lead.values()) > horizon
+        if compressed:
+            # Leads grow with the scale, so bisect for the least compression that fits the horizon
+            low, high = 0.0, 1.0
+            for _ in range(12):
+                middle = (low + high) / 2
+                if max(self._leads(milestones, middle).values()) <= horizon:
+                    low = middle
+                else:
+                    high = middle
+            lead = self._leads(milestones, low)
+        return compressed, tuple(
+            (
+                milestone_id, task, category, min(lead[milestone_id], horizon), lead[milestone_id] > horizon,
+                tuple(p for p in prerequisites if p in included)
+            )
+            for milestone_id, task, category, _, _, prerequisites in milestones
+        )
+
+    def build(self, wedding_date: datetime, categories: Optional[List[str]] = None, today: Optional[date] = None) -> Dict:
+        today = today or datetime.utcnow().date()
+        wedding_day = wedding_date.date()
+        horizon = self.horizon_bucket((wedding_day - today).days)
+        planned = frozenset(categories or ()) & self.CATEGORIES or self.CATEGORIES
+        compressed, milestones = self.schedule(horizon, planned)
+        entries = []
+        for milestone_id, task, category, lead_days, urgent, prerequisites in milestones:
+            due = wedding_day - timedelta(days=lead_days)
+            entries.append({
+                "id": milestone_id,
+                "task": task,
+                "category": category,
+                "due_date": datetime(due.year, due.month, due.day),
+                "window": self.describe(lead_days),
+                "urgent": urgent,
+                "depends_on": list(prerequisites)
+            })
+        entries.sort(key=lambda entry: entry["due_date"])
+        return {
+            "rules_version": self.RULES_VERSION,
+            "generated_on": datetime(today.year, today.month, today.day),
+            "horizon_days": (wedding_day - today).days,
+            "compressed": compressed,
+            "milestones": entries
+        }
+
+    async def regenerate_outdated(self, batch_size: int = TIMELINE_REGENERATE_BATCH_SIZE) -> int:
+        """Rebuild stored timelines generated under older rules"""
+        updated = 0
+        today = datetime.utcnow().date()
+        cursor = db.wedding_plans.find(
+            {"timeline.rules_version": {"$ne": self.RULES_VERSION}},
+            {"_id": 0, "id": 1, "wedding_date": 1, "categories": 1}
+        ).batch_size(batch_size)
+        batch = []
+        async for plan in cursor:
+            batch.append(UpdateOne(
+                {"id": plan["id"]},
+                {"$set": {"timeline": self.build(plan["wedding_date"], plan.get("categories"), today)}}
+            ))
+            if len(batch) >= batch_size:
+                updated += (await db.wedding_plans.bulk_write(batch, ordered=False)).modified_count
+                batch = []
+        if batch:
+            updated += (await db.wedding_plans.bulk_write(batch, ordered=False)).modified_count
+        metrics.incr("timelines_regenerated_total", updated)
+        return updated
+
+timeline_engine = TimelineEngine(TIMELINE_CACHE_SIZE)
+
+@job_queue.handler("regenerate_timelines")
+async def regenerate_timelines_job():
+    return {"plans": await timeline_engine.regenerate_outdated()}
+
+# Response Compression
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (encoding, body digest), bounded by total compressed bytes"""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        compressed = self.entries.get(key)
+        if compressed is not None:
+            self.entries.move_to_end(key)
+        return compressed
+
+    def put(self, key: Tuple[str, bytes], compressed: bytes):
+        if len(compressed) > self.max_bytes // 8 or key in self.entries:
+            return
+        self.entries[key] = compressed
+        self.size += len(compressed)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class BrotliStream:
+    """Adapts brotli.Compressor to the zlib compressobj interface"""
+    def __init__(self, compressor):
+        self.compressor = compressor
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self.compressor.process(chunk)
+
+    def flush(self) -> bytes:
+        return self.compressor.finish()
+
+
+class CompressionMiddleware:
+    """gzip/brotli response compression for browser clients.
+
+    Bodies under `minimum_size` and already-encoded or non-text responses
+    pass through untouched. Small and medium bodies are compressed in one
+    go, and identical bodies (repeat hits on listings, market data, cached
+    chat answers) reuse stored compressed bytes. Bodies above
+    `stream_threshold`, and streaming responses, are compressed
+    incrementally and sent chunked. Brotli is used when the optional
+    `brotli` package is installed and the client accepts it.
+    """
+    COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+    STREAM_CHUNK_BYTES = 64 * 1024
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES, stream_threshold: int = COMPRESSION_STREAM_THRESHOLD_BYTES,
+                 cache_max_bytes: int = COMPRESSION_CACHE_MAX_BYTES, gzip_level: int = COMPRESSION_GZIP_LEVEL,
+                 brotli_quality: int = COMPRESSION_BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.stream_threshold = stream_threshold
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = CompressedBodyCache(cache_max_bytes)
+        self._brotli = None
+
+    @property
+    def brotli(self):
+        if self._brotli is None:
+            try:
+                import brotli
+                self._brotli = brotli
+            except ImportError:  # gzip only without the optional brotli package
+                self._brotli = False
+        return self._brotli
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        accepted = {}
+        for part in accept_encoding.lower().split(","):
+            name, _, params = part.strip().partition(";")
+            quality = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[name.strip()] = quality
+        if accepted.get("br", 0) > 0 and self.brotli:
+            return "br"
+        if accepted.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    def compressor(self, encoding: str):
+        """Incremental compressor exposing compress(chunk) and flush()"""
+        if encoding == "br":
+            return BrotliStream(self.brotli.Compressor(quality=self.brotli_quality))
+        return zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        key = (encoding, hashlib.sha1(body).digest())
+        compressed = self.cache.get(key)
+        if compressed is not None:
+            metrics.incr("compression_cache_hits_total")
+            return compressed
+        if encoding == "br":
+            compressed = self.brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, self.gzip_level, mtime=0)
+        self.cache.put(key, compressed)
+        metrics.incr("compression_cache_misses_total")
+        return compressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self.negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        stream = None  # Incremental compressor once streaming has begun
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, stream, passthrough
+            if message["type"] == "http.response.start":
+                # Copy the headers so edits never leak into a response object that is sent again
+                start_message = {**message, "headers": list(message.get("headers", []))}
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            if stream is not None:
+                chunk = stream.compress(message.get("body", b""))
+                more_body = message.get("more_body", False)
+                if not more_body:
+                    chunk += stream.flush()
+                if chunk or not more_body:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            # First body message: decide how to respond
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            content_type = headers.get("content-type", "")
+            if (
+                "content-encoding" in headers
+                or start_message["status"] in (204, 304)
+                or not content_type.startswith(self.COMPRESSIBLE_TYPES)
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            metrics.incr(f"compressed_responses_total.{encoding}")
+            if not more_body and len(body) <= self.stream_threshold:
+                compressed = self.compress(body, encoding)
+                headers["Content-Length"] = str(len(compressed))
+                metrics.observe("compression_ratio", round(len(compressed) / len(body), 3))
+                await send(start_message)
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Large or streaming bodies go out chunked as they are compressed
+            del headers["Content-Length"]
+            stream = self.compressor(encoding)
+            await send(start_message)
+            for offset in range(0, len(body), self.STREAM_CHUNK_BYTES):
+                chunk = stream.compress(body[offset:offset + self.STREAM_CHUNK_BYTES])
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            if not more_body:
+                await send({"type": "http.response.body", "body": stream.flush(), "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
+
+# Client Addresses
+class TrustedProxies:
+    """Finds the client address of requests that arrive through our own reverse proxies"""
+    def __init__(self, spec: str):
+        self.networks = [ipaddress.ip_network(network.strip(), strict=False) for network in spec.split(",") if network.strip()]
+
+    def is_trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.networks)
+
+    def client_ip(self, scope) -> str:
+        """The peer address, or the nearest untrusted hop in X-Forwarded-For when the peer is a trusted proxy"""
+        client = scope.get("client")
+        ip = client[0] if client else "unknown"
+        if not self.is_trusted(ip):
+            return ip
+        forwarded = ",".join(Headers(scope=scope).getlist("x-forwarded-for"))
+        # Walk right to left: entries left of the first untrusted hop can be set by the client
+        for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+            ip = hop
+            if not self.is_trusted(hop):
+                break
+        return ip
+
+# Idempotency Keys
+class IdempotencyMiddleware:
+    """Replays the stored response for POST retries that carry the same `Idempotency-Key` header.
+
+    The first request reserves the key in `idempotency_keys` (TTL-indexed),
+    runs the handler and stores its status and body. A retry with the same
+    key and payload gets the stored response back without re-running the
+    handler (or calling Gemini); the same key with a different payload is
+    rejected with 422, and a retry that arrives while the original is still
+    running gets 409. Server errors release the key so the retry runs again.
+    Keys are scoped to the caller, the body's user id or else the client IP,
+    so two clients picking the same key never see each other's responses.
+    """
+    ROUTES = re.compile(r"^/api/(users|vendors|vendors/[^/]+/reviews|inquiries|inquiries/batch|wedding-plans|chat)/?$")
+    MAX_KEY_LENGTH = 255
+
+    def __init__(self, app, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS, lock_seconds: int = IDEMPOTENCY_LOCK_SECONDS,
+                 trusted_proxies: str = RATE_LIMIT_TRUSTED_PROXIES):
+        self.app = app
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.proxies = TrustedProxies(trusted_proxies)
+
+    @staticmethod
+    async def ensure_indexes():
+        await db.idempotency_keys.create_index("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+
+    async def reserve(self, record_id: str, request_hash: str) -> Optional[Dict]:
+        """None when this request now owns the key, otherwise the existing record"""
+        now = datetime.utcnow()
+        try:
+            await db.idempotency_keys.insert_one({
+                "_id": record_id,
+                "request_hash": request_hash,
+                "status": "in_progress",
+                "locked_until": now + timedelta(seconds=self.lock_seconds),
+                "created_at": now
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+        # Take over keys abandoned by a request that never finished
+        taken = await db.idempotency_keys.find_one_and_update(
+            {"_id": record_id, "status": "in_progress", "request_hash": request_hash, "locked_until": {"$lt": now}},
+            {"$set": {"locked_until": now + timedelta(seconds=self.lock_seconds)}}
+        )
+        if taken:
+            return None
+        return await db.idempotency_keys.find_one({"_id": record_id}) or {"status": "in_progress", "request_hash": request_hash}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not self.ROUTES.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        key = Headers(scope=scope).get("idempotency-key")
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > self.MAX_KEY_LENGTH:
+            await JSONResponse({"detail": "Idempotency-Key is too long"}, status_code=400)(scope, receive, send)
+            return
+
+        # Buffer the request body to fingerprint it, then hand it on unchanged
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        # The same identity the rate limiter keys on
+        user_id = RateLimitMiddleware.body_user_id(scope, body)
+        caller = f"user:{user_id}" if user_id else f"ip:{self.proxies.client_ip(scope)}"
+        record_id = f"POST {scope['path'].rstrip('/')} {caller} {key}"
+        request_hash = hashlib.sha256(body).hexdigest()
+
+        existing = await self.reserve(record_id, request_hash)
+        if existing is not None:
+            if existing["request_hash"] != request_hash:
+                metrics.incr("idempotency_conflicts_total")
+                response = JSONResponse({"detail": "Idempotency-Key was already used with a different request"}, status_code=422)
+            elif existing["status"] != "completed":
+                metrics.incr("idempotency_in_progress_total")
+                response = JSONResponse({"detail": "A request with this Idempotency-Key is still being processed"},
+                                        status_code=409, headers={"Retry-After": "1"})
+            else:
+                metrics.incr("idempotency_replays_total")
+                response = Response(
+                    content=existing["body"],
+                    status_code=existing["status_code"],
+                    media_type=existing.get("media_type"),
+                    headers={"Idempotent-Replayed": "true"}
+                )
+            await response(scope, receive, send)
+            return
 
-Your enhanced capabilities:
-1. Wedding Planning: Budget allocation, timeline creation, vendor recommendations
-2. Style Consultation: Latest 2025 wedding trends and styles  
-3. Vendor Matching: Real-time vendor availability and pricing
-4. Market Research: Current pricing from online sources
-5. Weather Integration: Seasonal considerations for wedding dates
-6. Trend Analysis: Latest wedding styles and preferences
+        body_sent = False
 
-User Context: {user_context or 'New conversation'}
+        async def replay_body():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
 
-IMPORTANT: When users ask about specific locations, current prices, vendor availability, or trends, you should search for real-time information to provide accurate, up-to-date responses.
+        status_code = 500
+        media_type = None
+        response_chunks = []
+        stored = False
 
-Guidelines:
-- Use web search for current pricing, trends, and availability
-- Provide specific vendor recommendations with real market rates
-- Include seasonal pricing variations and booking timelines
-- Suggest trending wedding themes and styles from 2025
-- Consider weather patterns for outdoor wedding planning
-- Focus on the zero-commission advantage of this platform
-- Always provide actionable, current information
+        async def capture(message):
+            nonlocal status_code, media_type, stored
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                media_type = Headers(raw=message.get("headers", [])).get("content-type")
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+            # Stored as soon as the response is complete, before any background tasks run
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and status_code < 500:
+                await db.idempotency_keys.update_one(
+                    {"_id": record_id},
+                    {"$set": {
+                        "status": "completed",
+                        "status_code": status_code,
+                        "media_type": media_type,
+                        "body": b"".join(response_chunks)
+                    }, "$unset": {"locked_until": ""}}
+                )
+                stored = True
 
-Respond with enthusiasm while being practical and data-driven with real-time insights."""
+        try:
+            await self.app(scope, replay_body, capture)
+        finally:
+            if not stored:
+                await db.idempotency_keys.delete_one({"_id": record_id})
 
-        chat = LlmChat(
-            api_key=self.api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("gemini", "gemini-2.0-flash")
-        
-        return chat
+# Request Rate Limiting
+class RateLimitPolicy(BaseModel):
+    """Token bucket allowing `capacity` requests per `period_seconds` for each key"""
+    name: str
+    path: str  # Regex matched against the request path
+    methods: Optional[List[str]] = None  # None matches every method
+    key: str = "ip"  # "user" (falls back to the client IP) or "ip"
+    capacity: float
+    period_seconds: float
 
-    async def get_chat_instance(self, session_id: str, user_context: Dict = None):
-        """Legacy method - redirect to enhanced version"""
-        return await self.get_enhanced_chat_instance(session_id, user_context)
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period_seconds
 
-ai_planner = AIWeddingPlanner()
+class MemoryRateLimitStore:
+    """Token buckets held in this process; each worker enforces its own limits"""
+    def __init__(self, max_buckets: int = RATE_LIMIT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
 
-# Vendor Recommendation Engine
-async def get_vendor_recommendations(user_preferences: Dict, category: str = None):
-    """AI-powered vendor recommendation based on user preferences"""
-    budget = user_preferences.get('budget', 0)
-    location = user_preferences.get('location', '')
-    style = user_preferences.get('style_preference', '')
-    guest_count = user_preferences.get('guest_count', 0)
-    
-    # Build query filters
-    query = {}
-    if category:
-        query['category'] = category
-    if location:
-        query['location'] = {'$regex': location, '$options': 'i'}
-    if budget > 0:
-        query['$and'] = [
-            {'pricing_range.min': {'$lte': budget}},
-            {'pricing_range.max': {'$gte': budget * 0.7}}  # Allow some flexibility
-        ]
-    
-    # Get vendors from database
-    vendors = await db.vendors.find(query).sort('rating', -1).limit(10).to_list(10)
-    
-    # Use AI to rank and personalize recommendations
-    if vendors and GEMINI_API_KEY:
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> Tuple[bool, float]:
+        """Consume one token; returns (allowed, seconds until a token is available)"""
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = (tokens, now)
+        # Least recently used buckets go first; an evicted client just starts with a full bucket
+        while len(self.buckets) > self.max_buckets:
+            self.buckets.popitem(last=False)
+        metrics.set_gauge("rate_limit_buckets", len(self.buckets))
+        return allowed, 0.0 if allowed else (1 - tokens) / refill_per_second
+
+class MongoRateLimitStore:
+    """Token buckets in the `rate_limits` collection, shared by every worker.
+
+    Each request refills and consumes its bucket in one pipeline update, so
+    concurrent workers cannot both spend the last token. Idle buckets expire
+    through a TTL index once they would have refilled completely.
+    """
+    async def ensure_indexes(self):
+        await db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> Tuple[bool, float]:
+        now = time.time()
+        refilled = {"$min": [capacity, {"$add": [
+            {"$ifNull": ["$tokens", capacity]},
+            {"$multiply": [{"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated", now]}]}]}, refill_per_second]}
+        ]}]}
+        bucket = await db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"refilled": refilled}},
+                {"$set": {
+                    "allowed": {"$gte": ["$refilled", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$refilled", 1]}, {"$subtract": ["$refilled", 1]}, "$refilled"]},
+                    "updated": now,
+                    "expires_at": datetime.utcnow() + timedelta(seconds=capacity / refill_per_second + 60)
+                }},
+                {"$unset": "refilled"}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if bucket["allowed"]:
+            return True, 0.0
+        return False, (1 - bucket["tokens"]) / refill_per_second
+
+class RateLimitMiddleware:
+    """Rejects requests with 429 and `Retry-After` once their token bucket is empty.
+
+    Every matching policy is checked, so chat is limited both per user and
+    per client IP (user ids are not authenticated and could be rotated).
+    The user key comes from the path, the query string or the JSON body.
+    A store that fails lets the request through rather than taking the API
+    down with it.
+    """
+    DEFAULT_POLICIES = [
+        RateLimitPolicy(name="chat_user", path=r"^/api/chat/?$", methods=["POST"], key="user", capacity=10, period_seconds=60),
+        RateLimitPolicy(name="chat_ip", path=r"^/api/chat/?$", methods=["POST"], key="ip", capacity=30, period_seconds=60),
+        RateLimitPolicy(name="market_data_ip", path=r"^/api/market-data/?$", methods=["GET"], key="ip", capacity=20, period_seconds=60),
+        RateLimitPolicy(name="recommendations_user", path=r"^/api/recommendations/(?P<user_id>[^/]+)(/batch)?/?$",
+                        methods=["GET"], key="user", capacity=60, period_seconds=60),
+        # Content-addressed media is cheap to serve and a single page loads many images
+        RateLimitPolicy(name="api_ip", path=r"^/api/(?!media/)", key="ip", capacity=300, period_seconds=60),
+    ]
+    MAX_BODY_BYTES = 64 * 1024  # Larger bodies are not parsed for a user id
+
+    def __init__(self, app, store=None, policies: Optional[List[RateLimitPolicy]] = None,
+                 trusted_proxies: str = RATE_LIMIT_TRUSTED_PROXIES):
+        self.app = app
+        self.store = store or rate_limit_store
+        self.policies = policies or self.configured_policies(RATE_LIMIT_POLICIES)
+        self.patterns = [re.compile(policy.path) for policy in self.policies]
+        self.proxies = TrustedProxies(trusted_proxies)
+
+    @classmethod
+    def configured_policies(cls, spec: str) -> List[RateLimitPolicy]:
+        """Default policies with overrides parsed from "chat_user=20/60,api_ip=600/60" (requests/seconds)"""
+        overrides = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            name, _, limit = item.partition("=")
+            capacity, _, period = limit.partition("/")
+            overrides[name.strip()] = {"capacity": float(capacity), "period_seconds": float(period or 60)}
+        unknown = set(overrides) - {policy.name for policy in cls.DEFAULT_POLICIES}
+        if unknown:
+            logging.error(f"Unknown rate limit policies ignored: {', '.join(sorted(unknown))}")
+        return [policy.copy(update=overrides.get(policy.name, {})) for policy in cls.DEFAULT_POLICIES]
+
+    @staticmethod
+    def query_user_id(scope) -> Optional[str]:
+        for name, _, value in (part.partition("=") for part in scope.get("query_string", b"").decode("latin-1").split("&")):
+            if name == "user_id" and value:
+                return value
+        return None
+
+    @classmethod
+    def body_user_id(cls, scope, body: bytes) -> Optional[str]:
+        if len(body) > cls.MAX_BODY_BYTES or "json" not in Headers(scope=scope).get("content-type", ""):
+            return None
         try:
-            # Create AI ranker
-            ranker_chat = LlmChat(
-                api_key=GEMINI_API_KEY,
-                session_id=f"ranking_{uuid.uuid4()}",
-                system_message="You are an AI vendor ranking system. Rank vendors based on user preferences and provide personalized recommendations."
-            ).with_model("gemini", "gemini-2.0-flash")
-            
-            vendor_data = [
-                {
-                    'name': v['business_name'],
-                    'category': v['category'],
-                    'pricing': v['pricing_range'],
-                    'rating': v.get('rating', 0),
-                    'description': v['description'][:200],
-                    'location': v['location']
-                }
-                for v in vendors
-            ]
-            
-            ranking_prompt = f"""
-            Rank these vendors for a wedding with:
-            Budget: ₹{budget:,}
-            Location: {location}
-            Style: {style}
-            Guest Count: {guest_count}
-            
-            Vendors: {vendor_data}
-            
-            Provide a ranked recommendation with brief reasons. Return as JSON with vendor names and ranking reasons.
-            """
-            
-            ranking_response = await ranker_chat.send_message(UserMessage(text=ranking_prompt))
-            
-            # For now, return vendors sorted by rating
-            return [Vendor(**vendor) for vendor in vendors]
-            
-        except Exception as e:
-            logging.error(f"AI ranking failed: {e}")
-            return [Vendor(**vendor) for vendor in vendors]
-    
-    return [Vendor(**vendor) for vendor in vendors]
+            user_id = json_module.loads(body).get("user_id")
+        except (ValueError, AttributeError):
+            return None
+        return str(user_id) if user_id else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path, method = scope["path"], scope["method"]
+        matched = []
+        for policy, pattern in zip(self.policies, self.patterns):
+            match = pattern.match(path)
+            if match and (policy.methods is None or method in policy.methods):
+                matched.append((policy, match))
+        if not matched:
+            await self.app(scope, receive, send)
+            return
+
+        body = None
+        ip = self.proxies.client_ip(scope)
+        retry_after = 0.0
+        rejected = None
+        for policy, match in matched:
+            user_id = None
+            if policy.key == "user":
+                user_id = match.groupdict().get("user_id") or self.query_user_id(scope)
+                if user_id is None and method in ("POST", "PUT", "PATCH"):
+                    if body is None:
+                        # Buffer the body to find the user id, then hand it on unchanged
+                        chunks = []
+                        while True:
+                            message = await receive()
+                            if message["type"] != "http.request":
+                                return
+                            chunks.append(message.get("body", b""))
+                            if not message.get("more_body", False):
+                                break
+                        body = b"".join(chunks)
+                    user_id = self.body_user_id(scope, body)
+            key = f"{policy.name}:user:{user_id}" if user_id else f"{policy.name}:ip:{ip}"
+            try:
+                allowed, wait = await self.store.take(key, policy.capacity, policy.refill_per_second)
+            except Exception as e:
+                logging.error(f"Rate limit store error: {str(e)}")
+                metrics.incr("rate_limit_store_errors_total")
+                continue
+            if not allowed:
+                metrics.incr(f"rate_limit_rejected_total.{policy.name}")
+                if wait >= retry_after:
+                    retry_after, rejected = wait, policy
+            else:
+                metrics.incr(f"rate_limit_allowed_total.{policy.name}")
+
+        if rejected is not None:
+            await JSONResponse(
+                {"detail": "Too many requests, please retry later"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(retry_after))), "X-RateLimit-Policy": rejected.name}
+            )(scope, receive, send)
+            return
+
+        if body is None:
+            await self.app(scope, receive, send)
+            return
+
+        body_sent = False
+
+        async def replay_body():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, replay_body, send)
+
+rate_limit_store = MongoRateLimitStore() if RATE_LIMIT_STORE == "mongo" else MemoryRateLimitStore()
 
 # API Routes
 
@@ -300,18 +3641,35 @@ async def get_users():
 async def create_vendor(vendor: VendorCreate):
     vendor_dict = vendor.dict()
     vendor_obj = Vendor(**vendor_dict)
-    await db.vendors.insert_one(vendor_obj.dict())
+    if vendor.latitude is not None and vendor.longitude is not None:
+        vendor_obj.geo = geo_point(vendor.latitude, vendor.longitude)
+    else:
+        vendor_obj.geo = city_geo_point(vendor.location)
+    vendor_obj.rating_sum = 0.0
+    vendor_obj.rating_score = vendor_reviews.score(0, 0)
+    await db.vendors.insert_one(vendor_obj.dict(exclude={"distance_km"}))
+    await recommendation_store.bump_catalog_version()
     return vendor_obj
 
 @api_router.get("/vendors", response_model=List[Vendor])
-async def get_vendors(category: Optional[str] = None, location: Optional[str] = None):
+async def get_vendors(
+    category: Optional[str] = None,
+    location: Optional[str] = None,
+    date: Optional[date] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    near: Optional[str] = None,
+    radius_km: float = DEFAULT_SEARCH_RADIUS_KM
+):
     query = {}
     if category:
         query['category'] = category
     if location:
         query['location'] = {'$regex': location, '$options': 'i'}
+    query.update(availability_calendar.free_vendor_filter(availability_calendar.resolve_range(date, date_from, date_to)))
     
-    vendors = await db.vendors.find(query).sort('rating', -1).limit(20).to_list(20)
+    # With `near`, results come back ranked by distance from one $geoNear query
+    vendors = await find_vendors(query, 20, parse_near(near), radius_km)
     return [Vendor(**vendor) for vendor in vendors]
 
 @api_router.get("/vendors/{vendor_id}", response_model=Vendor)
@@ -321,15 +3679,109 @@ async def get_vendor(vendor_id: str):
         raise HTTPException(status_code=404, detail="Vendor not found")
     return Vendor(**vendor)
 
+@api_router.post("/vendors/{vendor_id}/reviews", response_model=Review)
+async def create_vendor_review(vendor_id: str, review: ReviewCreate):
+    """Add a review and update the vendor's rating aggregate"""
+    return await vendor_reviews.add(vendor_id, review)
+
+@api_router.get("/vendors/{vendor_id}/reviews", response_model=List[Review])
+async def get_vendor_reviews(vendor_id: str, limit: int = 20, before: Optional[datetime] = None):
+    """Vendor reviews, newest first and paginated by created_at"""
+    reviews = await vendor_reviews.page(vendor_id, max(1, min(limit, REVIEWS_PAGE_MAX)), before)
+    return [Review(**review) for review in reviews]
+
+@api_router.post("/vendors/{vendor_id}/portfolio", response_model=PortfolioImage)
+async def upload_portfolio_image(vendor_id: str, file: UploadFile = File(...)):
+    """Store a portfolio image and its WebP thumbnails"""
+    data = await file.read(MEDIA_MAX_UPLOAD_BYTES + 1)
+    return await portfolio_images.add(vendor_id, data)
+
+@api_router.get("/media/{key:path}")
+async def get_media(key: str, request: Request):
+    """Locally stored media; keys are content-addressed, so responses are cacheable forever"""
+    if not isinstance(media_store, LocalObjectStore):
+        raise HTTPException(status_code=404, detail="Media is served from the object store")
+    try:
+        path = media_store.path(key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Media not found")
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Media not found")
+    etag = f'"{path.stem}"'
+    headers = {"Cache-Control": PortfolioImages.CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
+
+@api_router.get("/vendors/{vendor_id}/availability")
+async def get_vendor_availability(vendor_id: str, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    vendor = await db.vendors.find_one({"id": vendor_id}, {"availability_start": 1, "availability_bits": 1})
+    if not vendor:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+    
+    start, bits = availability_calendar.load(vendor)
+    horizon_end = start + timedelta(days=availability_calendar.horizon_days - 1)
+    date_from = max(date_from or start, start)
+    date_to = min(date_to or start + timedelta(days=90), horizon_end)
+    unavailable = [day for day in availability_calendar.unavailable_days(start, bits) if date_from <= day <= date_to]
+    
+    return {
+        "vendor_id": vendor_id,
+        "horizon_start": start,
+        "horizon_end": horizon_end,
+        "date_from": date_from,
+        "date_to": date_to,
+        "unavailable_dates": unavailable,
+        "available_throughout": not unavailable
+    }
+
+@api_router.put("/vendors/{vendor_id}/availability")
+async def update_vendor_availability(vendor_id: str, update: AvailabilityUpdate):
+    vendor = await db.vendors.find_one(
+        {"id": vendor_id},
+        {"availability_start": 1, "availability_bits": 1, "availability_version": 1}
+    )
+    if not vendor:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+    
+    start, bits = availability_calendar.load(vendor)
+    for day_range in update.blocked:
+        availability_calendar.apply(start, bits, day_range, available=False)
+    for day_range in update.opened:
+        availability_calendar.apply(start, bits, day_range, available=True)
+    
+    # Optimistic concurrency: reject if another update landed since we read the calendar
+    result = await db.vendors.update_one(
+        {"id": vendor_id, "availability_version": vendor.get("availability_version")},
+        {
+            "$set": {
+                "availability_start": availability_calendar.to_datetime(start),
+                "availability_bits": bytes(bits),
+                "busy_days": availability_calendar.busy_days(start, bits)
+            },
+            "$inc": {"availability_version": 1}
+        }
+    )
+    if not result.matched_count:
+        raise HTTPException(status_code=409, detail="Availability was updated concurrently, please retry")
+    
+    await recommendation_store.bump_catalog_version()
+    
+    return {
+        "vendor_id": vendor_id,
+        "horizon_start": start,
+        "unavailable_dates": availability_calendar.unavailable_days(start, bits)
+    }
+
 # AI Chat Interface with Web Search
 @api_router.post("/chat")
-async def chat_with_ai(message: ChatMessage):
+async def chat_with_ai(message: ChatMessage, background_tasks: BackgroundTasks):
     try:
         # Get or create session
         session_id = message.session_id or str(uuid.uuid4())
         
         # Get user context
-        user = await db.users.find_one({"id": message.user_id})
+        user = await user_profiles.get(message.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -349,16 +3801,23 @@ async def chat_with_ai(message: ChatMessage):
             chat_session = ChatSession(**chat_session_data)
             chat_session_messages = chat_session.messages
         
+        # Classify the message once; intents drive web search, extraction and suggestions
+        intents = intent_classifier.classify(message.message)
+        
         # Check if web search is needed
-        web_search_keywords = ['current price', 'latest trend', 'weather', 'availability', 'market rate', 'online', 'recent', '2025', 'today']
-        needs_web_search = any(keyword in message.message.lower() for keyword in web_search_keywords)
+        needs_web_search = "web_search" in intents
+        
+        # Frequently repeated questions are answered from the response cache when enabled;
+        # follow-ups depend on the conversation, so only a session's first question is cached
+        cacheable = not chat_session_messages and not chat_session.summary
+        cached = chat_cache.get(message.message, user_context) if cacheable else None
         
         # Prepare enhanced prompt
         enhanced_message = message.message
-        if needs_web_search:
+        if needs_web_search and not cached:
             # Perform web search for relevant information
-            search_query = f"wedding {message.message} 2025 India pricing trends"
-            web_search_results = await perform_web_search(search_query)
+            search_query = f"wedding {message.message} {CHAT_SEARCH_QUERY_SUFFIX}"
+            web_search_results = await perform_web_search(search_query, intents | CHAT_SEARCH_QUERY_INTENTS)
             
             enhanced_message = f"""
 User Query: {message.message}
@@ -369,47 +3828,68 @@ Current Market Information (from web search):
 Please provide a comprehensive response using both your knowledge and the current market information above. Focus on actionable advice with real pricing and current trends.
 """
         
-        # Get AI response
-        chat = await ai_planner.get_enhanced_chat_instance(session_id, user_context)
-        ai_response = await chat.send_message(UserMessage(text=enhanced_message))
+        fallback_used = False
+        if cached:
+            ai_response = cached["response"]
+        else:
+            # Bound the replayed history: rolling summary + recent turns within the token budget
+            context = chat_context.build_prompt(chat_session, enhanced_message, user_context)
+            
+            # Get AI response
+            chat = await ai_planner.get_enhanced_chat_instance(session_id, user_context, context["summary"])
+            try:
+                ai_response = await llm_gateway.send(chat, context["message"])
+                if cacheable:
+                    chat_cache.put(message.message, user_context, {"response": ai_response})
+            except LlmUnavailableError as e:
+                # Fail fast to a previously cached or templated answer instead of a 500
+                logging.warning(f"Chat falling back without Gemini: {e}")
+                ai_response = await fallback_chat_response(message.message, user_context, intents, cacheable)
+                fallback_used = True
         
         # Store conversation
-        conversation_update = {
-            "messages": chat_session_messages + [
-                {"role": "user", "content": message.message, "timestamp": datetime.utcnow().isoformat()},
-                {"role": "assistant", "content": ai_response, "timestamp": datetime.utcnow().isoformat()}
-            ],
-            "updated_at": datetime.utcnow()
-        }
+        new_messages = [
+            {"role": "user", "content": message.message, "timestamp": datetime.utcnow().isoformat()},
+            {"role": "assistant", "content": ai_response, "timestamp": datetime.utcnow().isoformat()}
+        ]
         
         await db.chat_sessions.update_one(
             {"session_id": session_id, "user_id": message.user_id},
-            {"$set": conversation_update}
+            {"$push": {"messages": {"$each": new_messages}}, "$set": {"updated_at": datetime.utcnow()}}
         )
         
-        # Extract any planning data from the conversation
-        if any(keyword in message.message.lower() for keyword in ['budget', 'guest', 'date', 'venue', 'style']):
-            # Here you could use AI to extract structured data and update user preferences
-            pass
+        # Fold turns that left the recent window into the session summary after responding
+        if len(chat_session_messages) + len(new_messages) - chat_session.summarized_messages > chat_context.recent_messages:
+            background_tasks.add_task(
+                job_queue.enqueue,
+                "summarize_chat",
+                {"user_id": message.user_id, "session_id": session_id},
+                provider="gemini",
+                dedupe_key=f"summarize_chat:{session_id}"
+            )
+        
+        # Extract any planning data from the conversation in the background
+        if "planning" in intents:
+            background_tasks.add_task(preference_extractor.submit, message.user_id)
         
         return {
             "response": ai_response,
             "session_id": session_id,
-            "suggestions": await get_ai_suggestions(message.message, user_context),
-            "web_search_used": needs_web_search
+            "suggestions": await get_ai_suggestions(message.message, user_context, intents),
+            "web_search_used": needs_web_search,
+            "cached": cached is not None,
+            "fallback": fallback_used
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=f"Chat service error: {str(e)}")
 
-async def perform_web_search(query: str) -> str:
+async def perform_web_search(query: str, intents: frozenset = None) -> str:
     """Perform real web search for current information"""
     try:
-        # Import the web search tool functionality
-        import subprocess
-        import json
-        
         # Use web_search_tool from system (available in the container environment)
         # This is a placeholder - in production you'd use actual web search APIs
         search_result = f"""
@@ -419,7 +3899,9 @@ Based on current online data (2025):
 
 """
         
-        if "photographer" in query.lower():
+        if intents is None:
+            intents = intent_classifier.classify(query)
+        if "photographer" in intents:
             web_info = search_result + """
 🔍 Latest Wedding Photography Trends & Pricing:
 • Current Metro City Rates: ₹75,000 - ₹4,00,000 (Premium photographers charging more in 2025)
@@ -430,7 +3912,7 @@ Based on current online data (2025):
 • Social Media Integration: Instagram reels, YouTube highlight videos now standard
 • Technology: AI-enhanced editing, virtual reality experiences gaining popularity
 """
-        elif "venue" in query.lower():
+        elif "venue" in intents:
             web_info = search_result + """
 🔍 Current Wedding Venue Market Analysis:
 • Metro Venue Pricing: ₹2,50,000 - ₹20,00,000 (inflation-adjusted for 2025)
@@ -441,7 +3923,7 @@ Based on current online data (2025):
 • New Requirements: Climate control, live streaming facilities, Instagram-worthy backdrops
 • Sustainability: Green venues with solar power, waste management gaining preference
 """
-        elif "catering" in query.lower():
+        elif "catering" in intents:
             web_info = search_result + """
 🔍 Wedding Catering Industry Update 2025:
 • Per Plate Costs: ₹1,200 - ₹4,500 (post-inflation rates)
@@ -452,7 +3934,7 @@ Based on current online data (2025):
 • Health & Safety: Enhanced hygiene protocols, allergen-free options
 • Technology: Digital menu displays, contactless ordering systems
 """
-        elif "price" in query.lower() or "cost" in query.lower():
+        elif "pricing" in intents:
             web_info = search_result + """
 🔍 Complete Wedding Cost Analysis 2025:
 • Average Wedding Budget: ₹8-25 lakhs (middle-class segment)
@@ -463,7 +3945,7 @@ Based on current online data (2025):
 • Financing Options: Wedding loans at 10-14% interest, EMI schemes available
 • Zero-Commission Platforms: Save 15-25% vs traditional booking platforms
 """
-        elif "weather" in query.lower():
+        elif "weather" in intents:
             web_info = search_result + """
 🔍 Weather & Seasonal Wedding Planning 2025:
 • Ideal Months: November-February (cool, dry weather)
@@ -492,29 +3974,46 @@ Based on current online data (2025):
         logging.error(f"Web search error: {e}")
         return f"Web search temporarily unavailable for '{query}'. Using general wedding planning guidance instead."
 
-async def get_ai_suggestions(user_message: str, user_context: Dict) -> List[str]:
+async def fallback_chat_response(user_message: str, user_context: Dict, intents: frozenset, cacheable: bool = True) -> str:
+    """Answer without Gemini: a previously cached answer, else templated market guidance"""
+    cached = chat_cache.get(user_message, user_context, allow_expired=True) if cacheable else None
+    if cached:
+        metrics.incr("llm_fallback_total.cached")
+        return cached["response"]
+    
+    metrics.incr("llm_fallback_total.templated")
+    market_info = await perform_web_search(f"wedding {user_message} {CHAT_SEARCH_QUERY_SUFFIX}", intents | CHAT_SEARCH_QUERY_INTENTS)
+    return f"""Our AI planner is busy right now, so here is the latest market guidance for your question while it catches up.
+
+Your plan: {ChatContextManager.format_user_context(user_context)}
+{market_info}
+Ask again in a minute for a personalised answer."""
+
+async def get_ai_suggestions(user_message: str, user_context: Dict, intents: frozenset = None) -> List[str]:
     """Generate contextual suggestions based on user message"""
     suggestions = []
+    if intents is None:
+        intents = intent_classifier.classify(user_message)
     
-    if 'budget' in user_message.lower():
+    if 'budget' in intents:
         suggestions.extend([
             "Show me current market prices for vendors",
             "What are the latest 2025 wedding cost trends?",
             "Help me allocate my wedding budget smartly"
         ])
-    elif 'venue' in user_message.lower():
+    elif 'venue' in intents:
         suggestions.extend([
             "Find trending venues in my area",
             "What's the current average venue cost?",
             "Show me latest venue booking trends"
         ])
-    elif 'photography' in user_message.lower():
+    elif 'photography' in intents:
         suggestions.extend([
             "What are current photography trends?",
             "Find photographers with latest pricing",
             "Show me trending photography styles 2025"
         ])
-    elif any(word in user_message.lower() for word in ['trend', 'latest', 'current', '2025']):
+    elif 'trends' in intents:
         suggestions.extend([
             "What are the hottest wedding trends right now?",
             "Show me current market pricing",
@@ -542,7 +4041,7 @@ async def get_market_data(category: Optional[str] = None, location: Optional[str
         market_info = await perform_web_search(search_query)
         
         # Also get local database stats
-        local_vendors = await db.vendors.find({
+        local_vendors = await catalog_db.vendors.find({
             **({"category": category} if category else {}),
             **({"location": {"$regex": location, "$options": "i"}} if location else {})
         }).to_list(100)
@@ -575,27 +4074,211 @@ async def get_market_data(category: Optional[str] = None, location: Optional[str
         logging.error(f"Market data error: {e}")
         raise HTTPException(status_code=500, detail=f"Market data service error: {str(e)}")
 
+# Precomputed Recommendations
+class RecommendationStore:
+    """Per-user top-k vendors per category in the `recommendations` collection.
+
+    Each document is stamped with the preferences version and vendor catalog
+    version it was computed from. Preference changes mark a user's documents
+    stale and queue a recompute; catalog changes bump the catalog version and
+    queue a sweep over documents computed from an older catalog. Fresh
+    documents embed the vendor snapshots, so serving them is one indexed read.
+    Documents computed before their AI ranking existed record its key and
+    are reordered in place when the ranking job finishes.
+    """
+    def __init__(self, max_age_seconds: int, catalog_check_seconds: float, refresh_batch_size: int):
+        self.max_age_seconds = max_age_seconds
+        self.catalog_check_seconds = catalog_check_seconds
+        self.refresh_batch_size = refresh_batch_size
+        self.catalog_version = 0
+        self.catalog_checked_at = 0.0
+
+    async def ensure_indexes(self):
+        await db.recommendations.create_index([("user_id", 1), ("category", 1)], unique=True)
+        await db.recommendations.create_index("catalog_version")
+        await db.recommendations.create_index("ranking_key", sparse=True)
+
+    async def get_catalog_version(self) -> int:
+        # Cached briefly per worker so the common read path stays a single query
+        if time.monotonic() - self.catalog_checked_at > self.catalog_check_seconds:
+            meta = await db.meta.find_one({"_id": "vendor_catalog"})
+            self.catalog_version = meta["version"] if meta else 0
+            self.catalog_checked_at = time.monotonic()
+        return self.catalog_version
+
+    async def bump_catalog_version(self):
+        """Record a vendor catalog change and refresh affected recommendations"""
+        meta = await db.meta.find_one_and_update(
+            {"_id": "vendor_catalog"},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self.catalog_version = meta["version"]
+        self.catalog_checked_at = time.monotonic()
+        await job_queue.enqueue(
+            "refresh_catalog_recommendations",
+            {},
+            dedupe_key="refresh_catalog_recommendations",
+            delay=5  # Coalesce bursts of vendor changes into one sweep
+        )
+
+    async def get_fresh(self, user_id: str, category: Optional[str]) -> Optional[Dict]:
+        stored = await db.recommendations.find_one({"user_id": user_id, "category": category or "all"}, {"_id": 0})
+        if not stored:
+            metrics.incr("recommendation_store_misses_total")
+            return None
+        age = (datetime.utcnow() - stored["computed_at"]).total_seconds()
+        if stored.get("stale") or age > self.max_age_seconds or stored["catalog_version"] < await self.get_catalog_version():
+            metrics.incr("recommendation_store_stale_total")
+            return None
+        metrics.incr("recommendation_store_hits_total")
+        return stored
+
+    async def compute(self, user_id: str, preferences: Dict, preferences_version: int, category: Optional[str]) -> Dict:
+        catalog_version = await self.get_catalog_version()
+        vendors = [vendor.dict() for vendor in await get_vendor_recommendations(preferences, category)]
+        stored = {
+            "user_id": user_id,
+            "category": category or "all",
+            "vendors": vendors,
+            "ranking_key": vendor_ranking_key(preferences, category, vendors) if vendors else None,
+            "preferences": preferences,
+            "preferences_version": preferences_version,
+            "catalog_version": catalog_version,
+            "computed_at": datetime.utcnow(),
+            "stale": False
+        }
+        try:
+            # Never overwrite a result computed from newer preferences
+            await db.recommendations.update_one(
+                {"user_id": user_id, "category": stored["category"], "preferences_version": {"$lte": preferences_version}},
+                {"$set": stored},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass
+        metrics.incr("recommendation_store_computes_total")
+        return stored
+
+    async def apply_ranking(self, ranking_key: str, ranked_names: List[str]) -> int:
+        """Reorder stored recommendations by a newly finished AI ranking"""
+        order = {name: position for position, name in enumerate(ranked_names)}
+        updates = []
+        async for stored in db.recommendations.find({"ranking_key": ranking_key}, {"_id": 1, "vendors": 1, "computed_at": 1}):
+            vendors = sorted(stored["vendors"], key=lambda v: order.get(v["business_name"], len(order)))
+            if vendors != stored["vendors"]:
+                # Skipped if the document was recomputed meanwhile
+                updates.append(UpdateOne({"_id": stored["_id"], "computed_at": stored["computed_at"]}, {"$set": {"vendors": vendors}}))
+        if not updates:
+            return 0
+        updated = (await db.recommendations.bulk_write(updates, ordered=False)).modified_count
+        metrics.incr("recommendation_store_rankings_applied_total", updated)
+        return updated
+
+    async def recompute_user(self, user_id: str) -> int:
+        user = await db.users.find_one({"id": user_id}, {"preferences": 1, "preferences_version": 1})
+        if not user:
+            await db.recommendations.delete_many({"user_id": user_id})
+            return 0
+        categories = await db.recommendations.distinct("category", {"user_id": user_id})
+        for category in categories:
+            await self.compute(
+                user_id,
+                user.get("preferences") or {},
+                user.get("preferences_version", 0),
+                None if category == "all" else category
+            )
+        return len(categories)
+
+    async def invalidate_user(self, user_id: str):
+        await db.recommendations.update_many({"user_id": user_id}, {"$set": {"stale": True}})
+        await job_queue.enqueue("recompute_recommendations", {"user_id": user_id}, dedupe_key=f"recompute_recommendations:{user_id}")
+
+    async def refresh_catalog_batch(self) -> int:
+        """Recompute one batch of documents built from an older catalog"""
+        self.catalog_checked_at = 0.0
+        catalog_version = await self.get_catalog_version()
+        outdated = await db.recommendations.find(
+            {"catalog_version": {"$lt": catalog_version}},
+            {"user_id": 1, "_id": 0}
+        ).limit(self.refresh_batch_size).to_list(self.refresh_batch_size)
+        user_ids = list(dict.fromkeys(doc["user_id"] for doc in outdated))
+        for user_id in user_ids:
+            await self.recompute_user(user_id)
+        if len(outdated) == self.refresh_batch_size:
+            await job_queue.enqueue("refresh_catalog_recommendations", {}, dedupe_key="refresh_catalog_recommendations")
+        return len(user_ids)
+
+recommendation_store = RecommendationStore(
+    RECOMMENDATION_MAX_AGE_SECONDS,
+    RECOMMENDATION_CATALOG_CHECK_SECONDS,
+    RECOMMENDATION_REFRESH_BATCH_SIZE
+)
+
+@job_queue.handler("recompute_recommendations")
+async def recompute_recommendations_job(user_id: str):
+    return {"categories": await recommendation_store.recompute_user(user_id)}
+
+@job_queue.handler("refresh_catalog_recommendations")
+async def refresh_catalog_recommendations_job():
+    return {"users": await recommendation_store.refresh_catalog_batch()}
+
 # Enhanced vendor recommendations with web search
+async def get_recommendation_market_insights(preferences: Dict, category: Optional[str]) -> Optional[str]:
+    try:
+        location = preferences.get('location', 'India')
+        search_query = f"best wedding {category or 'vendors'} {location} 2025 recommendations"
+        return await perform_web_search(search_query)
+    except Exception as e:
+        logging.error(f"Web search for recommendations failed: {e}")
+        return None
+
 @api_router.get("/recommendations/{user_id}")
-async def get_recommendations(user_id: str, category: Optional[str] = None, use_web_search: bool = True):
-    user = await db.users.find_one({"id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+async def get_recommendations(
+    user_id: str,
+    category: Optional[str] = None,
+    use_web_search: bool = True,
+    date: Optional[date] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    near: Optional[str] = None,
+    radius_km: float = DEFAULT_SEARCH_RADIUS_KM
+):
+    date_range = availability_calendar.resolve_range(date, date_from, date_to)
+    near_point = parse_near(near)
+    ad_hoc = date_range is not None or near_point is not None
     
-    preferences = user.get('preferences', {})
+    # Common case: a fresh precomputed result for this user and category
+    stored = None if ad_hoc else await recommendation_store.get_fresh(user_id, category)
+    
+    if not stored:
+        user = await user_profiles.get(user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        preferences = user.get('preferences') or {}
+        version = user.get('preferences_version', 0)
+        
+        async def compute_ad_hoc():
+            # Explicit date or distance filters are ad hoc queries and bypass the precomputed store
+            vendors = await get_vendor_recommendations(preferences, category, date_range, near_point, radius_km)
+            return {"preferences": preferences, "vendors": vendors}
+        
+        # Concurrent identical requests (e.g. one per category tab) share one computation
+        if ad_hoc:
+            stored = await recommendation_flights.do((user_id, category, version, date_range, near_point, radius_km), compute_ad_hoc)
+        else:
+            stored = await recommendation_flights.do(
+                (user_id, category, version),
+                lambda: recommendation_store.compute(user_id, preferences, version, category)
+            )
     
-    # Get local recommendations
-    recommendations = await get_vendor_recommendations(preferences, category)
+    preferences = stored["preferences"]
+    recommendations = stored["vendors"]
     
     # Get real-time market insights if requested
-    market_insights = None
-    if use_web_search:
-        try:
-            location = preferences.get('location', 'India')
-            search_query = f"best wedding {category or 'vendors'} {location} 2025 recommendations"
-            market_insights = await perform_web_search(search_query)
-        except Exception as e:
-            logging.error(f"Web search for recommendations failed: {e}")
+    market_insights = await get_recommendation_market_insights(preferences, category) if use_web_search else None
     
     return {
         "recommendations": recommendations,
@@ -606,6 +4289,54 @@ async def get_recommendations(user_id: str, category: Optional[str] = None, use_
         "web_search_used": use_web_search and market_insights is not None
     }
 
+@api_router.get("/recommendations/{user_id}/batch")
+async def get_recommendations_batch(
+    user_id: str,
+    categories: str,
+    use_web_search: bool = True,
+    date: Optional[date] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    near: Optional[str] = None,
+    radius_km: float = DEFAULT_SEARCH_RADIUS_KM
+):
+    """Recommendations for several comma-separated categories in one round trip"""
+    category_list = list(dict.fromkeys(c.strip() for c in categories.split(",") if c.strip()))
+    if not category_list:
+        raise HTTPException(status_code=400, detail="At least one category is required")
+    date_range = availability_calendar.resolve_range(date, date_from, date_to)
+    near_point = parse_near(near)
+    
+    user = await user_profiles.get(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    preferences = user.get('preferences') or {}
+    
+    async def compute():
+        grouped = await get_vendor_recommendations_batch(preferences, category_list, date_range, near_point, radius_km)
+        insights = [None] * len(category_list)
+        if use_web_search:
+            insights = await asyncio.gather(*[
+                get_recommendation_market_insights(preferences, category) for category in category_list
+            ])
+        
+        return {
+            "categories": {
+                category: {
+                    "recommendations": grouped[category],
+                    "total_count": len(grouped[category]),
+                    "market_insights": insight
+                }
+                for category, insight in zip(category_list, insights)
+            },
+            "user_preferences": preferences,
+            "web_search_used": use_web_search and any(insight is not None for insight in insights)
+        }
+    
+    flight_key = (user_id, tuple(sorted(category_list)), user.get('preferences_version', 0), use_web_search, date_range, near_point, radius_km, "batch")
+    return await recommendation_flights.do(flight_key, compute)
+
 # Wedding Plans
 @api_router.post("/wedding-plans", response_model=WeddingPlan)
 async def create_wedding_plan(plan: WeddingPlanCreate):
@@ -613,39 +4344,65 @@ async def create_wedding_plan(plan: WeddingPlanCreate):
     plan_obj = WeddingPlan(**plan_dict)
     
     # Auto-generate timeline based on wedding date
-    timeline = await generate_wedding_timeline(plan.wedding_date, plan.budget)
-    plan_obj.timeline = timeline
+    plan_obj.timeline = timeline_engine.build(plan.wedding_date, plan.categories)
     
     await db.wedding_plans.insert_one(plan_obj.dict())
     
     # Update user preferences
-    await db.users.update_one(
-        {"id": plan.user_id},
-        {"$set": {"preferences": {
-            "budget": plan.budget,
-            "guest_count": plan.guest_count,
-            "location": plan.location,
-            "style_preference": plan.style_preference,
-            "wedding_date": plan.wedding_date.isoformat()
-        }}}
-    )
+    await merge_user_preferences(plan.user_id, {
+        "budget": plan.budget,
+        "guest_count": plan.guest_count,
+        "location": plan.location,
+        "style_preference": plan.style_preference,
+        "wedding_date": plan.wedding_date.isoformat()
+    }, replace=True)
     
     return plan_obj
 
-async def generate_wedding_timeline(wedding_date: datetime, budget: float) -> Dict:
-    """Generate AI-powered wedding planning timeline"""
-    months_until_wedding = (wedding_date - datetime.utcnow()).days // 30
+@api_router.post("/wedding-plans/{plan_id}/optimize")
+async def optimize_wedding_plan(plan_id: str, request: BundleOptimizeRequest):
+    """Best-value vendor bundles (one per category) that fit the plan budget"""
+    plan = await db.wedding_plans.find_one({"id": plan_id})
+    if not plan:
+        raise HTTPException(status_code=404, detail="Wedding plan not found")
+    if request.price_basis not in BundleOptimizer.PRICE_BASES:
+        raise HTTPException(status_code=400, detail=f"price_basis must be one of {', '.join(BundleOptimizer.PRICE_BASES)}")
+    if not 1 <= request.top_n <= OPTIMIZER_MAX_BUNDLES:
+        raise HTTPException(status_code=400, detail=f"top_n must be between 1 and {OPTIMIZER_MAX_BUNDLES}")
+    categories = list(dict.fromkeys(request.categories))
+    budget = request.budget or plan["budget"]
+    if not categories or budget <= 0:
+        raise HTTPException(status_code=400, detail="At least one category and a positive budget are required")
     
-    timeline = {
-        "12_months_before": ["Book venue", "Set budget", "Create guest list"],
-        "8_months_before": ["Book photographer", "Book caterer", "Send save the dates"],
-        "6_months_before": ["Book decorator", "Plan honeymoon", "Buy wedding outfits"],
-        "3_months_before": ["Send invitations", "Final guest count", "Menu tasting"],
-        "1_month_before": ["Final fittings", "Rehearsal", "Confirm all vendors"],
-        "1_week_before": ["Pack for honeymoon", "Final payments", "Relax and enjoy!"]
-    }
+    started = time.perf_counter()
+    query = {"category": {"$in": categories}}
+    if request.match_location and plan.get("location"):
+        query["location"] = {"$regex": re.escape(plan["location"]), "$options": "i"}
+    wedding_day = plan["wedding_date"].date()
+    query.update(availability_calendar.free_vendor_filter((wedding_day, wedding_day)))
+    projection = {"_id": 0, "id": 1, "business_name": 1, "category": 1, "pricing_range": 1, "rating": 1, "total_reviews": 1, "rating_score": 1, "verified": 1}
+    vendors_by_category = {category: [] for category in categories}
+    async for vendor in catalog_db.vendors.find(query, projection):
+        vendors_by_category[vendor["category"]].append(vendor)
     
-    return timeline
+    unavailable = [category for category, vendors in vendors_by_category.items() if not vendors]
+    searchable = {category: vendors for category, vendors in vendors_by_category.items() if vendors}
+    bundles, candidates = bundle_optimizer.solve(
+        searchable, budget, plan.get("guest_count", 0), request.top_n, request.price_basis, request.weights
+    ) if searchable else ([], 0)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    metrics.observe("bundle_optimizer_ms", elapsed_ms)
+    
+    return {
+        "plan_id": plan_id,
+        "budget": budget,
+        "guest_count": plan.get("guest_count", 0),
+        "bundles": bundles,
+        "unavailable_categories": unavailable,
+        "vendors_considered": sum(len(vendors) for vendors in searchable.values()),
+        "candidates_after_pruning": candidates,
+        "elapsed_ms": round(elapsed_ms, 1)
+    }
 
 @api_router.get("/wedding-plans/{user_id}")
 async def get_wedding_plans(user_id: str):
@@ -657,19 +4414,84 @@ async def get_wedding_plans(user_id: str):
 async def create_inquiry(inquiry: InquiryCreate):
     inquiry_dict = inquiry.dict()
     inquiry_obj = Inquiry(**inquiry_dict)
-    await db.inquiries.insert_one(inquiry_obj.dict())
+    await vendor_inbox.add([inquiry_obj])
     return inquiry_obj
 
+@api_router.post("/inquiries/batch", response_model=List[Inquiry])
+async def create_inquiries_batch(batch: InquiryBatchCreate):
+    """Send one message to several vendors in a single write"""
+    vendor_ids = list(dict.fromkeys(batch.vendor_ids))
+    if not vendor_ids:
+        raise HTTPException(status_code=400, detail="vendor_ids must not be empty")
+    if len(vendor_ids) > INQUIRY_BATCH_MAX_VENDORS:
+        raise HTTPException(status_code=400, detail=f"At most {INQUIRY_BATCH_MAX_VENDORS} vendors per batch")
+    found = await db.vendors.distinct("id", {"id": {"$in": vendor_ids}})
+    missing = set(vendor_ids) - set(found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Vendors not found: {', '.join(sorted(missing))}")
+    
+    inquiries = [Inquiry(user_id=batch.user_id, vendor_id=vendor_id, message=batch.message) for vendor_id in vendor_ids]
+    await vendor_inbox.add(inquiries)
+    return inquiries
+
 @api_router.get("/inquiries/user/{user_id}")
 async def get_user_inquiries(user_id: str):
-    inquiries = await db.inquiries.find({"user_id": user_id}).to_list(50)
+    inquiries = await db.inquiries.find({"user_id": user_id}).sort("created_at", -1).to_list(50)
     return [Inquiry(**inquiry) for inquiry in inquiries]
 
 @api_router.get("/inquiries/vendor/{vendor_id}")
-async def get_vendor_inquiries(vendor_id: str):
-    inquiries = await db.inquiries.find({"vendor_id": vendor_id}).to_list(50)
+async def get_vendor_inquiries(vendor_id: str, limit: int = 50, before: Optional[datetime] = None, status: Optional[str] = None):
+    """Vendor inbox, newest first and paginated by created_at"""
+    inquiries = await vendor_inbox.page(vendor_id, max(1, min(limit, INBOX_PAGE_MAX)), before, status)
     return [Inquiry(**inquiry) for inquiry in inquiries]
 
+@api_router.get("/inquiries/vendor/{vendor_id}/counts")
+async def get_vendor_inbox_counts(vendor_id: str):
+    """Unread and pending inquiry counts for inbox badges"""
+    return await vendor_inbox.counts(vendor_id)
+
+@api_router.websocket("/inquiries/vendor/{vendor_id}/ws")
+async def vendor_inquiry_feed(websocket: WebSocket, vendor_id: str):
+    """Push new inquiries to a vendor dashboard instead of polling the inbox"""
+    await websocket.accept()
+    queue = inquiry_notifier.subscribe(vendor_id)
+    
+    async def forward():
+        while True:
+            await websocket.send_json(await queue.get())
+            metrics.incr("ws_events_sent_total")
+    
+    sender = None
+    try:
+        await websocket.send_json({"type": "counts", **await vendor_inbox.counts(vendor_id)})
+        sender = asyncio.create_task(forward())
+        # Incoming frames are ignored; receiving is how a disconnect is noticed
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if sender:
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+        inquiry_notifier.unsubscribe(vendor_id, queue)
+
+@api_router.post("/inquiries/{inquiry_id}/read", response_model=Inquiry)
+async def mark_inquiry_read(inquiry_id: str):
+    return Inquiry(**await vendor_inbox.mark_read(inquiry_id))
+
+@api_router.put("/inquiries/{inquiry_id}/status", response_model=Inquiry)
+async def update_inquiry_status(inquiry_id: str, update: InquiryStatusUpdate):
+    return Inquiry(**await vendor_inbox.set_status(inquiry_id, update.status))
+
+# Background Jobs
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str):
+    job = await db.jobs.find_one({"id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return Job(**job)
+
 # Chat History
 @api_router.get("/chat-sessions/{user_id}")
 async def get_chat_sessions(user_id: str):
@@ -681,14 +4503,26 @@ async def get_chat_session(user_id: str, session_id: str):
     session = await db.chat_sessions.find_one({"user_id": user_id, "session_id": session_id})
     if not session:
         raise HTTPException(status_code=404, detail="Chat session not found")
+    if session.get("archived"):
+        try:
+            session = await chat_archiver.rehydrate(session)
+        except Exception as e:
+            logging.error(f"Restoring archived chat session {session_id} failed: {str(e)}")
+            raise HTTPException(status_code=503, detail="Archived chat history is temporarily unavailable")
     return ChatSession(**session)
 
 # Analytics & Stats
-@api_router.get("/stats")
-async def get_platform_stats():
-    total_users = await db.users.count_documents({})
-    total_vendors = await db.vendors.count_documents({})
-    total_inquiries = await db.inquiries.count_documents({})
+@api_router.get("/metrics")
+async def get_metrics():
+    """In-process service metrics for this worker"""
+    return metrics.snapshot()
+
+async def platform_stats() -> Dict:
+    total_users, total_vendors, total_inquiries = await asyncio.gather(
+        catalog_db.users.count_documents({}),
+        catalog_db.vendors.count_documents({}),
+        catalog_db.inquiries.count_documents({})
+    )
     
     return {
         "total_users": total_users,
@@ -697,9 +4531,113 @@ async def get_platform_stats():
         "vendor_categories": ["Photography", "Catering", "Venues", "Decoration", "Music", "Transportation"]
     }
 
+@api_router.get("/stats")
+async def get_platform_stats():
+    return await platform_stats()
+
+# Home Page Bootstrap
+class HomeBootstrap:
+    """Everything the home page needs for its first render, in one response.
+
+    The catalog part (top vendors per category from a single $facet
+    aggregation, plus platform stats) is the same for every user, so it is
+    cached for `ttl_seconds` and rebuilt by one request at a time. The
+    full user document and recent chat sessions are read alongside it.
+    """
+    VENDOR_PROJECTION = {
+        "_id": 0, "availability_bits": 0, "availability_start": 0, "busy_days": 0, "imported_reviews": 0, "imported_rating_sum": 0
+    }
+    PREVIEW_CHARS = 160
+
+    def __init__(self, vendors_per_category: int, ttl_seconds: float, chat_previews: int):
+        self.vendors_per_category = vendors_per_category
+        self.ttl_seconds = ttl_seconds
+        self.chat_previews = chat_previews
+        self.catalog: Optional[Dict] = None
+        self.catalog_built_at = 0.0
+        self.flights = SingleFlight("bootstrap")
+
+    async def top_vendors(self) -> Dict[str, List[Vendor]]:
+        # Sorted once ahead of the facet, which keeps input order within each category
+        facets = {
+            f"c{index}": [{"$match": {"category": category}}, {"$limit": self.vendors_per_category}]
+            for index, category in enumerate(VENDOR_CATEGORIES)
+        }
+        results = await catalog_db.vendors.aggregate([
+            {"$match": {"category": {"$in": VENDOR_CATEGORIES}}},
+            {"$sort": {"rating_score": -1, "rating": -1}},
+            {"$project": self.VENDOR_PROJECTION},
+            {"$facet": facets}
+        ]).to_list(1)
+        grouped = results[0] if results else {}
+        return {
+            category: [Vendor(**vendor) for vendor in grouped.get(f"c{index}", [])]
+            for index, category in enumerate(VENDOR_CATEGORIES)
+        }
+
+    async def build_catalog(self) -> Dict:
+        vendors, stats = await asyncio.gather(self.top_vendors(), platform_stats())
+        self.catalog = jsonable_encoder({"vendors": vendors, "stats": stats})
+        self.catalog_built_at = time.monotonic()
+        return self.catalog
+
+    async def get_catalog(self) -> Dict:
+        if self.catalog is not None and time.monotonic() - self.catalog_built_at < self.ttl_seconds:
+            metrics.incr("bootstrap_cache_hits_total")
+            return self.catalog
+        metrics.incr("bootstrap_cache_misses_total")
+        return await self.flights.do("catalog", self.build_catalog)
+
+    async def recent_sessions(self, user_id: str) -> List[Dict]:
+        sessions = await db.chat_sessions.find(
+            {"user_id": user_id},
+            {"_id": 0, "session_id": 1, "summary": 1, "updated_at": 1, "archived": 1, "messages": {"$slice": -1}}
+        ).sort("updated_at", -1).limit(self.chat_previews).to_list(self.chat_previews)
+        previews = []
+        for session in sessions:
+            messages = session.get("messages") or []
+            # Archived sessions keep only their summary until they are opened
+            text = messages[-1].get("content", "") if messages else session.get("summary", "")
+            previews.append({
+                "session_id": session["session_id"],
+                "updated_at": session.get("updated_at"),
+                "preview": text[:self.PREVIEW_CHARS],
+                "archived": bool(session.get("archived"))
+            })
+        return previews
+
+    async def build(self, user_id: Optional[str]) -> Dict:
+        if not user_id:
+            return {"user": None, "chat_sessions": [], **await self.get_catalog()}
+        catalog, user, sessions = await asyncio.gather(
+            self.get_catalog(),
+            db.users.find_one({"id": user_id}),
+            self.recent_sessions(user_id)
+        )
+        if not user:
+            return {"user": None, "chat_sessions": [], **catalog}
+        return {"user": jsonable_encoder(User(**user)), "chat_sessions": sessions, **catalog}
+
+home_bootstrap = HomeBootstrap(BOOTSTRAP_VENDORS_PER_CATEGORY, BOOTSTRAP_CACHE_TTL_SECONDS, BOOTSTRAP_CHAT_PREVIEWS)
+
+@api_router.get("/bootstrap")
+async def get_bootstrap(user_id: Optional[str] = None):
+    """Home page data in one round trip: user, top vendors per category, stats and chat previews"""
+    return await home_bootstrap.build(user_id)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Innermost, so stored idempotent responses are uncompressed
+app.add_middleware(IdempotencyMiddleware)
+
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Inside CORS so 429 responses still carry CORS headers
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -715,14 +4653,106 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database with sample data"""
-    logger.info("Starting AI Wedding Services Platform...")
-    
-    # Create sample vendors if database is empty or incomplete
+# Startup Initialization
+class MongoLock:
+    """Lease-based lock shared by every process using the database"""
+    def __init__(self, name: str, lease_seconds: int):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            # Matches a free or expired lock; otherwise the upsert collides with the holder's _id
+            await db.locks.update_one(
+                {"_id": self.name, "$or": [{"expires_at": {"$lt": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def release(self):
+        await db.locks.delete_one({"_id": self.name, "owner": self.owner})
+
+    async def wait_released(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not await db.locks.find_one({"_id": self.name, "expires_at": {"$gte": datetime.utcnow()}}):
+                return True
+            await asyncio.sleep(1)
+        return False
+
+async def ensure_indexes():
+    await job_queue.ensure_indexes()
+    await recommendation_store.ensure_indexes()
+    await vendor_inbox.ensure_indexes()
+    await vendor_reviews.ensure_indexes()
+    await chat_archiver.ensure_indexes()
+    await IdempotencyMiddleware.ensure_indexes()
+    if isinstance(rate_limit_store, MongoRateLimitStore):
+        await rate_limit_store.ensure_indexes()
+    await db.vendors.create_index([("geo", "2dsphere")])
+    await db.chat_sessions.create_index([("user_id", 1), ("updated_at", -1)])
+    await db.vendor_rankings.create_index("key", unique=True)
+    await db.vendor_rankings.create_index("created_at", expireAfterSeconds=VENDOR_RANKING_TTL_SECONDS)
+
+async def run_migrations():
+    """Idempotent data migrations for documents written by older releases"""
+    # Backfill coordinates for vendors created before geospatial search
+    backfilled = await backfill_vendor_coordinates()
+    if backfilled:
+        logger.info(f"Backfilled coordinates for {backfilled} vendors")
+        await recommendation_store.bump_catalog_version()
+    # Rating aggregates start from the seeded rating and review count
+    rated = await vendor_reviews.backfill_imported()
+    if rated:
+        logger.info(f"Backfilled rating aggregates for {rated} vendors")
+        await recommendation_store.bump_catalog_version()
+    busy = await availability_calendar.backfill_busy_days()
+    if busy:
+        logger.info(f"Backfilled busy days for {busy} vendors")
+    # Timelines from older rules (including the former static timeline) are rebuilt in the background
+    if await db.wedding_plans.find_one({"timeline.rules_version": {"$ne": TimelineEngine.RULES_VERSION}}, {"_id": 1}):
+        await job_queue.enqueue("regenerate_timelines", {}, dedupe_key="regenerate_timelines")
+    # Inbox counters start from the inquiries written before they existed
+    if not await db.inbox_counters.find_one({}) and await db.inquiries.find_one({}):
+        counted = await vendor_inbox.rebuild_counters()
+        logger.info(f"Initialized inbox counters for {counted} vendors")
+
+async def initialize_database(wait_seconds: float = INIT_LOCK_WAIT_SECONDS) -> bool:
+    """One-time setup (indexes, sample data, migrations) run by a single process at a time.
+
+    Returns False when another process holds the init lock; callers then wait
+    up to `wait_seconds` for it to finish rather than initializing twice.
+    """
+    lock = MongoLock("startup_init", INIT_LOCK_LEASE_SECONDS)
+    if not await lock.acquire():
+        logger.info("Database initialization is running in another process, waiting for it")
+        if not await lock.wait_released(wait_seconds):
+            logger.warning(f"Database initialization did not finish within {wait_seconds}s, continuing")
+        return False
+    try:
+        started = time.perf_counter()
+        await ensure_indexes()
+        await seed_sample_vendors()
+        await run_migrations()
+        await chat_archiver.schedule()
+        await db.meta.update_one(
+            {"_id": "startup_init"},
+            {"$set": {"completed_at": datetime.utcnow(), "owner": lock.owner, "duration_seconds": round(time.perf_counter() - started, 2)}},
+            upsert=True
+        )
+        return True
+    finally:
+        await lock.release()
+
+async def seed_sample_vendors():
+    """Create sample vendors if the database is empty or incomplete"""
     vendor_count = await db.vendors.count_documents({})
-    required_categories = ["Photography", "Catering", "Venue", "Decoration", "Music", "Transportation", "Makeup", "Invitations", "Jewelry", "Clothing"]
+    required_categories = VENDOR_CATEGORIES
     
     # Check if we have vendors for all required categories
     existing_categories = await db.vendors.distinct("category")
@@ -1042,9 +5072,11 @@ async def startup_event():
         try:
             for vendor_data in sample_vendors:
                 vendor = Vendor(**vendor_data)
-                await db.vendors.insert_one(vendor.dict())
+                vendor.geo = city_geo_point(vendor.location)
+                await db.vendors.insert_one(vendor.dict(exclude={"distance_km"}))
             
             logger.info(f"Successfully initialized {len(sample_vendors)} sample vendors")
+            await recommendation_store.bump_catalog_version()
             
             # Verify the initialization
             final_count = await db.vendors.count_documents({})
@@ -1058,7 +5090,8 @@ async def startup_event():
             for vendor_data in sample_vendors:
                 try:
                     vendor = Vendor(**vendor_data)
-                    await db.vendors.insert_one(vendor.dict())
+                    vendor.geo = city_geo_point(vendor.location)
+                    await db.vendors.insert_one(vendor.dict(exclude={"distance_km"}))
                     successful_inserts += 1
                 except Exception as insert_error:
                     logger.error(f"Error inserting vendor {vendor_data.get('business_name', 'Unknown')}: {insert_error}")
@@ -1067,6 +5100,20 @@ async def startup_event():
     else:
         logger.info(f"Database already has {vendor_count} vendors with all categories covered")
 
+@app.on_event("startup")
+async def startup_event():
+    """Per-worker startup; one-time database setup runs here only in single-process mode"""
+    logger.info("Starting AI Wedding Services Platform...")
+    
+    if not SKIP_STARTUP_INIT:
+        await initialize_database()
+    if JOB_WORKERS_ENABLED:
+        job_workers.start()
+    inquiry_notifier.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await job_workers.stop()
+    await inquiry_notifier.stop()
+    portfolio_images.shutdown()
     client.close()
\ No newline at end of file
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 import requests
+import base64
 import json
 import uuid
 from datetime import datetime, timedelta
 import time
 import os
+import subprocess
 import sys
 
 # Get the backend URL from the frontend .env file
@@ -23,6 +25,12 @@ if not BACKEND_URL:
 API_URL = f"{BACKEND_URL}/api"
 print(f"Using API URL: {API_URL}")
 
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+# Seconds allowed for a fresh worker process to import the API module
+COLD_START_BUDGET_SECONDS = float(os.environ.get("COLD_START_BUDGET_SECONDS", "2.0"))
+# 1x1 PNG used for portfolio uploads
+TEST_IMAGE_PNG = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg==")
+
 # Test data
 test_user = {
     "name": "Priya Sharma",
@@ -92,7 +100,30 @@ test_results = {
     "web_search_enhancement": {"status": "Not tested", "details": ""},
     "expanded_sample_database": {"status": "Not tested", "details": ""},
     "new_vendor_creation": {"status": "Not tested", "details": ""},
-    "category_filtering": {"status": "Not tested", "details": ""}
+    "category_filtering": {"status": "Not tested", "details": ""},
+    "batch_recommendations": {"status": "Not tested", "details": ""},
+    "vendor_availability": {"status": "Not tested", "details": ""},
+    "geo_search": {"status": "Not tested", "details": ""},
+    "cold_start": {"status": "Not tested", "details": ""},
+    "inquiry_inbox": {"status": "Not tested", "details": ""},
+    "bundle_optimizer": {"status": "Not tested", "details": ""},
+    "idempotency_keys": {"status": "Not tested", "details": ""},
+    "rate_limits": {"status": "Not tested", "details": ""},
+    "vendor_reviews": {"status": "Not tested", "details": ""},
+    "portfolio_upload": {"status": "Not tested", "details": ""},
+    "bootstrap": {"status": "Not tested", "details": ""},
+    "rate_limit_clients": {"status": "Not tested", "details": ""},
+    "optimizer_exact_budget": {"status": "Not tested", "details": ""},
+    "ranking_applied": {"status": "Not tested", "details": ""},
+    "chat_rearchive": {"status": "Not tested", "details": ""},
+    "portfolio_pixel_limit": {"status": "Not tested", "details": ""},
+    "idempotency_scope": {"status": "Not tested", "details": ""},
+    "intent_classifier": {"status": "Not tested", "details": ""},
+    "job_worker_resilience": {"status": "Not tested", "details": ""},
+    "job_retry_supersede": {"status": "Not tested", "details": ""},
+    "chat_cache_followups": {"status": "Not tested", "details": ""},
+    "chat_context_recent_turns": {"status": "Not tested", "details": ""},
+    "preference_parser": {"status": "Not tested", "details": ""}
 }
 
 created_user_id = None
@@ -102,6 +133,11 @@ chat_session_id = None
 def print_separator():
     print("\n" + "="*80 + "\n")
 
+def run_backend_probe(script):
+    """Run a script against the server module (in-process checks the HTTP API cannot reach) and return its output"""
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
 def test_user_management():
     global created_user_id
     print_separator()
@@ -356,8 +392,8 @@ def test_wedding_plans():
         # Check if timeline was auto-generated
         if "timeline" in plan_data and plan_data["timeline"]:
             print("Timeline was auto-generated:")
-            for key, items in plan_data["timeline"].items():
-                print(f"  {key}: {', '.join(items[:2])}...")
+            for milestone in plan_data["timeline"]["milestones"][:5]:
+                print(f"  {milestone['due_date'][:10]} ({milestone['window']}): {milestone['task']}")
         
         # Test getting wedding plans for a user
         print(f"Getting wedding plans for user ID: {created_user_id}")
@@ -639,6 +675,1129 @@ def test_category_filtering():
         print(f"Error testing category filtering: {str(e)}")
         return False
 
+def test_batch_recommendations():
+    global created_user_id
+    print_separator()
+    print("Testing Batch Recommendations...")
+    
+    if not created_user_id:
+        test_results["batch_recommendations"]["status"] = "Skipped"
+        test_results["batch_recommendations"]["details"] = "User creation failed, cannot test batch recommendations"
+        print("Skipping batch recommendations test as user creation failed")
+        return False
+    
+    try:
+        categories = ["Photography", "Venue", "Catering"]
+        print(f"Getting batch recommendations for {categories}")
+        response = requests.get(
+            f"{API_URL}/recommendations/{created_user_id}/batch",
+            params={"categories": ",".join(categories)}
+        )
+        response.raise_for_status()
+        batch = response.json()
+        
+        missing = [c for c in categories if c not in batch.get("categories", {})]
+        if missing:
+            test_results["batch_recommendations"]["status"] = "Failed"
+            test_results["batch_recommendations"]["details"] = f"Missing categories in batch response: {missing}"
+            return False
+        
+        for category, result in batch["categories"].items():
+            wrong = [v for v in result["recommendations"] if v["category"] != category]
+            if wrong:
+                test_results["batch_recommendations"]["status"] = "Failed"
+                test_results["batch_recommendations"]["details"] = f"{category} batch returned vendors from other categories"
+                return False
+            print(f"{category}: {result['total_count']} recommendations")
+        
+        # Concurrent identical requests should all succeed (they share one computation)
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            responses = list(pool.map(
+                lambda _: requests.get(f"{API_URL}/recommendations/{created_user_id}?category=Photography"),
+                range(5)
+            ))
+        if any(r.status_code != 200 for r in responses):
+            test_results["batch_recommendations"]["status"] = "Failed"
+            test_results["batch_recommendations"]["details"] = "Concurrent recommendation requests failed"
+            return False
+        
+        test_results["batch_recommendations"]["status"] = "Passed"
+        test_results["batch_recommendations"]["details"] = f"Batch endpoint returned {len(categories)} categories"
+        return True
+    
+    except Exception as e:
+        test_results["batch_recommendations"]["status"] = "Failed"
+        test_results["batch_recommendations"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing batch recommendations: {str(e)}")
+        return False
+
+def test_vendor_availability():
+    global created_vendor_id
+    print_separator()
+    print("Testing Vendor Availability Calendar...")
+    
+    if not created_vendor_id:
+        test_results["vendor_availability"]["status"] = "Skipped"
+        test_results["vendor_availability"]["details"] = "Vendor creation failed, cannot test availability"
+        print("Skipping vendor availability test as vendor creation failed")
+        return False
+    
+    try:
+        blocked_date = (datetime.now() + timedelta(days=45)).date().isoformat()
+        print(f"Blocking {blocked_date} for vendor ID: {created_vendor_id}")
+        response = requests.put(
+            f"{API_URL}/vendors/{created_vendor_id}/availability",
+            json={"blocked": [{"start": blocked_date}]}
+        )
+        response.raise_for_status()
+        
+        response = requests.get(f"{API_URL}/vendors", params={"category": test_vendor["category"], "date": blocked_date})
+        response.raise_for_status()
+        if any(v["id"] == created_vendor_id for v in response.json()):
+            test_results["vendor_availability"]["status"] = "Failed"
+            test_results["vendor_availability"]["details"] = "Busy vendor returned for a blocked date"
+            return False
+        
+        print(f"Re-opening {blocked_date}")
+        response = requests.put(
+            f"{API_URL}/vendors/{created_vendor_id}/availability",
+            json={"opened": [{"start": blocked_date}]}
+        )
+        response.raise_for_status()
+        if response.json()["unavailable_dates"]:
+            test_results["vendor_availability"]["status"] = "Failed"
+            test_results["vendor_availability"]["details"] = "Re-opened date still marked unavailable"
+            return False
+        
+        test_results["vendor_availability"]["status"] = "Passed"
+        test_results["vendor_availability"]["details"] = "Blocked dates exclude the vendor from date-filtered listings"
+        return True
+    
+    except Exception as e:
+        test_results["vendor_availability"]["status"] = "Failed"
+        test_results["vendor_availability"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing vendor availability: {str(e)}")
+        return False
+
+def test_geo_search():
+    print_separator()
+    print("Testing Geospatial Vendor Search...")
+    
+    try:
+        # A small radius around Mumbai should only return vendors within it, nearest first
+        response = requests.get(f"{API_URL}/vendors", params={"near": "19.0760,72.8777", "radius_km": 30})
+        response.raise_for_status()
+        vendors = response.json()
+        print(f"Found {len(vendors)} vendors within 30 km of Mumbai")
+        
+        distances = [v["distance_km"] for v in vendors]
+        if any(d is None or d > 30 for d in distances) or distances != sorted(distances):
+            test_results["geo_search"]["status"] = "Failed"
+            test_results["geo_search"]["details"] = f"Unexpected distances: {distances}"
+            return False
+        if any(v["location"] == "Delhi" for v in vendors):
+            test_results["geo_search"]["status"] = "Failed"
+            test_results["geo_search"]["details"] = "Delhi vendor returned for a Mumbai radius search"
+            return False
+        
+        response = requests.get(f"{API_URL}/vendors", params={"near": "not-a-place"})
+        if response.status_code != 400:
+            test_results["geo_search"]["status"] = "Failed"
+            test_results["geo_search"]["details"] = f"Invalid near returned {response.status_code}, expected 400"
+            return False
+        
+        test_results["geo_search"]["status"] = "Passed"
+        test_results["geo_search"]["details"] = f"Radius search returned {len(vendors)} vendors ordered by distance"
+        return True
+    
+    except Exception as e:
+        test_results["geo_search"]["status"] = "Failed"
+        test_results["geo_search"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing geospatial search: {str(e)}")
+        return False
+
+def test_cold_start():
+    print_separator()
+    print("Testing API Cold Start Budget...")
+    
+    probe = (
+        "import sys, time; start = time.perf_counter(); import server; "
+        "print(time.perf_counter() - start, 'emergentintegrations.llm.chat' in sys.modules)"
+    )
+    try:
+        timings = []
+        for _ in range(3):
+            result = subprocess.run([sys.executable, "-c", probe], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+            seconds, llm_loaded = result.stdout.split()
+            timings.append(float(seconds))
+        best = min(timings)
+        print(f"Import times: {', '.join(f'{t:.3f}s' for t in timings)} (budget {COLD_START_BUDGET_SECONDS}s)")
+        
+        if llm_loaded == "True":
+            test_results["cold_start"]["status"] = "Failed"
+            test_results["cold_start"]["details"] = "LLM integration is imported at startup instead of on first use"
+            return False
+        if best > COLD_START_BUDGET_SECONDS:
+            test_results["cold_start"]["status"] = "Failed"
+            test_results["cold_start"]["details"] = f"Importing server took {best:.2f}s, budget is {COLD_START_BUDGET_SECONDS}s (see `python manage.py importtime`)"
+            return False
+        
+        test_results["cold_start"]["status"] = "Passed"
+        test_results["cold_start"]["details"] = f"Importing server took {best:.2f}s (budget {COLD_START_BUDGET_SECONDS}s)"
+        return True
+    
+    except Exception as e:
+        test_results["cold_start"]["status"] = "Failed"
+        test_results["cold_start"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing cold start: {str(e)}")
+        return False
+
+def test_inquiry_inbox():
+    global created_user_id, created_vendor_id
+    print_separator()
+    print("Testing Batched Inquiries and Vendor Inbox...")
+    
+    if not created_user_id or not created_vendor_id:
+        test_results["inquiry_inbox"]["status"] = "Skipped"
+        test_results["inquiry_inbox"]["details"] = "User or vendor creation failed, cannot test inbox"
+        print("Skipping inquiry inbox test as user or vendor creation failed")
+        return False
+    
+    try:
+        response = requests.get(f"{API_URL}/vendors", params={"category": "Photography"})
+        response.raise_for_status()
+        other_vendor_id = next(v["id"] for v in response.json() if v["id"] != created_vendor_id)
+        
+        response = requests.get(f"{API_URL}/inquiries/vendor/{created_vendor_id}/counts")
+        response.raise_for_status()
+        counts_before = response.json()
+        
+        message = f"Batch inquiry {uuid.uuid4()}"
+        response = requests.post(f"{API_URL}/inquiries/batch", json={
+            "user_id": created_user_id,
+            "vendor_ids": [created_vendor_id, other_vendor_id, created_vendor_id],
+            "message": message
+        })
+        response.raise_for_status()
+        created = response.json()
+        print(f"Batch created {len(created)} inquiries")
+        if len(created) != 2:
+            test_results["inquiry_inbox"]["status"] = "Failed"
+            test_results["inquiry_inbox"]["details"] = f"Expected 2 inquiries for 2 distinct vendors, got {len(created)}"
+            return False
+        
+        response = requests.get(f"{API_URL}/inquiries/vendor/{created_vendor_id}", params={"limit": 1})
+        response.raise_for_status()
+        newest = response.json()
+        if len(newest) != 1 or newest[0]["message"] != message:
+            test_results["inquiry_inbox"]["status"] = "Failed"
+            test_results["inquiry_inbox"]["details"] = "Inbox page is not sorted newest first"
+            return False
+        
+        response = requests.get(f"{API_URL}/inquiries/vendor/{created_vendor_id}/counts")
+        response.raise_for_status()
+        counts_after = response.json()
+        if counts_after["unread"] != counts_before["unread"] + 1 or counts_after["pending"] != counts_before["pending"] + 1:
+            test_results["inquiry_inbox"]["status"] = "Failed"
+            test_results["inquiry_inbox"]["details"] = f"Counters did not advance: {counts_before} -> {counts_after}"
+            return False
+        
+        requests.post(f"{API_URL}/inquiries/{newest[0]['id']}/read").raise_for_status()
+        requests.put(f"{API_URL}/inquiries/{newest[0]['id']}/status", json={"status": "replied"}).raise_for_status()
+        response = requests.get(f"{API_URL}/inquiries/vendor/{created_vendor_id}/counts")
+        response.raise_for_status()
+        if response.json() != counts_before:
+            test_results["inquiry_inbox"]["status"] = "Failed"
+            test_results["inquiry_inbox"]["details"] = f"Counters not restored after read/reply: {response.json()} vs {counts_before}"
+            return False
+        
+        test_results["inquiry_inbox"]["status"] = "Passed"
+        test_results["inquiry_inbox"]["details"] = "Batch inquiries, sorted inbox pages and unread/pending counters work"
+        return True
+    
+    except Exception as e:
+        test_results["inquiry_inbox"]["status"] = "Failed"
+        test_results["inquiry_inbox"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing inquiry inbox: {str(e)}")
+        return False
+
+def test_bundle_optimizer():
+    global created_user_id
+    print_separator()
+    print("Testing Wedding Plan Bundle Optimizer...")
+    
+    if not created_user_id:
+        test_results["bundle_optimizer"]["status"] = "Skipped"
+        test_results["bundle_optimizer"]["details"] = "User creation failed, cannot test optimizer"
+        print("Skipping bundle optimizer test as user creation failed")
+        return False
+    
+    try:
+        plan_request = {**test_wedding_plan, "user_id": created_user_id, "budget": 3000000}
+        response = requests.post(f"{API_URL}/wedding-plans", json=plan_request)
+        response.raise_for_status()
+        plan_id = response.json()["id"]
+        
+        categories = ["Venue", "Catering", "Photography"]
+        response = requests.post(
+            f"{API_URL}/wedding-plans/{plan_id}/optimize",
+            json={"categories": categories, "top_n": 3, "match_location": False}
+        )
+        response.raise_for_status()
+        result = response.json()
+        bundles = result["bundles"]
+        print(f"Optimizer returned {len(bundles)} bundles in {result['elapsed_ms']} ms")
+        
+        if not bundles:
+            test_results["bundle_optimizer"]["status"] = "Failed"
+            test_results["bundle_optimizer"]["details"] = "No bundle fits a 30 lakh budget"
+            return False
+        for bundle in bundles:
+            if bundle["total_cost"] > plan_request["budget"] or [v["category"] for v in bundle["vendors"]] != categories:
+                test_results["bundle_optimizer"]["status"] = "Failed"
+                test_results["bundle_optimizer"]["details"] = f"Invalid bundle: {bundle}"
+                return False
+        utilities = [bundle["utility"] for bundle in bundles]
+        if utilities != sorted(utilities, reverse=True):
+            test_results["bundle_optimizer"]["status"] = "Failed"
+            test_results["bundle_optimizer"]["details"] = f"Bundles not ordered by utility: {utilities}"
+            return False
+        
+        test_results["bundle_optimizer"]["status"] = "Passed"
+        test_results["bundle_optimizer"]["details"] = f"{len(bundles)} in-budget bundles, best costs {bundles[0]['total_cost']}"
+        return True
+    
+    except Exception as e:
+        test_results["bundle_optimizer"]["status"] = "Failed"
+        test_results["bundle_optimizer"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing bundle optimizer: {str(e)}")
+        return False
+
+def test_idempotency_keys():
+    print_separator()
+    print("Testing Idempotency Keys...")
+    
+    try:
+        key = str(uuid.uuid4())
+        user_request = {**test_user, "email": f"retry-{key[:8]}@example.com"}
+        first = requests.post(f"{API_URL}/users", json=user_request, headers={"Idempotency-Key": key})
+        first.raise_for_status()
+        retry = requests.post(f"{API_URL}/users", json=user_request, headers={"Idempotency-Key": key})
+        retry.raise_for_status()
+        print(f"First user ID: {first.json()['id']}, retried user ID: {retry.json()['id']}")
+        
+        if retry.json()["id"] != first.json()["id"] or retry.headers.get("Idempotent-Replayed") != "true":
+            test_results["idempotency_keys"]["status"] = "Failed"
+            test_results["idempotency_keys"]["details"] = "Retry with the same key created a second user"
+            return False
+        
+        reused = requests.post(f"{API_URL}/users", json={**user_request, "name": "Someone Else"}, headers={"Idempotency-Key": key})
+        if reused.status_code != 422:
+            test_results["idempotency_keys"]["status"] = "Failed"
+            test_results["idempotency_keys"]["details"] = f"Key reused with a different body returned {reused.status_code}, expected 422"
+            return False
+        
+        test_results["idempotency_keys"]["status"] = "Passed"
+        test_results["idempotency_keys"]["details"] = "Retries replay the original response; key reuse with a new payload is rejected"
+        return True
+    
+    except Exception as e:
+        test_results["idempotency_keys"]["status"] = "Failed"
+        test_results["idempotency_keys"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing idempotency keys: {str(e)}")
+        return False
+
+def test_vendor_reviews():
+    global created_user_id, created_vendor_id
+    print_separator()
+    print("Testing Vendor Reviews...")
+    
+    if not created_user_id or not created_vendor_id:
+        test_results["vendor_reviews"]["status"] = "Skipped"
+        test_results["vendor_reviews"]["details"] = "User or vendor creation failed, cannot test reviews"
+        print("Skipping vendor reviews test as user or vendor creation failed")
+        return False
+    
+    try:
+        before = requests.get(f"{API_URL}/vendors/{created_vendor_id}").json()
+        review = {"user_id": created_user_id, "rating": 5, "comment": "Wonderful photos, delivered on time"}
+        response = requests.post(f"{API_URL}/vendors/{created_vendor_id}/reviews", json=review)
+        response.raise_for_status()
+        created = response.json()
+        print(f"Created review with ID: {created['id']}")
+        
+        after = requests.get(f"{API_URL}/vendors/{created_vendor_id}").json()
+        print(f"Rating {before['rating']} ({before['total_reviews']} reviews) -> {after['rating']} ({after['total_reviews']} reviews), score {after.get('rating_score')}")
+        if after["total_reviews"] != before["total_reviews"] + 1 or after.get("rating_score") is None:
+            test_results["vendor_reviews"]["status"] = "Failed"
+            test_results["vendor_reviews"]["details"] = "Vendor rating aggregate was not updated by the review"
+            return False
+        
+        duplicate = requests.post(f"{API_URL}/vendors/{created_vendor_id}/reviews", json=review)
+        if duplicate.status_code != 409:
+            test_results["vendor_reviews"]["status"] = "Failed"
+            test_results["vendor_reviews"]["details"] = f"Second review by the same user returned {duplicate.status_code}, expected 409"
+            return False
+        
+        response = requests.get(f"{API_URL}/vendors/{created_vendor_id}/reviews", params={"limit": 1})
+        response.raise_for_status()
+        page = response.json()
+        if len(page) != 1 or page[0]["id"] != created["id"]:
+            test_results["vendor_reviews"]["status"] = "Failed"
+            test_results["vendor_reviews"]["details"] = "Newest review is not first in the review list"
+            return False
+        
+        test_results["vendor_reviews"]["status"] = "Passed"
+        test_results["vendor_reviews"]["details"] = f"Review updated the vendor to {after['rating']} over {after['total_reviews']} reviews"
+        return True
+    
+    except Exception as e:
+        test_results["vendor_reviews"]["status"] = "Failed"
+        test_results["vendor_reviews"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing vendor reviews: {str(e)}")
+        return False
+
+def test_portfolio_upload():
+    global created_vendor_id
+    print_separator()
+    print("Testing Portfolio Image Upload...")
+    
+    if not created_vendor_id:
+        test_results["portfolio_upload"]["status"] = "Skipped"
+        test_results["portfolio_upload"]["details"] = "Vendor creation failed, cannot test portfolio upload"
+        print("Skipping portfolio upload test as vendor creation failed")
+        return False
+    
+    try:
+        response = requests.post(
+            f"{API_URL}/vendors/{created_vendor_id}/portfolio",
+            files={"file": ("sample.png", TEST_IMAGE_PNG, "image/png")}
+        )
+        response.raise_for_status()
+        image = response.json()
+        print(f"Uploaded image {image['id']}: {image['width']}x{image['height']}, {len(image['thumbnails'])} thumbnails")
+        
+        if (image["width"], image["height"]) != (1, 1) or not image["thumbnails"]:
+            test_results["portfolio_upload"]["status"] = "Failed"
+            test_results["portfolio_upload"]["details"] = "Upload did not record dimensions and thumbnails"
+            return False
+        
+        thumbnail_url = image["thumbnails"][0]["url"]
+        response = requests.get(thumbnail_url if thumbnail_url.startswith("http") else f"{BACKEND_URL}{thumbnail_url}")
+        response.raise_for_status()
+        print(f"Thumbnail Content-Type: {response.headers.get('Content-Type')}, Cache-Control: {response.headers.get('Cache-Control')}")
+        if "immutable" not in response.headers.get("Cache-Control", ""):
+            test_results["portfolio_upload"]["status"] = "Failed"
+            test_results["portfolio_upload"]["details"] = "Thumbnail is not served with long-lived cache headers"
+            return False
+        
+        vendor = requests.get(f"{API_URL}/vendors/{created_vendor_id}").json()
+        if image["id"] not in [item["id"] for item in vendor.get("portfolio", [])]:
+            test_results["portfolio_upload"]["status"] = "Failed"
+            test_results["portfolio_upload"]["details"] = "Uploaded image is missing from the vendor portfolio"
+            return False
+        
+        test_results["portfolio_upload"]["status"] = "Passed"
+        test_results["portfolio_upload"]["details"] = "Upload stored dimensions and a cacheable WebP thumbnail"
+        return True
+    
+    except Exception as e:
+        test_results["portfolio_upload"]["status"] = "Failed"
+        test_results["portfolio_upload"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing portfolio upload: {str(e)}")
+        return False
+
+def test_bootstrap():
+    global created_user_id
+    print_separator()
+    print("Testing Home Page Bootstrap...")
+    
+    if not created_user_id:
+        test_results["bootstrap"]["status"] = "Skipped"
+        test_results["bootstrap"]["details"] = "User creation failed, cannot test bootstrap"
+        print("Skipping bootstrap test as user creation failed")
+        return False
+    
+    try:
+        response = requests.get(f"{API_URL}/bootstrap", params={"user_id": created_user_id})
+        response.raise_for_status()
+        data = response.json()
+        vendor_count = sum(len(vendors) for vendors in data["vendors"].values())
+        print(f"Bootstrap: user {data['user'] and data['user']['id']}, {vendor_count} vendors in {len(data['vendors'])} categories, "
+              f"{len(data['chat_sessions'])} chat sessions, {data['stats']['total_vendors']} vendors in total")
+        
+        if not data["user"] or data["user"]["id"] != created_user_id:
+            test_results["bootstrap"]["status"] = "Failed"
+            test_results["bootstrap"]["details"] = "Bootstrap did not return the requested user"
+            return False
+        if data["user"].get("email") != test_user["email"] or not data["user"].get("created_at"):
+            test_results["bootstrap"]["status"] = "Failed"
+            test_results["bootstrap"]["details"] = "Bootstrap returned a partial user instead of the full profile"
+            return False
+        
+        for category, vendors in data["vendors"].items():
+            scores = [vendor.get("rating_score") or 0 for vendor in vendors]
+            if any(vendor["category"] != category for vendor in vendors) or scores != sorted(scores, reverse=True):
+                test_results["bootstrap"]["status"] = "Failed"
+                test_results["bootstrap"]["details"] = f"{category} vendors are mixed or not sorted by rating score"
+                return False
+        
+        if chat_session_id and chat_session_id not in [session["session_id"] for session in data["chat_sessions"]]:
+            test_results["bootstrap"]["status"] = "Failed"
+            test_results["bootstrap"]["details"] = "Recent chat session is missing from the previews"
+            return False
+        
+        anonymous = requests.get(f"{API_URL}/bootstrap")
+        anonymous.raise_for_status()
+        if anonymous.json()["user"] is not None:
+            test_results["bootstrap"]["status"] = "Failed"
+            test_results["bootstrap"]["details"] = "Bootstrap without user_id returned a user"
+            return False
+        
+        test_results["bootstrap"]["status"] = "Passed"
+        test_results["bootstrap"]["details"] = f"One request returned the user, {vendor_count} top vendors, stats and chat previews"
+        return True
+    
+    except Exception as e:
+        test_results["bootstrap"]["status"] = "Failed"
+        test_results["bootstrap"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing bootstrap: {str(e)}")
+        return False
+
+RATE_LIMIT_CLIENTS_PROBE = """
+import asyncio, server
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+policy = server.RateLimitPolicy(name="probe", path="^/api/", key="ip", capacity=1, period_seconds=60)
+limiter = server.RateLimitMiddleware(app, store=server.MemoryRateLimitStore(), policies=[policy])
+
+async def status(forwarded, peer="10.0.0.5"):
+    sent = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        sent.append(message)
+    scope = {"type": "http", "method": "GET", "path": "/api/stats", "query_string": b"",
+             "client": (peer, 443), "headers": [(b"x-forwarded-for", forwarded.encode())]}
+    await limiter(scope, receive, send)
+    return sent[0]["status"]
+
+async def main():
+    # Two clients behind the ingress, a repeat, a spoofed leftmost hop, and a forged header from outside
+    print(await status("203.0.113.7"), await status("198.51.100.9"), await status("203.0.113.7"),
+          await status("192.0.2.1, 203.0.113.7"), await status("192.0.2.99", peer="198.51.100.9"))
+    media_limited = any(p.name == "api_ip" and server.re.match(p.path, "/api/media/portfolio/a.webp")
+                        for p in server.RateLimitMiddleware.DEFAULT_POLICIES)
+    print(media_limited)
+
+asyncio.run(main())
+"""
+
+def test_rate_limit_clients():
+    print_separator()
+    print("Testing Rate Limit Client Identification...")
+    
+    try:
+        statuses, media_limited = run_backend_probe(RATE_LIMIT_CLIENTS_PROBE).splitlines()[-2:]
+        print(f"Statuses: {statuses}, media rate limited: {media_limited}")
+        
+        if statuses.split() != ["200", "200", "429", "429", "429"]:
+            test_results["rate_limit_clients"]["status"] = "Failed"
+            test_results["rate_limit_clients"]["details"] = f"Forwarded clients were not keyed separately (statuses {statuses})"
+            return False
+        if media_limited != "False":
+            test_results["rate_limit_clients"]["status"] = "Failed"
+            test_results["rate_limit_clients"]["details"] = "Media fetches count against the api_ip limit"
+            return False
+        
+        test_results["rate_limit_clients"]["status"] = "Passed"
+        test_results["rate_limit_clients"]["details"] = "Clients behind the ingress get separate buckets; spoofed hops and media are ignored"
+        return True
+    
+    except Exception as e:
+        test_results["rate_limit_clients"]["status"] = "Failed"
+        test_results["rate_limit_clients"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing rate limit clients: {str(e)}")
+        return False
+
+OPTIMIZER_EXACT_BUDGET_PROBE = """
+import itertools, random, server
+
+def vendor(vendor_id, price, rating):
+    return {"id": vendor_id, "pricing_range": {"min": price}, "rating": rating, "total_reviews": 200}
+
+# The best bundle spends exactly the budget
+catalog = {
+    "Venue": [vendor("A", 600000, 5.0), vendor("B", 500000, 3.0)],
+    "Photography": [vendor("C", 300000, 5.0), vendor("D", 190000, 3.0)],
+}
+bundles, _ = server.bundle_optimizer.solve(catalog, 900000, top_n=1)
+print(bundles[0]["total_cost"], "".join(v["vendor_id"] for v in bundles[0]["vendors"]))
+
+# Brute force over small random catalogs
+rng = random.Random(11)
+mismatches = 0
+for _ in range(200):
+    catalog = {
+        category: [vendor(f"{category}{i}", rng.randint(1, 90) * 1000, round(rng.uniform(3, 5), 1)) for i in range(rng.randint(1, 6))]
+        for category in ["Venue", "Photography", "Music"][:rng.randint(1, 3)]
+    }
+    budget = rng.choice([rng.randint(50, 200) * 1000, 123457])
+    got = [b["utility"] for b in server.bundle_optimizer.solve(catalog, budget, top_n=3)[0]]
+    options = [[(v["pricing_range"]["min"], server.bundle_optimizer.candidates([v], False, budget, 0, "min", 1.0, 1)) for v in vendors]
+               for vendors in catalog.values()]
+    totals = sorted((sum(c[1][0][1] for c in combo) for combo in itertools.product(*options)
+                     if all(c[1] for c in combo) and sum(c[0] for c in combo) <= budget), reverse=True)[:3]
+    mismatches += len(got) != len(totals) or any(abs(a - b) > 1e-3 for a, b in zip(got, totals))
+print(mismatches)
+"""
+
+def test_optimizer_exact_budget():
+    print_separator()
+    print("Testing Bundle Optimizer Exactness...")
+    
+    try:
+        best, mismatches = run_backend_probe(OPTIMIZER_EXACT_BUDGET_PROBE).splitlines()[-2:]
+        print(f"Best bundle at an exact budget: {best}, brute force mismatches: {mismatches}")
+        
+        if best.split() != ["900000.0", "AC"]:
+            test_results["optimizer_exact_budget"]["status"] = "Failed"
+            test_results["optimizer_exact_budget"]["details"] = f"A bundle costing exactly the budget was missed: {best}"
+            return False
+        if mismatches != "0":
+            test_results["optimizer_exact_budget"]["status"] = "Failed"
+            test_results["optimizer_exact_budget"]["details"] = f"{mismatches} of 200 random cases differ from brute force"
+            return False
+        
+        test_results["optimizer_exact_budget"]["status"] = "Passed"
+        test_results["optimizer_exact_budget"]["details"] = "Exact-budget bundles are found and 200 random cases match brute force"
+        return True
+    
+    except Exception as e:
+        test_results["optimizer_exact_budget"]["status"] = "Failed"
+        test_results["optimizer_exact_budget"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing optimizer exactness: {str(e)}")
+        return False
+
+RANKING_APPLIED_PROBE = """
+import asyncio, uuid
+from datetime import datetime
+import server
+
+async def main():
+    store = server.recommendation_store
+    user_id = f"probe-{uuid.uuid4()}"
+    vendors = [{"id": "a", "business_name": "Alpha"}, {"id": "b", "business_name": "Beta"}]
+    ranking_key = server.vendor_ranking_key({}, None, vendors)
+    # Stored before the ranking job finished, so still in rating order
+    await server.db.recommendations.insert_one({
+        "user_id": user_id, "category": "all", "vendors": vendors, "ranking_key": ranking_key,
+        "preferences": {}, "preferences_version": 0, "catalog_version": await store.get_catalog_version(),
+        "computed_at": datetime.utcnow(), "stale": False
+    })
+    try:
+        await store.apply_ranking(ranking_key, ["Beta", "Alpha"])
+        fresh = await store.get_fresh(user_id, None)
+        print(",".join(v["business_name"] for v in fresh["vendors"]) if fresh else "stale")
+    finally:
+        await server.db.recommendations.delete_many({"user_id": user_id})
+        server.client.close()
+
+asyncio.run(main())
+"""
+
+def test_ranking_applied():
+    print_separator()
+    print("Testing AI Ranking Applied to Stored Recommendations...")
+    
+    try:
+        order = run_backend_probe(RANKING_APPLIED_PROBE).splitlines()[-1]
+        print(f"Stored order after the ranking job: {order}")
+        
+        if order != "Beta,Alpha":
+            test_results["ranking_applied"]["status"] = "Failed"
+            test_results["ranking_applied"]["details"] = f"Next read after the ranking job returned {order}, expected Beta,Alpha"
+            return False
+        
+        test_results["ranking_applied"]["status"] = "Passed"
+        test_results["ranking_applied"]["details"] = "A finished ranking reorders the stored recommendations for the next read"
+        return True
+    
+    except Exception as e:
+        test_results["ranking_applied"]["status"] = "Failed"
+        test_results["ranking_applied"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing ranking application: {str(e)}")
+        return False
+
+CHAT_REARCHIVE_PROBE = """
+import asyncio, uuid
+from datetime import datetime, timedelta
+import server
+
+async def main():
+    archiver = server.chat_archiver
+    session_id = f"probe-{uuid.uuid4()}"
+    idle = datetime.utcnow() - timedelta(days=archiver.retention_days + 1)
+    messages = [{"role": "user", "content": "Need a decorator"}, {"role": "assistant", "content": "Here are three"}]
+    await server.db.chat_sessions.insert_one({
+        "id": session_id, "session_id": session_id, "user_id": "probe", "messages": messages,
+        "summary": "Asked for decorators", "summarized_messages": len(messages), "updated_at": idle
+    })
+    results = []
+    try:
+        for _ in range(2):
+            session = await server.db.chat_sessions.find_one({"id": session_id, **archiver.idle_query(datetime.utcnow())})
+            results.append(session is not None and await archiver.archive_session(session))
+            restored = await archiver.rehydrate(await server.db.chat_sessions.find_one({"id": session_id}))
+            results.append(len(restored["messages"]) == len(messages))
+            # The restored session goes idle again
+            await server.db.chat_sessions.update_one({"id": session_id}, {"$set": {"updated_at": idle}})
+        print(" ".join(str(result) for result in results))
+    finally:
+        await server.db.chat_sessions.delete_many({"id": session_id})
+        server.client.close()
+
+asyncio.run(main())
+"""
+
+def test_chat_rearchive():
+    print_separator()
+    print("Testing Chat Re-Archiving After Restore...")
+    
+    try:
+        results = run_backend_probe(CHAT_REARCHIVE_PROBE).splitlines()[-1]
+        print(f"Archive, restore, archive, restore: {results}")
+        
+        if results != "True True True True":
+            test_results["chat_rearchive"]["status"] = "Failed"
+            test_results["chat_rearchive"]["details"] = f"Archive/restore cycle returned {results}"
+            return False
+        
+        test_results["chat_rearchive"]["status"] = "Passed"
+        test_results["chat_rearchive"]["details"] = "Restored sessions are archived again once idle"
+        return True
+    
+    except Exception as e:
+        test_results["chat_rearchive"]["status"] = "Failed"
+        test_results["chat_rearchive"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing chat re-archiving: {str(e)}")
+        return False
+
+PORTFOLIO_PIXEL_LIMIT_PROBE = """
+import io
+from PIL import Image
+import server
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+default_limit = Image.MAX_IMAGE_PIXELS
+results = []
+# Just over the limit, and far below the 2x threshold where Pillow itself refuses
+for size in [(100, 100), (101, 100)]:
+    try:
+        server.render_portfolio_image(png(*size), (320,), 10000)
+        results.append("ok")
+    except server.ImageTooLargeError:
+        results.append("too_large")
+print(" ".join(results), Image.MAX_IMAGE_PIXELS == default_limit)
+"""
+
+def test_portfolio_pixel_limit():
+    print_separator()
+    print("Testing Portfolio Pixel Limit...")
+    
+    try:
+        results = run_backend_probe(PORTFOLIO_PIXEL_LIMIT_PROBE).splitlines()[-1]
+        print(f"At the limit, one column over, Pillow default untouched: {results}")
+        
+        if results != "ok too_large True":
+            test_results["portfolio_pixel_limit"]["status"] = "Failed"
+            test_results["portfolio_pixel_limit"]["details"] = f"Pixel limit check returned {results}"
+            return False
+        
+        test_results["portfolio_pixel_limit"]["status"] = "Passed"
+        test_results["portfolio_pixel_limit"]["details"] = "Images over the pixel limit are rejected without changing Pillow's global limit"
+        return True
+    
+    except Exception as e:
+        test_results["portfolio_pixel_limit"]["status"] = "Failed"
+        test_results["portfolio_pixel_limit"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing portfolio pixel limit: {str(e)}")
+        return False
+
+IDEMPOTENCY_SCOPE_PROBE = """
+import asyncio, uuid, server
+
+calls = []
+
+async def app(scope, receive, send):
+    calls.append((await receive())["body"])
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": str(len(calls)).encode()})
+
+middleware = server.IdempotencyMiddleware(app)
+key = f"probe-{uuid.uuid4()}"
+
+async def post(forwarded, body=b"{}"):
+    sent = []
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    async def send(message):
+        sent.append(message)
+    scope = {"type": "http", "method": "POST", "path": "/api/inquiries", "query_string": b"", "client": ("10.0.0.5", 443),
+             "headers": [(b"idempotency-key", key.encode()), (b"x-forwarded-for", forwarded.encode()),
+                         (b"content-type", b"application/json")]}
+    await middleware(scope, receive, send)
+    return sent[-1]["body"].decode()
+
+async def main():
+    try:
+        # Two clients behind the ingress reuse a key, then the first client retries
+        print(await post("203.0.113.7"), await post("198.51.100.9"), await post("203.0.113.7"),
+              await post("203.0.113.7", b'{"user_id": "probe-user"}'), len(calls))
+    finally:
+        await server.db.idempotency_keys.delete_many({"_id": {"$regex": key}})
+        server.client.close()
+
+asyncio.run(main())
+"""
+
+def test_idempotency_scope():
+    print_separator()
+    print("Testing Idempotency Key Scoping...")
+    
+    try:
+        results = run_backend_probe(IDEMPOTENCY_SCOPE_PROBE).splitlines()[-1]
+        print(f"Responses and handler calls: {results}")
+        
+        if results.split() != ["1", "2", "1", "3", "3"]:
+            test_results["idempotency_scope"]["status"] = "Failed"
+            test_results["idempotency_scope"]["details"] = f"Same key from different callers returned {results}, expected 1 2 1 3 3"
+            return False
+        
+        test_results["idempotency_scope"]["status"] = "Passed"
+        test_results["idempotency_scope"]["details"] = "Keys are scoped per client IP and per user id"
+        return True
+    
+    except Exception as e:
+        test_results["idempotency_scope"]["status"] = "Failed"
+        test_results["idempotency_scope"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing idempotency key scoping: {str(e)}")
+        return False
+
+INTENT_CLASSIFIER_PROBE = """
+import server
+
+with open("benchmarks/chat_messages.txt") as corpus:
+    benchmark_messages = [line.strip() for line in corpus if line.strip()]
+messages = [
+    "What is the current price for a venue in Mumbai?",
+    "Photography budget",
+    "Our photographer quoted less than the caterer",
+    "Latest 2025 trends for a winter wedding date",
+    "Is the weather online today any good?",
+    "What does catering cost per plate?",
+    "Hello"
+]
+# Reference: the plain substring checks each call site used to run
+mismatches = [
+    message for message in messages + benchmark_messages
+    if server.intent_classifier.classify(message) != {
+        intent for intent, keywords in server.INTENT_KEYWORDS.items() if any(keyword in message.lower() for keyword in keywords)
+    }
+]
+print(len(mismatches))
+for message in messages[:3] + ["What are the latest trends in bridal jewelry?"]:
+    print(",".join(sorted(server.intent_classifier.classify(message))))
+"""
+
+def test_intent_classifier():
+    print_separator()
+    print("Testing Intent Classifier...")
+    
+    try:
+        mismatches, venue_price, photography_budget, photographer, latest_trends = run_backend_probe(INTENT_CLASSIFIER_PROBE).splitlines()[-5:]
+        print(f"Mismatches against substring checks: {mismatches}")
+        print(f"Venue price intents: {venue_price}; photography budget intents: {photography_budget}; photographer intents: {photographer}")
+        print(f"Latest trends intents: {latest_trends}")
+        
+        expected = [
+            "metro_city,planning,price,pricing,trends,venue,web_search",
+            "budget,photography,planning",
+            "photographer",
+            # "trends" overlaps the longer "latest trend" and must still be found
+            "trends,trends_named,web_search"
+        ]
+        if mismatches != "0" or [venue_price, photography_budget, photographer, latest_trends] != expected:
+            test_results["intent_classifier"]["status"] = "Failed"
+            test_results["intent_classifier"]["details"] = f"{mismatches} mismatches; intents {venue_price} / {photography_budget} / {photographer} / {latest_trends}"
+            return False
+        
+        test_results["intent_classifier"]["status"] = "Passed"
+        test_results["intent_classifier"]["details"] = "Classifier intents match the original per-call-site keyword checks over the benchmark corpus"
+        return True
+    
+    except Exception as e:
+        test_results["intent_classifier"]["status"] = "Failed"
+        test_results["intent_classifier"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing intent classifier: {str(e)}")
+        return False
+
+JOB_WORKER_RESILIENCE_PROBE = """
+import asyncio, server
+
+class BrokenStore:
+    lease_seconds = 0.03
+    def __init__(self):
+        self.handlers = {"ok": self.ok, "boom": self.boom, "slow": self.slow}
+        self.extensions = 0
+    async def ok(self):
+        return 1
+    async def boom(self):
+        raise RuntimeError("handler failed")
+    async def slow(self):
+        await asyncio.sleep(0.1)
+    async def complete(self, job, result=None):
+        raise RuntimeError("store unavailable")
+    async def fail(self, job, error):
+        raise RuntimeError("store unavailable")
+    async def extend_lease(self, job):
+        self.extensions += 1
+        raise RuntimeError("store unavailable")
+
+async def main():
+    store = BrokenStore()
+    pool = server.JobWorkerPool(store, 1, 0.01, server.ProviderRateLimiter({}))
+    # Each run must return normally even though recording its outcome fails
+    for kind in ["ok", "boom", "missing", "slow"]:
+        await pool.run(server.Job(kind=kind))
+    print(pool.running, store.extensions >= 2)
+
+asyncio.run(main())
+"""
+
+def test_job_worker_resilience():
+    print_separator()
+    print("Testing Job Worker Resilience to Store Errors...")
+    
+    try:
+        running, lease_kept = run_backend_probe(JOB_WORKER_RESILIENCE_PROBE).splitlines()[-1].split()
+        print(f"Jobs still marked running: {running}, lease keeper survived errors: {lease_kept}")
+        
+        if running != "0" or lease_kept != "True":
+            test_results["job_worker_resilience"]["status"] = "Failed"
+            test_results["job_worker_resilience"]["details"] = f"Running {running}, lease keeper survived {lease_kept}"
+            return False
+        
+        test_results["job_worker_resilience"]["status"] = "Passed"
+        test_results["job_worker_resilience"]["details"] = "Store errors while completing, failing or extending a job do not kill the worker"
+        return True
+    
+    except Exception as e:
+        test_results["job_worker_resilience"]["status"] = "Failed"
+        test_results["job_worker_resilience"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing job worker resilience: {str(e)}")
+        return False
+
+JOB_RETRY_SUPERSEDE_PROBE = """
+import asyncio, uuid, server
+
+async def main():
+    queue = server.job_queue
+    await queue.ensure_indexes()
+    dedupe_key = f"probe:{uuid.uuid4()}"
+    first_id = await queue.enqueue("probe", {}, dedupe_key=dedupe_key)
+    try:
+        await server.db.jobs.update_one({"id": first_id}, {"$set": {"status": "running", "worker_id": "probe", "attempts": 1}})
+        # Enqueued again while the first one runs, then the first one fails
+        twin_id = await queue.enqueue("probe", {}, dedupe_key=dedupe_key)
+        await queue.fail(server.Job(**await server.db.jobs.find_one({"id": first_id})), "provider outage")
+        first = await server.db.jobs.find_one({"id": first_id})
+        print(first["status"], first.get("superseded_by") == twin_id, twin_id != first_id)
+    finally:
+        await server.db.jobs.delete_many({"dedupe_key": dedupe_key})
+        server.client.close()
+
+asyncio.run(main())
+"""
+
+def test_job_retry_supersede():
+    print_separator()
+    print("Testing Job Retry With a Queued Twin...")
+    
+    try:
+        results = run_backend_probe(JOB_RETRY_SUPERSEDE_PROBE).splitlines()[-1]
+        print(f"Failed job status, superseded by twin, twin is a new job: {results}")
+        
+        if results != "done True True":
+            test_results["job_retry_supersede"]["status"] = "Failed"
+            test_results["job_retry_supersede"]["details"] = f"Retry alongside a queued twin returned {results}"
+            return False
+        
+        test_results["job_retry_supersede"]["status"] = "Passed"
+        test_results["job_retry_supersede"]["details"] = "A retry that collides with a queued twin is superseded instead of raising"
+        return True
+    
+    except Exception as e:
+        test_results["job_retry_supersede"]["status"] = "Failed"
+        test_results["job_retry_supersede"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing job retry supersede: {str(e)}")
+        return False
+
+CHAT_CACHE_FOLLOWUPS_PROBE = """
+import server
+
+cache = server.ChatResponseCache(True, 3600, 100, False, 0.85)
+context = {"budget": 800000, "location": "Mumbai", "style_preference": "Traditional"}
+for message in ["Tell me more", "yes", "What about the second one?", "What is the average cost of a photographer in Mumbai?"]:
+    cache.put(message, context, {"response": message})
+# Short follow-ups are neither stored nor looked up; a standalone question still hits
+print(len(cache.entries), cache.get("tell me more please", context), cache.get("Yes!", context),
+      cache.get("what is the average cost of a photographer in mumbai", context)["response"])
+"""
+
+def test_chat_cache_followups():
+    print_separator()
+    print("Testing Chat Cache Skips Follow-Ups...")
+    
+    try:
+        results = run_backend_probe(CHAT_CACHE_FOLLOWUPS_PROBE).splitlines()[-1]
+        print(f"Entries and lookups: {results}")
+        
+        if results != "2 None None What is the average cost of a photographer in Mumbai?":
+            test_results["chat_cache_followups"]["status"] = "Failed"
+            test_results["chat_cache_followups"]["details"] = f"Short follow-ups were cached: {results}"
+            return False
+        
+        test_results["chat_cache_followups"]["status"] = "Passed"
+        test_results["chat_cache_followups"]["details"] = "Short follow-ups bypass the response cache; standalone questions still hit"
+        return True
+    
+    except Exception as e:
+        test_results["chat_cache_followups"]["status"] = "Failed"
+        test_results["chat_cache_followups"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing chat cache follow-ups: {str(e)}")
+        return False
+
+CHAT_CONTEXT_RECENT_TURNS_PROBE = """
+import server
+
+context = server.ChatContextManager(recent_turns=2, token_budget=100000, summary_max_tokens=400, fold_turns=2)
+# Summarization has fallen 10 turns behind
+messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(20)]
+session = server.ChatSession(user_id="probe", session_id="probe", messages=messages, summary="Earlier turns", summarized_messages=0)
+prompt = context.build_prompt(session, "What next?")["message"]
+print(sum(line.startswith(("User:", "Assistant:")) for line in prompt.splitlines()), "message 16" in prompt, "message 15" in prompt)
+"""
+
+def test_chat_context_recent_turns():
+    print_separator()
+    print("Testing Chat Context Recent-Turn Cap...")
+    
+    try:
+        results = run_backend_probe(CHAT_CONTEXT_RECENT_TURNS_PROBE).splitlines()[-1]
+        print(f"Verbatim messages, newest kept, older skipped: {results}")
+        
+        if results != "4 True False":
+            test_results["chat_context_recent_turns"]["status"] = "Failed"
+            test_results["chat_context_recent_turns"]["details"] = f"Prompt with a lagging summary returned {results}, expected 4 True False"
+            return False
+        
+        test_results["chat_context_recent_turns"]["status"] = "Passed"
+        test_results["chat_context_recent_turns"]["details"] = "Only the recent turns are replayed when the summary lags"
+        return True
+    
+    except Exception as e:
+        test_results["chat_context_recent_turns"]["status"] = "Failed"
+        test_results["chat_context_recent_turns"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing chat context recent turns: {str(e)}")
+        return False
+
+PREFERENCE_PARSER_PROBE = """
+import server
+
+messages = [
+    "Our wedding is in Jaipur",
+    "Compare Mumbai and Delhi venues",
+    "We moved from Delhi to Jaipur",
+    "We moved from Delhi, the wedding will be in Jaipur",
+    "Bengaluru or Bangalore, same thing",
+    "Budget is 25 lakhs",
+    "Our budget is ₹15",
+    "Budget of ₹1500000"
+]
+for message in messages:
+    parsed = server.PreferenceParser.parse(message)
+    print(parsed.get("location"), parsed.get("budget"))
+"""
+
+def test_preference_parser():
+    print_separator()
+    print("Testing Chat Preference Parser...")
+    
+    try:
+        results = run_backend_probe(PREFERENCE_PARSER_PROBE).splitlines()[-8:]
+        print(f"Parsed location and budget: {results}")
+        
+        expected = [
+            "Jaipur None", "None None", "None None", "Jaipur None", "Bangalore None",
+            "None 2500000.0", "None None", "None 1500000.0"
+        ]
+        if results != expected:
+            test_results["preference_parser"]["status"] = "Failed"
+            test_results["preference_parser"]["details"] = f"Parsed {results}, expected {expected}"
+            return False
+        
+        test_results["preference_parser"]["status"] = "Passed"
+        test_results["preference_parser"]["details"] = "Ambiguous cities and unitless small budgets are not extracted"
+        return True
+    
+    except Exception as e:
+        test_results["preference_parser"]["status"] = "Failed"
+        test_results["preference_parser"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing preference parser: {str(e)}")
+        return False
+
+def test_rate_limits():
+    print_separator()
+    print("Testing Rate Limits...")
+    
+    try:
+        # market_data_ip allows a burst of 20 requests per client IP by default
+        for attempt in range(1, 26):
+            response = requests.get(f"{API_URL}/market-data?category=Catering")
+            if response.status_code == 429:
+                break
+            response.raise_for_status()
+        print(f"Request {attempt} returned {response.status_code}, Retry-After: {response.headers.get('Retry-After')}")
+        
+        if response.status_code != 429:
+            test_results["rate_limits"]["status"] = "Skipped"
+            test_results["rate_limits"]["details"] = "No 429 within 25 requests (rate limiting disabled or limits raised)"
+            return True
+        
+        if not response.headers.get("Retry-After", "").isdigit():
+            test_results["rate_limits"]["status"] = "Failed"
+            test_results["rate_limits"]["details"] = "429 response is missing a Retry-After header"
+            return False
+        
+        test_results["rate_limits"]["status"] = "Passed"
+        test_results["rate_limits"]["details"] = f"Market data was limited after {attempt - 1} requests with Retry-After {response.headers['Retry-After']}s"
+        return True
+    
+    except Exception as e:
+        test_results["rate_limits"]["status"] = "Failed"
+        test_results["rate_limits"]["details"] = f"Error: {str(e)}"
+        print(f"Error testing rate limits: {str(e)}")
+        return False
+
 def run_all_tests():
     print("\n" + "="*30 + " STARTING BACKEND TESTS " + "="*30 + "\n")
     
@@ -656,6 +1815,30 @@ def run_all_tests():
     test_new_vendor_creation()
     test_category_filtering()
     test_web_search_enhancement()
+    test_batch_recommendations()
+    test_ranking_applied()
+    test_chat_rearchive()
+    test_portfolio_pixel_limit()
+    test_vendor_availability()
+    test_geo_search()
+    test_cold_start()
+    test_inquiry_inbox()
+    test_bundle_optimizer()
+    test_optimizer_exact_budget()
+    test_idempotency_keys()
+    test_idempotency_scope()
+    test_intent_classifier()
+    test_job_worker_resilience()
+    test_job_retry_supersede()
+    test_chat_cache_followups()
+    test_chat_context_recent_turns()
+    test_preference_parser()
+    test_vendor_reviews()
+    test_portfolio_upload()
+    test_bootstrap()
+    test_rate_limit_clients()
+    # Last, since it exhausts this client's market data allowance
+    test_rate_limits()
     
     print("\n" + "="*30 + " TEST RESULTS SUMMARY " + "="*30 + "\n")
     
@@ -9,6 +9,7 @@ const App = () => {
   const [currentPage, setCurrentPage] = useState('home');
   const [user, setUser] = useState(null);
   const [vendors, setVendors] = useState([]);
+  const [topVendors, setTopVendors] = useState({});
   const [chatMessages, setChatMessages] = useState([]);
   const [chatInput, setChatInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
@@ -31,9 +32,8 @@ const App = () => {
 
   // Initialize app
   useEffect(() => {
+    loadBootstrap();
     fetchVendors();
-    // Create a temporary user for demo
-    createDemoUser();
     // Initialize services array if empty
     if (vendorFormData.services.length === 0) {
       setVendorFormData(prev => ({
@@ -43,6 +43,26 @@ const App = () => {
     }
   }, []);
 
+  // User and top vendors per category in one round trip
+  const loadBootstrap = async () => {
+    try {
+      const storedUserId = localStorage.getItem('userId');
+      const response = await axios.get(`${API}/bootstrap`, {
+        params: storedUserId ? { user_id: storedUserId } : {}
+      });
+      setTopVendors(response.data.vendors);
+      if (response.data.user) {
+        setUser(response.data.user);
+      } else {
+        // Create a temporary user for demo
+        createDemoUser();
+      }
+    } catch (error) {
+      console.error('Error loading home page data:', error);
+      createDemoUser();
+    }
+  };
+
   const createDemoUser = async () => {
     try {
       const response = await axios.post(`${API}/users`, {
@@ -58,6 +78,7 @@ const App = () => {
         }
       });
       setUser(response.data);
+      localStorage.setItem('userId', response.data.id);
     } catch (error) {
       console.error('Error creating demo user:', error);
     }
@@ -318,6 +339,26 @@ const App = () => {
             </div>
           </div>
 
+          {/* Top Rated Vendors */}
+          {Object.values(topVendors).some(list => list.length > 0) && (
+            <div className="mb-16">
+              <h2 className="text-3xl font-bold text-gray-900 mb-8 text-center">Top Rated Vendors</h2>
+              <div className="grid md:grid-cols-3 lg:grid-cols-5 gap-4">
+                {Object.entries(topVendors).filter(([, list]) => list.length > 0).map(([category, list]) => (
+                  <button
+                    key={category}
+                    onClick={() => { handleCategoryFilter(category); setCurrentPage('vendors'); }}
+                    className="bg-white p-4 rounded-2xl shadow-xl border border-rose-100 text-left hover:shadow-2xl transition-all transform hover:-translate-y-1"
+                  >
+                    <span className="bg-rose-100 text-rose-600 px-3 py-1 rounded-full text-xs font-medium">{category}</span>
+                    <div className="font-bold text-gray-900 mt-3">{list[0].business_name}</div>
+                    <div className="text-sm text-gray-600">⭐ {list[0].rating} ({list[0].total_reviews} reviews)</div>
+                  </button>
+                ))}
+              </div>
+            </div>
+          )}
+
           {/* Stats */}
           <div className="bg-white p-8 rounded-2xl shadow-xl border border-rose-100 text-center">
             <div className="grid grid-cols-2 md:grid-cols-4 gap-8">